@@ -0,0 +1,52 @@
+"""
+Time to build the icon masks at startup: the previous getpixel/putpixel loop,
+the lookup table mask, and loading masks from a warm cache.
+Run from the repository root: python benchmarks/bench_icon_masks.py
+"""
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+PATH = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, PATH)
+
+from PIL import Image
+from icons import load_icons
+
+MASK = (0, 1, 2)
+
+def pixel_loop_masks() -> dict:
+    """
+    Previous main.create_mask over every icon
+    """
+    masks = {}
+    for icon in glob.glob(os.path.join(PATH, "resources/icon-*.png")):
+        source = Image.open(icon)
+        mask_image = Image.new("1", source.size)
+        w, h = source.size
+        for x in range(w):
+            for y in range(h):
+                if source.getpixel((x, y)) in MASK:
+                    mask_image.putpixel((x, y), 255)
+        masks[icon] = mask_image
+    return masks
+
+def report(name: str, function, repeat: int = 5) -> float:
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    print("{:<24} {:8.2f} ms".format(name, best * 1000))
+    return best
+
+if __name__ == "__main__":
+    cache_dir = tempfile.mkdtemp()
+    try:
+        before = report("getpixel loop", pixel_loop_masks)
+        report("lookup table, no cache", lambda: load_icons(PATH, MASK))
+        load_icons(PATH, MASK, cache_dir)
+        after = report("warm cache", lambda: load_icons(PATH, MASK, cache_dir))
+        print("warm cache startup {:.1f}x faster than getpixel loop".format(before / after))
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,64 @@
+"""
+Throughput of the bytes level NMEA parser against the previous decode and
+re.split path, over a typical multiplexer mix of sentences.
+Run from the repository root: python benchmarks/bench_nmea_parser.py
+"""
+
+import os
+import re
+import sys
+import timeit
+from functools import reduce
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from nmea import parse_sentence, nmea_checksum
+
+SENTENCES = [
+    b"$GPRMC,124027.00,A,5053.00348,N,00118.21794,W,0.009,,110623,,,A*63\r\n",
+    b"$GPVTG,,018,T,021,M,2.4,N,4.445,K,A*02\r\n",
+    b"$IIMWV,230.5,R,2.9,N,A*32\r\n",
+    b"$YXXDR,C,22.36,C,AIRTEMP,P,1.00167,B,BARO,H,62.21,P,HUMIDITY*39\r\n",
+    b"!AIVDM,1,1,,B,177KQJ5000G?tO`K>RA1wUbN0TKH,0*5C\r\n",
+    b"!AIVDM,1,1,,A,13u?etPv2;0n:dDPwUM1U1Cb069D,0*24\r\n",
+]
+
+def regex_path(lines: list) -> None:
+    """
+    Previous path, decode every line and split with a regex, no checksum check
+    """
+    for line in lines:
+        start = line.find(b",")
+        words = re.split(r',|\*', line[start + 1:].decode('ascii'))
+        words[0]
+
+def parser_path(lines: list) -> None:
+    """
+    New path, verify checksum and index the line, decode one word
+    """
+    for line in lines:
+        sentence = parse_sentence(line)
+        if sentence.id[0] == "$":
+            sentence[0]
+
+def reduce_checksum(lines: list) -> None:
+    for line in lines:
+        reduce(lambda a, b: a ^ b, memoryview(line)[1:line.find(b"*")], 0)
+
+def folded_checksum(lines: list) -> None:
+    for line in lines:
+        nmea_checksum(memoryview(line)[1:line.find(b"*")])
+
+def report(name: str, function, lines: list, repeat: int = 5) -> float:
+    best = min(timeit.repeat(lambda: function(lines), number=1, repeat=repeat))
+    rate = len(lines) / best
+    print("{:<24} {:>10.0f} sentences/s {:>8.2f} us/sentence".format(name, rate, best / len(lines) * 1e6))
+    return rate
+
+if __name__ == "__main__":
+    lines = SENTENCES * 10000
+    regex_rate = report("decode + re.split", regex_path, lines)
+    parser_rate = report("parse_sentence", parser_path, lines)
+    print("parser relative to regex path: {:.2f}x (includes checksum verification)".format(parser_rate / regex_rate))
+    report("checksum reduce loop", reduce_checksum, lines)
+    report("checksum folded", folded_checksum, lines)
@@ -0,0 +1,57 @@
+"""
+End to end NMEA throughput: a local replay server streams synthetic sentences
+as fast as possible to a tcp_nmea reader, reporting sentences/s and CPU time
+per sentence, alongside the in-process parse and table update path alone.
+Run from the repository root: python benchmarks/bench_nmea_replay.py
+"""
+
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from nmea import tcp_nmea
+from nmea_replay import synthetic_sentences, replay_server
+
+COUNT = 100000
+
+def report(name: str, count: int, wall: float, cpu: float) -> None:
+    print("{:<28} {:>10.0f} sentences/s {:>8.2f} us CPU/sentence".format(name, count / wall, cpu / count * 1e6))
+    return None
+
+def bench_process_line(lines: list) -> None:
+    """
+    Parse and store every line without the socket
+    """
+    nmea = tcp_nmea()
+    wall, cpu = time.perf_counter(), time.process_time()
+    received = time.time()
+    for line in lines:
+        nmea.process_line(line, received)
+    report("process_line", len(lines), time.perf_counter() - wall, time.process_time() - cpu)
+    return None
+
+def bench_replay(lines: list, corruption: float) -> None:
+    """
+    Stream every line over TCP to a background reader, CPU includes the server thread
+    """
+    server = replay_server(lines, rate=0, corruption=corruption, repeat=False, seed=1)
+    host, port = server.start()
+    nmea = tcp_nmea()
+    wall, cpu = time.perf_counter(), time.process_time()
+    nmea.connect(host, port)
+    nmea.start_reader()
+    while nmea.reader_running:
+        time.sleep(0.001)
+    report("replay, {:.0%} corrupt".format(corruption), len(lines), time.perf_counter() - wall, time.process_time() - cpu)
+    print("{:<28} {} lines rejected, {} corrupted plus noise".format("", nmea.rejected_sentences, server.corrupted))
+    server.stop()
+    return None
+
+if __name__ == "__main__":
+    lines = list(itertools.islice(synthetic_sentences(1), COUNT))
+    bench_process_line(lines)
+    bench_replay(lines, 0)
+    bench_replay(lines, 0.01)
@@ -0,0 +1,36 @@
+"""
+Batched numpy psychrometric functions against a Python loop over the scalar
+weather_logger methods, for a day of history at one and sixty second intervals.
+Run from the repository root: python benchmarks/bench_psychrometrics.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy
+import psychrometrics
+from weather_logger import weather_logger
+
+def scalar_series(logger: weather_logger, temperatures: list, humidities: list) -> tuple:
+    dewpoints = [logger.get_dew_point(t, h) for t, h in zip(temperatures, humidities)]
+    absolute = [logger.relative_to_absolute_humidity(h, t) for t, h in zip(temperatures, humidities)]
+    return (dewpoints, absolute)
+
+def batched_series(temperatures, humidities) -> tuple:
+    dewpoints = psychrometrics.get_dew_point(temperatures, humidities)
+    absolute = psychrometrics.relative_to_absolute_humidity(humidities, temperatures)
+    return (dewpoints, absolute)
+
+if __name__ == "__main__":
+    logger = weather_logger.__new__(weather_logger) # Only the pure conversion methods are used
+    for samples in [1441, 86401]:
+        temperatures = numpy.random.uniform(-5, 35, samples)
+        humidities = numpy.random.uniform(20, 100, samples)
+        temperature_list = temperatures.tolist()
+        humidity_list = humidities.tolist()
+        scalar = min(timeit.repeat(lambda: scalar_series(logger, temperature_list, humidity_list), number=1, repeat=3))
+        batched = min(timeit.repeat(lambda: batched_series(temperatures, humidities), number=1, repeat=3))
+        print("{:>6} samples: scalar loop {:8.2f} ms, batched {:8.2f} ms, {:6.1f}x".format(samples, scalar * 1000, batched * 1000, scalar / batched))
@@ -0,0 +1,41 @@
+"""
+Render latency and peak memory for a full display frame at both supported
+resolutions, without display hardware.
+Run from the repository root: python benchmarks/bench_render.py
+"""
+
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+PATH = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, PATH)
+
+from render import render_frame, RESOLUTIONS, WHITE, BLACK, RED
+from icons import load_icons
+
+SNAPSHOT = {
+    "time": 1687633200, "lat_long": [50.8834, -1.3036], "temperature": 22.7, "pressure": 1020.3,
+    "wind_speed": 3.8, "wind_gusts": 10.7, "wind_direction": 165, "dewpoint": 12.6, "weather_icon": "sun",
+    "offset_time": 1687622400, "offset_lat_long": [50.8, -1.3], "offset_temperature": 24.4, "offset_pressure": 1021.5,
+    "offset_wind_speed": 5.8, "offset_wind_gusts": 14.0, "offset_wind_direction": 201, "offset_dewpoint": 13.9, "offset_weather_icon": "rain"
+}
+
+if __name__ == "__main__":
+    icons, masks = load_icons(PATH, (WHITE, BLACK, RED))
+    render_frame(SNAPSHOT, RESOLUTIONS[0], icons, masks) # Load fonts outside the timings
+    for resolution in RESOLUTIONS:
+        timings = []
+        for run in range(200):
+            start = time.perf_counter()
+            render_frame(SNAPSHOT, resolution, icons, masks)
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        render_frame(SNAPSHOT, resolution, icons, masks)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("{}x{}: median {:.2f} ms, p95 {:.2f} ms, peak allocation {:.1f} KiB".format(
+            resolution[0], resolution[1], statistics.median(timings) * 1000,
+            sorted(timings)[int(len(timings) * 0.95)] * 1000, peak / 1024))
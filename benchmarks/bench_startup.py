@@ -0,0 +1,88 @@
+"""
+Cold start time from launching Python to the first rendered frame, offline
+with no NMEA sources and a mock display, split into imports, logger setup and
+the first frame, plus the slowest imports reported by python -X importtime.
+Each run is a fresh interpreter so nothing is already imported.
+Run from the repository root: python benchmarks/bench_startup.py [--runs 10] [--online]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PATH)
+from tests.offline_settings import OFFLINE_SETTINGS
+
+# Run in each child with the launch time as argv[1], prints seconds since launch at each stage
+CHILD = """
+import sys, time
+launched = float(sys.argv[1])
+sys.path.insert(0, {path!r})
+import config
+config.use_online_weather = {online!r}
+config.city = False
+for setting in {settings!r}:
+    setattr(config, setting, False)
+import main
+imported = time.time() - launched
+weather = main.weather_logger()
+ready = time.time() - launched
+display = main.get_display(True, (212, 104))
+icons, masks = main.get_icons(display)
+refresh = main.refresh_controller(config.refresh_thresholds, config.display_force_refresh)
+main.update_display(weather, display, refresh, icons, masks, {{"reading_time": time.time(), "lat_long": [], "weather_readings": {{}},
+                    "offset_readings": weather.get_offset_readings(time.time())}})
+frame = time.time() - launched
+weather.close()
+print(imported, ready, frame)
+"""
+
+def run_child(online: bool, importtime: bool = False) -> tuple:
+    """
+    Start a fresh interpreter to the first frame, returns (stage times, importtime report)
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    settings = OFFLINE_SETTINGS + ["icon_mask_cache", "metrics_file", "metrics_port", "memory_guard_interval"]
+    command += ["-c", CHILD.format(path=PATH, online=online, settings=settings), str(time.time())]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=PATH, check=True)
+    stages = [float(value) for value in result.stdout.strip().splitlines()[-1].split()]
+    return (stages, result.stderr)
+
+def get_slowest_imports(report: str, count: int = 10) -> list:
+    """
+    Return the top level imports with the largest cumulative time as (module, ms)
+    """
+    imports = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            own, cumulative, module = line[len("import time:"):].split("|")
+            imports.append((module.rstrip(), int(cumulative) / 1000))
+        except ValueError:
+            continue # Header line
+    top_level = [(module.strip(), ms) for module, ms in imports if not module.startswith("  ")]
+    return sorted(top_level, key=lambda entry: entry[1], reverse=True)[:count]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time a cold start to the first rendered frame")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--online", action="store_true", help="Enable online weather, importing its modules, no lookups are made")
+    args = parser.parse_args()
+
+    run_child(args.online) # Warm the filesystem cache so runs are comparable
+    runs = [run_child(args.online)[0] for run in range(args.runs)]
+    for index, name in enumerate(["imports", "logger ready", "first frame"]):
+        stage = [run[index] for run in runs]
+        print("{:<14} median {:7.1f} ms, min {:7.1f} ms".format(name, statistics.median(stage) * 1000, min(stage) * 1000))
+
+    stages, report = run_child(args.online, importtime=True)
+    print("Slowest imports (cumulative):")
+    for module, ms in get_slowest_imports(report):
+        print("  {:<24} {:7.1f} ms".format(module, ms))
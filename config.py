@@ -1,18 +1,92 @@
 # Eink setup
 inky = "phat"
 inky_colour = "red"
+# Directory to cache icon masks in, relative to this directory. Building masks
+# is about as fast as loading them, so only worth enabling on slow storage.
+icon_mask_cache = False
+# Skip display refreshes unless a value moves at least this much
+refresh_thresholds = {
+    "temperature": 0.5, "offset_temperature": 0.5, # C
+    "dewpoint": 0.5, "offset_dewpoint": 0.5, # C
+    "pressure": 0.5, "offset_pressure": 0.5, # hPa
+    "wind_speed": 1, "offset_wind_speed": 1, # kts
+    "wind_gusts": 1, "offset_wind_gusts": 1, # kts
+    "wind_direction": 10, "offset_wind_direction": 10, # Degrees
+    "lat_long": 0.01, "offset_lat_long": 0.01 # Degrees
+}
+display_force_refresh = 6 * 60 * 60 # Seconds between forced refreshes to clear ghosting
+display_state_file = "data/display_state.json" # Last displayed values, relative to this directory
 
 # Set to true to fallback to online weather where local data is not available
 use_online_weather = True
 
+# Online weather providers in order of preference, queried together - "open_meteo", "meteomatics"
+# A list of names shares a priority, e.g. [["open_meteo", "meteomatics"]] takes the freshest data of either
+# A provider failing most of its recent lookups is ranked behind the healthy ones
+weather_providers = ["open_meteo"]
+weather_provider_deadline = 30 # Seconds to wait for providers on each lookup
+# Meteomatics account, only used if listed above
+meteomatics_username = False
+meteomatics_password = False
+meteomatics_token_file = "data/meteomatics_token.json" # Relative to this directory
+
+# Online weather responses are reused for the same place within the hour
+weather_cache_file = "data/weather_cache.json" # Relative to this directory - Set to False to keep in memory only
+weather_cache_ttl = 60 * 60 # Seconds
+weather_cache_entries = 24 # Most recently used responses kept
+weather_cache_grid = 0.1 # Degrees, positions closer than the weather model grid share a response
+
+# Online weather HTTP requests
+http_connect_timeout = 5 # Seconds
+http_read_timeout = 20 # Seconds
+http_retries = 2 # Retries after a failed request
+http_backoff = 2 # Seconds before the first retry, doubling each retry
+http_max_backoff = 30 # Seconds
+http_failure_threshold = 3 # Failed requests before a provider is left alone
+http_circuit_reset = 5 * 60 # Seconds before trying a failing provider again
+
 # Manual Lat long setup - not used if GPS data present - Set to False if not
 # wanted as fallback
 city = "southampton"
 countrycode = "GB"
+# Places are looked up in the cache, then the gazetteer, then online - Set either to False to disable
+geocode_cache_file = "data/geocode_cache.json" # Relative to this directory
+gazetteer_file = "resources/gazetteer.csv" # Relative to this directory
+
+# Daemon mode (main.py --daemon) cadences in seconds
+sample_interval = 1 # Wind sampling from the NMEA sentence tables
+log_interval = 60 # Readings logged to the history and data log
+display_interval = 5 * 60 # Display updates, still skipped if nothing visible changed
+watchdog_interval = 10 # NMEA sources checked for sentences that have stopped arriving
+metrics_interval = 60 # Metrics file written
+memory_guard_interval = False # e.g. 300 to check memory use and enforce the budgets below - False to disable
+
+# Memory budgets in bytes, enforced when memory_guard_interval is set
+memory_rss_budget = 256 * 1024 * 1024 # Resident memory at which the history and caches are shed to half, well under a Pi Zero's 512MB
+memory_history_budget = 4 * 1024 * 1024
+memory_cache_budget = 2 * 1024 * 1024
+memory_trace = False # Attribute memory growth to allocation sites with tracemalloc, slows the logger so only for leak hunting
+memory_trace_frames = 1 # Stack frames recorded per allocation
+memory_trace_top = 10 # Allocation sites reported each check
+
+# Metrics in the Prometheus text format - Set either to False to disable
+metrics_file = False # e.g. "data/metrics.prom" for the node_exporter textfile collector, relative to this directory
+metrics_port = False # e.g. 9108 to serve http://127.0.0.1:9108/metrics
+metrics_host = "127.0.0.1" # Keep on localhost unless the network is trusted
 
 # Data management
 offset_hours = 3 # How many hours to compare to
-data_retention = 24 # Hours to store data for use in comparison
+data_retention = 24 # Hours of history kept, in memory by the coarsest tier below and reloaded from the data log
+history_interval = 60 # Seconds between samples kept in the data log
+# In memory history, raw samples for a few minutes then [seconds per aggregate, hours kept] tiers
+# No tier keeps more than data_retention hours and the coarsest always keeps data_retention hours
+history_raw_minutes = 10
+history_raw_interval = 1 # Seconds, closer samples replace the last
+history_tiers = [[60, 12], [600, 24]]
+# Log file kept through power loss, relative to this directory - Set to False to disable
+data_log_file = "data/weather_log.bin"
+data_log_flush_records = 10 # Records written before flushing to the SD card
+data_log_fsync_interval = 300 # Maximum seconds between fsyncs
 
 #NMEA config - Set to False if not present
 gps_nmea_host = "192.168.4.90"
@@ -21,6 +95,18 @@ sensors_nmea_host = "192.168.68.201"
 sensors_nmea_port = 2000
 wind_nmea_host = "192.168.4.90"
 wind_nmea_port = 2000
+nmea_connect_timeout = 2 # Seconds
+nmea_reconnect_backoff = 1 # Seconds before the first reconnect, doubling each failed or dropped attempt until a sentence arrives
+nmea_reconnect_max_backoff = 60 # Seconds
+# Seconds after it was received that a sentence is stale and its source counts as quiet, by sentence ID
+nmea_stale_after = {"$GPRMC": 10, "$GPVTG": 10, "$IIMWV": 10, "$YXXDR": 60}
+nmea_stale_default = 30 # Seconds, for sentence IDs not listed above
+# Reject sentences without a *hh checksum, set to False for instruments that omit it
+nmea_require_checksum = True
+
+# Wind averaging windows in seconds, the display shows wind_display_window
+wind_windows = [10, 120, 600]
+wind_display_window = 600
 
 # Some st60 wind instrument firmware has knots and km/h backwards, set this
 # to True to switch from the NMEA standard if you have such a unit
@@ -0,0 +1,248 @@
+"""
+Crash safe binary log of weather readings, so the history survives power loss.
+Records are fixed size and appended through a memory mapped file, each with
+its own CRC32. A record torn by power loss fails its check and is discarded,
+along with anything after it, when the log is next opened.
+"""
+
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+
+# magic, version, timestamp, temperature, pressure, humidity, wind_speed,
+# wind_direction, wind_gusts, latitude, longitude. Missing values are stored as NaN.
+RECORD = struct.Struct("<2sBxdffffffdd")
+CRC = struct.Struct("<I")
+RECORD_SIZE = RECORD.size + CRC.size
+MAGIC = b"WL"
+VERSION = 2
+CHANNELS = ["temperature", "pressure", "humidity", "wind_speed", "wind_direction", "wind_gusts", "latitude", "longitude"]
+# Version 1 records had no wind_gusts, a version 1 log is upgraded when opened
+RECORD_V1 = struct.Struct("<2sBxdfffffdd")
+CHANNELS_V1 = ["temperature", "pressure", "humidity", "wind_speed", "wind_direction", "latitude", "longitude"]
+
+def pack_record(buffer, offset: int, timestamp: float, readings: dict) -> None:
+    """
+    Write one record with its CRC into buffer at offset, readings keyed as CHANNELS
+    """
+    values = []
+    for channel in CHANNELS:
+        value = readings.get(channel)
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            values.append(math.nan)
+    RECORD.pack_into(buffer, offset, MAGIC, VERSION, timestamp, *values)
+    CRC.pack_into(buffer, offset + RECORD.size, zlib.crc32(memoryview(buffer)[offset:offset + RECORD.size]))
+    return None
+
+class data_log:
+    """
+    Append only log of readings in a memory mapped file.
+    Writes are flushed to the card every flush_records records and fsynced at
+    most every fsync_interval seconds to limit SD card wear. Once the file
+    holds twice retention_hours of records it is compacted to the last retention_hours.
+    """
+    def __init__(self, path: str, retention_hours: float, interval: float, flush_records: int = 10, fsync_interval: float = 300) -> None:
+        self.path = path
+        self.retention_hours = retention_hours
+        self.flush_records = flush_records
+        self.fsync_interval = fsync_interval
+        self.max_records = max(int(retention_hours * 3600 / interval) * 2, 2)
+        self.grow_records = 256 # Records to preallocate each time the file fills
+        self.file = None
+        self.mmap = None
+        self.count = 0
+        self.unflushed = 0
+        self.last_fsync = time.monotonic()
+        self.discarded_records = 0 # Torn or corrupt records dropped when opened
+        self.open()
+        return None
+
+    def open(self) -> None:
+        """
+        Open and map the log file, creating it if needed, and find the end of the valid records
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < RECORD_SIZE * self.grow_records:
+            size = RECORD_SIZE * self.grow_records
+            self.file.truncate(size)
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+        if self.mmap[:2] == MAGIC and self.mmap[2] == 1:
+            self.upgrade()
+            return None
+        self.count = self.count_valid_records()
+        return None
+
+    def upgrade(self) -> None:
+        """
+        Rewrite a version 1 log as the current version, with no wind_gusts.
+        Records are read up to the first torn one, written and fsynced
+        alongside, then swapped in atomically.
+        """
+        records = []
+        size = RECORD_V1.size + CRC.size
+        view = memoryview(self.mmap)
+        offset = 0
+        while offset + size <= len(self.mmap) and view[offset:offset + 2] == MAGIC:
+            if zlib.crc32(view[offset:offset + RECORD_V1.size]) != CRC.unpack_from(view, offset + RECORD_V1.size)[0]:
+                break
+            fields = RECORD_V1.unpack_from(view, offset)
+            records.append((fields[2], dict(zip(CHANNELS_V1, fields[3:]))))
+            offset += size
+        view.release()
+
+        upgraded = bytearray(RECORD_SIZE * max(len(records), self.grow_records))
+        for index, (timestamp, readings) in enumerate(records):
+            pack_record(upgraded, index * RECORD_SIZE, timestamp, readings)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "wb") as temporary_file:
+            temporary_file.write(upgraded)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        self.mmap.close()
+        self.file.close()
+        os.replace(temporary_path, self.path)
+        print("Upgraded data log to version {}, {} records".format(VERSION, len(records)))
+        self.open()
+        return None
+
+    def count_valid_records(self) -> int:
+        """
+        Count complete records from the start of the file. Scanning stops at the
+        first record with a bad magic number or CRC, a torn write from power loss.
+        """
+        capacity = len(self.mmap) // RECORD_SIZE
+        view = memoryview(self.mmap)
+        count = 0
+        while count < capacity:
+            offset = count * RECORD_SIZE
+            if view[offset:offset + 2] != MAGIC:
+                break
+            crc = CRC.unpack_from(view, offset + RECORD.size)[0]
+            if zlib.crc32(view[offset:offset + RECORD.size]) != crc:
+                break
+            count += 1
+        if count < capacity and view[count * RECORD_SIZE:count * RECORD_SIZE + 2] == MAGIC:
+            self.discarded_records += 1
+            print("Discarding torn record at end of data log")
+        view.release()
+        return count
+
+    def close(self) -> None:
+        """
+        Flush everything to the card and close the log
+        """
+        if self.mmap:
+            self.flush(True)
+            self.mmap.close()
+            self.mmap = None
+        if self.file:
+            self.file.close()
+            self.file = None
+        return None
+
+    def grow(self) -> None:
+        """
+        Extend the file by grow_records records and remap it
+        """
+        size = len(self.mmap) + RECORD_SIZE * self.grow_records
+        self.mmap.flush()
+        self.mmap.close()
+        self.file.truncate(size)
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+        return None
+
+    def append(self, timestamp: float, readings: dict) -> None:
+        """
+        Append one set of readings, keyed as CHANNELS
+        """
+        if self.count >= self.max_records:
+            self.compact(timestamp)
+        offset = self.count * RECORD_SIZE
+        if offset + RECORD_SIZE > len(self.mmap):
+            self.grow()
+
+        pack_record(self.mmap, offset, timestamp, readings)
+        self.count += 1
+        self.unflushed += 1
+
+        if self.unflushed >= self.flush_records:
+            self.flush()
+        return None
+
+    def flush(self, fsync: bool = False) -> None:
+        """
+        Write dirty pages to the card, fsyncing if forced or fsync_interval has passed
+        """
+        if self.unflushed:
+            self.mmap.flush()
+            self.unflushed = 0
+        if fsync or time.monotonic() - self.last_fsync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+        return None
+
+    def read_record(self, index: int) -> tuple:
+        """
+        Return (timestamp, readings) for a record, NaN values become None
+        """
+        fields = RECORD.unpack_from(self.mmap, index * RECORD_SIZE)
+        readings = {}
+        for channel, value in zip(CHANNELS, fields[3:]):
+            readings[channel] = None if math.isnan(value) else value
+        return (fields[2], readings)
+
+    def read_timestamp(self, index: int) -> float:
+        return struct.unpack_from("<d", self.mmap, index * RECORD_SIZE + 4)[0]
+
+    def load(self, since: float = None) -> list:
+        """
+        Return [(timestamp, readings)] oldest first for records at or after
+        since, default the last retention_hours. Finds the first record by binary search.
+        """
+        if since is None:
+            since = time.time() - self.retention_hours * 3600
+        return [self.read_record(index) for index in range(self.find_first(since), self.count)]
+
+    def find_first(self, since: float) -> int:
+        """
+        Binary search for the index of the first record at or after since
+        """
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.read_timestamp(middle) < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def compact(self, now: float) -> None:
+        """
+        Rewrite the log with only the last retention_hours of records, and no
+        more than half of max_records. The new file is written and fsynced
+        alongside, then swapped in atomically.
+        """
+        low = max(self.find_first(now - self.retention_hours * 3600), self.count - self.max_records // 2)
+        keep = bytes(self.mmap[low * RECORD_SIZE:self.count * RECORD_SIZE])
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "wb") as temporary_file:
+            temporary_file.write(keep)
+            temporary_file.truncate(max(len(keep), RECORD_SIZE * self.grow_records))
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        self.mmap.close()
+        self.file.close()
+        os.replace(temporary_path, self.path)
+        self.count = 0
+        self.open()
+        return None
@@ -0,0 +1,139 @@
+"""
+E-ink display helpers. A full refresh of the Inky pHAT takes many seconds and
+real power, so frames are only pushed when something visible has changed.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+class refresh_controller:
+    """
+    Keeps a digest of the last frame pushed to the display and the values it
+    showed. A new frame is skipped if it is identical, or if every value has
+    moved less than its threshold, e.g. {"pressure": 0.5, "wind_speed": 1}.
+    Values without a threshold count as changed on any difference.
+    A refresh is forced every force_interval seconds to clear ghosting.
+    State is saved to state_file, if given, so one-shot runs from cron can compare with the last run.
+    """
+    def __init__(self, thresholds: dict, force_interval: float, state_file: str = None) -> None:
+        self.thresholds = thresholds
+        self.force_interval = force_interval
+        self.state_file = state_file
+        self.last_frame = None # sha1 of the last pushed frame's pixels
+        self.last_values = {}
+        self.last_refresh = 0
+        self.skipped = 0 # Frames not pushed since the last refresh
+        self.load_state()
+        return None
+
+    def load_state(self) -> None:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return None
+        try:
+            with open(self.state_file) as state_file:
+                state = json.load(state_file)
+            self.last_frame = state["frame"]
+            self.last_values = state["values"]
+            self.last_refresh = state["refresh_time"]
+        except (OSError, ValueError, KeyError):
+            print("Ignoring unreadable display state file")
+        return None
+
+    def save_state(self) -> None:
+        if not self.state_file:
+            return None
+        state = {"frame": self.last_frame, "values": self.last_values, "refresh_time": self.last_refresh}
+        try:
+            directory = os.path.dirname(self.state_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.state_file + ".tmp", "w") as state_file:
+                json.dump(state, state_file)
+            os.replace(self.state_file + ".tmp", self.state_file)
+        except (OSError, TypeError, ValueError) as error:
+            print("Unable to save display state:", error)
+        return None
+
+    def get_frame_digest(self, frame) -> str:
+        return hashlib.sha1(frame.tobytes()).hexdigest()
+
+    def value_changed(self, name: str, old, new) -> bool:
+        """
+        Compare one displayed value against its threshold. Lists such as
+        lat/long compare element by element, wind directions wrap at 360.
+        """
+        if old is None or new is None or name not in self.thresholds:
+            return old != new
+        if isinstance(new, (list, tuple)):
+            if not isinstance(old, (list, tuple)) or len(old) != len(new):
+                return True
+            return any(self.value_changed(name, o, n) for o, n in zip(old, new))
+        try:
+            difference = abs(float(new) - float(old))
+        except (TypeError, ValueError):
+            return old != new
+        if "direction" in name:
+            difference = min(difference % 360, 360 - difference % 360)
+        return difference >= self.thresholds[name]
+
+    def needs_refresh(self, frame, values: dict, now: float = None) -> bool:
+        """
+        Decide whether frame, showing values, should be pushed to the display
+        """
+        if now is None:
+            now = time.time()
+        if self.last_frame is None or now - self.last_refresh >= self.force_interval:
+            return True
+        if self.get_frame_digest(frame) == self.last_frame:
+            return False
+        for name in set(values) | set(self.last_values):
+            if self.value_changed(name, self.last_values.get(name), values.get(name)):
+                return True
+        return False
+
+    def refresh(self, display, frame, values: dict, now: float = None) -> bool:
+        """
+        Push frame to the display if needed, returns True if it was shown
+        """
+        if now is None:
+            now = time.time()
+        if not self.needs_refresh(frame, values, now):
+            self.skipped += 1
+            return False
+        display.set_image(frame)
+        display.show()
+        self.last_frame = self.get_frame_digest(frame)
+        self.last_values = dict(values)
+        self.last_refresh = now
+        self.skipped = 0
+        self.save_state()
+        return True
+
+class mock_display:
+    """
+    Stand in for inky.InkyPHAT so the render pipeline runs without display
+    hardware. Shown frames are counted and saved as a PNG if output_file is given.
+    """
+    WHITE = 0
+    BLACK = 1
+    RED = 2
+
+    def __init__(self, resolution: tuple = (212, 104), output_file: str = None) -> None:
+        self.resolution = resolution
+        self.width, self.height = resolution
+        self.output_file = output_file
+        self.image = None
+        self.shown = 0
+        return None
+
+    def set_image(self, image) -> None:
+        self.image = image
+        return None
+
+    def show(self) -> None:
+        self.shown += 1
+        if self.output_file and self.image is not None:
+            self.image.save(self.output_file)
+        return None
@@ -0,0 +1,68 @@
+"""
+Hourly forecast data held as typed columns with a sorted timestamp index, so
+values are looked up by time rather than by position in the response.
+"""
+
+import math
+from array import array
+from bisect import bisect_right
+
+class hourly_forecast:
+    """
+    Columns of hourly values from a forecast response, e.g. Open-Meteo's "hourly"
+    object of {"time": [unixtime, ...], "temperature_2m": [21.5, ...], ...}.
+    Missing (null) values are stored as NaN and returned as None.
+    Each value is taken to hold for step seconds after its timestamp.
+    """
+    def __init__(self, hourly: dict, step: float = 3600) -> None:
+        self.step = step
+        order = sorted(range(len(hourly["time"])), key=lambda index: hourly["time"][index])
+        self.times = array('d', (hourly["time"][index] for index in order))
+        self.columns = {}
+        for variable, values in hourly.items():
+            if variable == "time" or not isinstance(values, list) or len(values) != len(self.times):
+                continue
+            try:
+                self.columns[variable] = array('d', (math.nan if values[index] is None else values[index] for index in order))
+            except TypeError:
+                continue # Not numeric
+        return None
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __contains__(self, variable: str) -> bool:
+        return variable in self.columns
+
+    def get_index(self, timestamp: float) -> int:
+        """
+        Return the index of the last hour at or before timestamp, -1 if none
+        """
+        return bisect_right(self.times, timestamp) - 1
+
+    def get_value(self, variable: str, timestamp: float, interpolate: bool = True, circular: bool = False) -> float:
+        """
+        Return variable at timestamp, linearly interpolated between the hours
+        either side unless interpolate is False. Pass circular for angles in
+        degrees so interpolation takes the short way round. Returns None
+        outside the forecast or where a value is missing.
+        """
+        column = self.columns.get(variable)
+        index = self.get_index(timestamp)
+        if column is None or index == -1:
+            return None
+        value = column[index]
+        if index == len(self.times) - 1 or not interpolate:
+            if timestamp - self.times[index] >= self.step:
+                return None
+            return None if math.isnan(value) else value
+
+        next_value = column[index + 1]
+        fraction = (timestamp - self.times[index]) / (self.times[index + 1] - self.times[index])
+        if math.isnan(value) or math.isnan(next_value):
+            value = next_value if fraction >= 0.5 else value
+            return None if math.isnan(value) else value
+        if circular:
+            difference = (next_value - value + 180) % 360 - 180
+            return (value + difference * fraction) % 360
+        return value + (next_value - value) * fraction
@@ -0,0 +1,129 @@
+"""
+Offline lookups of a city and country code to a lat/long, from a cache of
+earlier results and a bundled gazetteer of ports and cities, so the default
+position resolves at startup without a network connection.
+"""
+
+import json
+import os
+from bisect import bisect_left
+
+def require_geocoder():
+    """
+    Import geocoder when an online lookup first needs it, places are usually
+    found in the geocode cache or gazetteer without it
+    """
+    try:
+        import geocoder
+    except ImportError:
+        raise ImportError("Online geocoding requires the geocoder module\nInstall with: sudo pip install geocoder")
+    return geocoder
+
+def get_place_key(city: str, countrycode: str) -> str:
+    return "{}, {}".format(city.strip().lower(), countrycode.strip().lower())
+
+class gazetteer:
+    """
+    Sorted index of places loaded from a CSV file of name,countrycode,latitude,longitude.
+    Lines starting # are comments.
+    """
+    def __init__(self, gazetteer_file: str) -> None:
+        places = []
+        with open(gazetteer_file) as places_file:
+            for line in places_file:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                name, countrycode, lat, long = line.strip().split(",")
+                places.append((get_place_key(name, countrycode), name, countrycode, [float(lat), float(long)]))
+        places.sort()
+        self.keys = [place[0] for place in places]
+        self.places = [place[1:] for place in places]
+        return None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, city: str, countrycode: str) -> list:
+        """
+        Return [lat, long] for an exact city and country code, any case, or None if not known
+        """
+        key = get_place_key(city, countrycode)
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return list(self.places[index][2])
+        return None
+
+    def search(self, prefix: str, countrycode: str = None, limit: int = 10) -> list:
+        """
+        Return up to limit (name, countrycode, [lat, long]) places whose name
+        starts with prefix, optionally only in countrycode, in name order
+        """
+        prefix = prefix.strip().lower()
+        matches = []
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and self.keys[index].startswith(prefix) and len(matches) < limit:
+            name, place_countrycode, lat_long = self.places[index]
+            if countrycode is None or place_countrycode.lower() == countrycode.strip().lower():
+                matches.append((name, place_countrycode, list(lat_long)))
+            index += 1
+        return matches
+
+class geocode_cache:
+    """
+    City and country code to [lat, long] results kept in cache_file, if given
+    """
+    def __init__(self, cache_file: str = None) -> None:
+        self.cache_file = cache_file
+        self.entries = {}
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file) as entries_file:
+                    self.entries = dict(json.load(entries_file))
+            except (OSError, ValueError, TypeError):
+                print("Ignoring unreadable geocode cache file")
+        return None
+
+    def get(self, city: str, countrycode: str) -> list:
+        lat_long = self.entries.get(get_place_key(city, countrycode))
+        return list(lat_long) if lat_long else None
+
+    def put(self, city: str, countrycode: str, lat_long: list) -> None:
+        self.entries[get_place_key(city, countrycode)] = list(lat_long)
+        if not self.cache_file:
+            return None
+        try:
+            directory = os.path.dirname(self.cache_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.cache_file + ".tmp", "w") as entries_file:
+                json.dump(self.entries, entries_file)
+            os.replace(self.cache_file + ".tmp", self.cache_file)
+        except OSError as error:
+            print("Unable to save geocode cache:", error)
+        return None
+
+def resolve_latlong(city: str, countrycode: str, cache: geocode_cache = None, places: gazetteer = None, online = None, precision: int = 4) -> list:
+    """
+    Return [lat, long] for a city and country code from the cache, then the
+    gazetteer, then online(city, countrycode) e.g. weather_api.get_latlong.
+    Gazetteer and online results are cached. Returns [] if nothing resolves.
+    """
+    if cache is not None:
+        lat_long = cache.get(city, countrycode)
+        if lat_long:
+            return lat_long
+
+    lat_long = places.lookup(city, countrycode) if places is not None else None
+    if lat_long is None and online is not None:
+        try:
+            lat_long = online(city, countrycode)
+        except (TypeError, ValueError, OSError, ImportError) as error:
+            print("Unable to look up {}, {} online: {}".format(city, countrycode, error))
+    if not lat_long:
+        print("Unable to find a lat/long for {}, {}".format(city, countrycode))
+        return []
+
+    lat_long = [round(lat_long[0], precision), round(lat_long[1], precision)]
+    if cache is not None:
+        cache.put(city, countrycode, lat_long)
+    return lat_long
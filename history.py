@@ -0,0 +1,412 @@
+"""
+Fixed memory history of logged readings, used to compare current readings
+with those from config.offset_hours ago. Raw samples are kept for a short
+time and rolled up into coarser aggregate tiers for longer retention.
+"""
+
+from array import array
+from math import atan2, cos, sin, degrees, radians
+
+class ring_buffer:
+    """
+    Fixed capacity circular store of timestamped float samples held in typed
+    arrays. Once full the oldest sample is overwritten.
+    Timestamps must be appended in time order.
+    """
+    array_names = ("timestamps", "values")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.start = 0 # Physical index of the oldest sample
+        self.count = 0
+        return None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def physical_index(self, index: int) -> int:
+        """
+        Map a logical index (0 = oldest) to its position in the arrays
+        """
+        return (self.start + index) % self.capacity
+
+    def get_memory_size(self) -> int:
+        """
+        Bytes held by the sample arrays
+        """
+        return sum(len(getattr(self, name)) * getattr(self, name).itemsize for name in self.array_names)
+
+    def resize(self, capacity: int) -> None:
+        """
+        Change the capacity, keeping the newest samples that fit
+        """
+        keep = min(self.count, capacity)
+        positions = [self.physical_index(index) for index in range(self.count - keep, self.count)]
+        for name in self.array_names:
+            old = getattr(self, name)
+            new = array('d', bytes(8 * capacity))
+            for index, position in enumerate(positions):
+                new[index] = old[position]
+            setattr(self, name, new)
+        self.capacity = capacity
+        self.start = 0
+        self.count = keep
+        return None
+
+    def claim_position(self, timestamp: float) -> int:
+        """
+        Return the array position for a new sample at timestamp, dropping the oldest if full
+        """
+        if self.count and timestamp < self.timestamps[self.physical_index(self.count - 1)]:
+            raise ValueError("Samples must be appended in time order")
+        if self.count < self.capacity:
+            position = self.physical_index(self.count)
+            self.count += 1
+        else:
+            position = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[position] = timestamp
+        return position
+
+    def append(self, timestamp: float, value: float) -> None:
+        """
+        Add a sample, overwriting the oldest if full
+        """
+        position = self.claim_position(timestamp)
+        self.values[position] = value
+        return None
+
+    def replace_latest(self, timestamp: float, value: float) -> None:
+        """
+        Overwrite the newest sample
+        """
+        position = self.physical_index(self.count - 1)
+        self.timestamps[position] = timestamp
+        self.values[position] = value
+        return None
+
+    def latest(self) -> tuple:
+        """
+        Return the newest (timestamp, value) or None if empty
+        """
+        if not self.count:
+            return None
+        position = self.physical_index(self.count - 1)
+        return (self.timestamps[position], self.values[position])
+
+    def oldest(self) -> tuple:
+        """
+        Return the oldest (timestamp, value) or None if empty
+        """
+        if not self.count:
+            return None
+        return (self.timestamps[self.start], self.values[self.start])
+
+    def index_at_or_before(self, timestamp: float) -> int:
+        """
+        Binary search for the logical index of the newest sample at or before
+        timestamp, -1 if every sample is newer
+        """
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[self.physical_index(middle)] <= timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    def value_at(self, timestamp: float, tolerance: float) -> float:
+        """
+        Return the value of the newest sample at or before timestamp, if it is
+        no more than tolerance seconds older, otherwise None. O(log n).
+        """
+        index = self.index_at_or_before(timestamp)
+        if index == -1:
+            return None
+        position = self.physical_index(index)
+        if timestamp - self.timestamps[position] > tolerance:
+            return None
+        return self.values[position]
+
+    def get_range(self, start_time: float, end_time: float) -> tuple:
+        """
+        Return (timestamps, values) arrays, oldest first, for samples between
+        start_time and end_time inclusive
+        """
+        first = self.index_at_or_before(start_time)
+        if first == -1 or self.timestamps[self.physical_index(first)] < start_time:
+            first += 1
+        last = self.index_at_or_before(end_time)
+        timestamps = array('d')
+        values = array('d')
+        for index in range(first, last + 1):
+            position = self.physical_index(index)
+            timestamps.append(self.timestamps[position])
+            values.append(self.values[position])
+        return (timestamps, values)
+
+class history_store:
+    """
+    One ring buffer per reading channel, sized to hold retention_hours of
+    samples taken every interval seconds. Memory use is fixed at creation.
+    """
+    channels = ["temperature", "pressure", "humidity", "wind_speed", "wind_direction", "wind_gusts", "latitude", "longitude"]
+
+    def __init__(self, retention_hours: float, interval: float) -> None:
+        self.retention_hours = retention_hours
+        self.interval = interval
+        self.capacity = int(retention_hours * 3600 / interval) + 1
+        self.buffers = {}
+        for channel in self.channels:
+            self.buffers[channel] = ring_buffer(self.capacity)
+        return None
+
+    def record(self, timestamp: float, readings: dict) -> None:
+        """
+        Store every channel present in readings with a numeric value, None values are skipped.
+        Only the latest reading in each interval is kept, so the buffer always spans retention_hours.
+        Readings older than the latest stored, e.g. after a clock step back, are dropped.
+        """
+        for channel in self.channels:
+            value = readings.get(channel)
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            buffer = self.buffers[channel]
+            latest = buffer.latest()
+            if latest and timestamp < latest[0]:
+                continue
+            if latest and timestamp // self.interval == latest[0] // self.interval:
+                buffer.replace_latest(timestamp, value)
+            else:
+                buffer.append(timestamp, value)
+        return None
+
+    def get_readings_at(self, timestamp: float, tolerance: float = None) -> dict:
+        """
+        Return the value of every channel at timestamp, None where there is no
+        sample within tolerance seconds before it (default two intervals)
+        """
+        if tolerance is None:
+            tolerance = self.interval * 2
+        readings = {}
+        for channel in self.channels:
+            readings[channel] = self.buffers[channel].value_at(timestamp, tolerance)
+        return readings
+
+    def get_channel(self, channel: str) -> ring_buffer:
+        """
+        Return the ring buffer for a channel
+        """
+        return self.buffers[channel]
+
+class rollup_tier(ring_buffer):
+    """
+    Aggregates of samples over fixed periods of seconds, keeping hours of them.
+    Each period holds the min, max, mean and last sample, timestamped at the
+    start of the period. values holds the means so lookups match ring_buffer.
+    Samples are added one at a time and a period is stored once a sample for
+    a later period arrives. Circular tiers, for directions in degrees, use a
+    vector mean and leave min and max as plain numbers.
+    """
+    array_names = ring_buffer.array_names + ("minimums", "maximums", "lasts")
+
+    def __init__(self, seconds: float, hours: float, circular: bool = False) -> None:
+        super().__init__(int(hours * 3600 / seconds) + 1)
+        self.seconds = seconds
+        self.circular = circular
+        self.minimums = array('d', bytes(8 * self.capacity))
+        self.maximums = array('d', bytes(8 * self.capacity))
+        self.lasts = array('d', bytes(8 * self.capacity))
+        self.period = None # Period being aggregated, timestamp // seconds
+        self.reset_period()
+        return None
+
+    def reset_period(self) -> None:
+        self.period_count = 0
+        self.period_sum = 0.0
+        self.period_sin = 0.0
+        self.period_cos = 0.0
+        self.period_min = None
+        self.period_max = None
+        self.period_last = None
+        return None
+
+    def add(self, timestamp: float, value: float) -> None:
+        """
+        Add a sample to the open period, storing the previous period if this one is later.
+        Samples for an earlier period than the open one are dropped.
+        """
+        period = timestamp // self.seconds
+        if self.period is not None and period < self.period:
+            return None
+        if period != self.period:
+            self.close_period()
+            self.period = period
+        self.period_count += 1
+        if self.circular:
+            self.period_sin += sin(radians(value))
+            self.period_cos += cos(radians(value))
+        else:
+            self.period_sum += value
+        self.period_min = value if self.period_min is None else min(self.period_min, value)
+        self.period_max = value if self.period_max is None else max(self.period_max, value)
+        self.period_last = value
+        return None
+
+    def close_period(self) -> None:
+        """
+        Store the open period's aggregate, if it has samples
+        """
+        if self.period_count:
+            if self.circular:
+                mean = degrees(atan2(self.period_sin, self.period_cos)) % 360
+            else:
+                mean = self.period_sum / self.period_count
+            position = self.claim_position(self.period * self.seconds)
+            self.values[position] = mean
+            self.minimums[position] = self.period_min
+            self.maximums[position] = self.period_max
+            self.lasts[position] = self.period_last
+        self.reset_period()
+        return None
+
+    def get_aggregates(self, start_time: float, end_time: float) -> dict:
+        """
+        Return {"time", "min", "max", "mean", "last"} arrays, oldest first, for
+        stored periods starting between start_time and end_time inclusive
+        """
+        first = self.index_at_or_before(start_time)
+        if first == -1 or self.timestamps[self.physical_index(first)] < start_time:
+            first += 1
+        last = self.index_at_or_before(end_time)
+        aggregates = {"time": array('d'), "min": array('d'), "max": array('d'), "mean": array('d'), "last": array('d')}
+        for index in range(first, last + 1):
+            position = self.physical_index(index)
+            aggregates["time"].append(self.timestamps[position])
+            aggregates["min"].append(self.minimums[position])
+            aggregates["max"].append(self.maximums[position])
+            aggregates["mean"].append(self.values[position])
+            aggregates["last"].append(self.lasts[position])
+        return aggregates
+
+class tiered_history:
+    """
+    Raw samples for the last raw_minutes, at most one per raw_interval seconds,
+    plus rollup tiers given as [seconds per aggregate, hours kept], e.g.
+    [[60, 12], [600, 72]]. Every sample updates every tier as it is recorded
+    and lookups use the finest tier reaching back far enough.
+    """
+    channels = history_store.channels
+    circular_channels = ["wind_direction"]
+
+    def __init__(self, raw_minutes: float, raw_interval: float, tiers: list) -> None:
+        self.raw = history_store(raw_minutes / 60, raw_interval)
+        self.tiers = []
+        for seconds, hours in sorted(tiers):
+            tier = {}
+            for channel in self.channels:
+                tier[channel] = rollup_tier(seconds, hours, channel in self.circular_channels)
+            self.tiers.append(tier)
+        return None
+
+    def record(self, timestamp: float, readings: dict) -> None:
+        """
+        Add readings to the raw samples and every rollup tier, None and non numeric values are skipped
+        """
+        self.raw.record(timestamp, readings)
+        for channel in self.channels:
+            value = readings.get(channel)
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            for tier in self.tiers:
+                tier[channel].add(timestamp, value)
+        return None
+
+    def get_memory_size(self) -> int:
+        """
+        Bytes held by the raw and rollup arrays of every channel
+        """
+        size = 0
+        for channel in self.channels:
+            for buffer in self.get_buffers(channel):
+                size += buffer.get_memory_size()
+        return size
+
+    def shed(self, min_hours: float = 0) -> bool:
+        """
+        Free memory by dropping the oldest quarter of the rollup tier holding
+        the most, never keeping less than min_hours. Returns False if no tier
+        can shrink further.
+        """
+        shrinkable = []
+        for tier in self.tiers:
+            sample = tier[self.channels[0]]
+            minimum = int(min_hours * 3600 / sample.seconds) + 2
+            if sample.capacity > minimum:
+                shrinkable.append((sample.get_memory_size(), tier, max(minimum, sample.capacity * 3 // 4)))
+        if not shrinkable:
+            return False
+        size, tier, capacity = max(shrinkable, key=lambda candidate: candidate[0])
+        for channel in self.channels:
+            tier[channel].resize(capacity)
+        print("Shed history, {}s tier cut to {:.1f} hours".format(tier[self.channels[0]].seconds, capacity * tier[self.channels[0]].seconds / 3600))
+        return True
+
+    def get_buffers(self, channel: str) -> list:
+        """
+        Return the raw buffer and rollup tiers for a channel, finest first
+        """
+        return [self.raw.get_channel(channel)] + [tier[channel] for tier in self.tiers]
+
+    def get_tier(self, channel: str, start_time: float) -> ring_buffer:
+        """
+        Return the finest buffer for channel holding data from start_time, or
+        the one reaching furthest back if none do
+        """
+        buffers = self.get_buffers(channel)
+        for buffer in buffers:
+            oldest = buffer.oldest()
+            if oldest and oldest[0] <= start_time:
+                return buffer
+        reaching = [buffer for buffer in buffers if len(buffer)]
+        if not reaching:
+            return buffers[0]
+        return min(reaching, key=lambda buffer: buffer.oldest()[0])
+
+    def get_readings_at(self, timestamp: float, tolerance: float = None) -> dict:
+        """
+        Return every channel's value at timestamp from the finest tier covering
+        it, the mean for rollup tiers. None where there is no sample within
+        tolerance seconds before it. The default is two periods of the tier
+        used, or of the finest tier for raw samples as they may arrive slower
+        than raw_interval.
+        """
+        raw_tolerance = 2 * max([self.raw.interval] + [tier[self.channels[0]].seconds for tier in self.tiers[:1]])
+        readings = {}
+        for channel in self.channels:
+            buffer = self.get_tier(channel, timestamp)
+            if tolerance is not None:
+                buffer_tolerance = tolerance
+            else:
+                buffer_tolerance = 2 * buffer.seconds if isinstance(buffer, rollup_tier) else raw_tolerance
+            readings[channel] = buffer.value_at(timestamp, buffer_tolerance)
+        return readings
+
+    def get_range(self, channel: str, start_time: float, end_time: float) -> tuple:
+        """
+        Return (timestamps, values) arrays for channel between start_time and
+        end_time from the finest tier covering start_time, means for rollup tiers
+        """
+        return self.get_tier(channel, start_time).get_range(start_time, end_time)
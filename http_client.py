@@ -0,0 +1,147 @@
+"""
+Shared HTTP client for the online weather providers. One keep-alive session
+is reused for every request, each request has connect and read timeouts,
+failures are retried with bounded exponential backoff and a circuit breaker
+per host stops requests to a provider that keeps failing, e.g. while offline.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+import config
+
+try:
+    import requests
+except ImportError:
+    exit("This class requires the requests module\nInstall with: sudo pip install requests")
+
+# Response codes worth retrying, anything else is returned to the caller
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+class circuit_breaker:
+    """
+    Opens after failure_threshold consecutive failures, refusing requests until
+    reset_timeout seconds have passed, then lets one trial request through,
+    refusing other callers until it finishes. A success closes it again, a
+    failed trial reopens it.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = None # Time the breaker opened, None while closed
+        self.trial = False # A half-open trial request is in flight
+        self.lock = threading.Lock()
+        return None
+
+    def allow_request(self, now: float = None) -> bool:
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            if self.opened is None:
+                return True
+            if self.trial or now - self.opened < self.reset_timeout:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+        return None
+
+    def record_failure(self, now: float = None) -> None:
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            self.failures += 1
+            if self.opened is not None or self.failures >= self.failure_threshold:
+                self.opened = now
+            self.trial = False
+        return None
+
+class http_client:
+    """
+    Pooled requests session with timeouts, retries and a circuit breaker per host.
+    get() returns the requests.Response, or None if the host could not be
+    reached or its circuit is open.
+    """
+    def __init__(self, connect_timeout: float = 5, read_timeout: float = 20, retries: int = 2, backoff: float = 2,
+                 max_backoff: float = 30, failure_threshold: int = 3, reset_timeout: float = 300) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.circuits = {}
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        return None
+
+    def get_circuit(self, url: str) -> circuit_breaker:
+        host = urlsplit(url).netloc
+        if host not in self.circuits:
+            self.circuits[host] = circuit_breaker(self.failure_threshold, self.reset_timeout)
+        return self.circuits[host]
+
+    def get_backoff(self, attempt: int) -> float:
+        """
+        Seconds to wait before retry number attempt (0 = first retry)
+        """
+        return min(self.max_backoff, self.backoff * 2 ** attempt)
+
+    def get(self, url: str, **kwargs):
+        """
+        GET url, retrying connection errors, timeouts and RETRY_STATUS responses.
+        Extra keyword arguments are passed to requests, e.g. auth.
+        """
+        circuit = self.get_circuit(url)
+        if not circuit.allow_request():
+            print("Skipping request to {}, too many recent failures".format(urlsplit(url).netloc))
+            return None
+
+        kwargs.setdefault("timeout", self.timeout)
+        response = None
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    time.sleep(self.get_backoff(attempt - 1))
+                try:
+                    response = self.session.get(url, **kwargs)
+                except requests.exceptions.RequestException as error:
+                    print("Request failed:", error)
+                    response = None
+                    continue
+                if response.status_code not in RETRY_STATUS:
+                    break
+                print("Request failed with status code", response.status_code)
+        except Exception:
+            circuit.record_failure() # Don't leave a half-open trial in flight
+            raise
+
+        if response is None or response.status_code in RETRY_STATUS:
+            circuit.record_failure()
+        else:
+            circuit.record_success()
+        return response
+
+    def close(self) -> None:
+        self.session.close()
+        return None
+
+shared_client = None
+
+def get_client() -> http_client:
+    """
+    Return the client shared by all weather providers, created from config on first use
+    """
+    global shared_client
+    if shared_client is None:
+        shared_client = http_client(config.http_connect_timeout, config.http_read_timeout, config.http_retries, config.http_backoff,
+                                    config.http_max_backoff, config.http_failure_threshold, config.http_circuit_reset)
+    return shared_client
@@ -0,0 +1,72 @@
+"""
+Weather icon loading with transparency masks cached on disk, so masks are
+only built when an icon or the display palette changes.
+"""
+
+import glob
+import hashlib
+import os
+from PIL import Image
+
+def create_mask(source: Image.Image, mask: tuple = (0, 1, 2)) -> Image.Image:
+    """Create a transparency mask.
+
+    Takes a paletized source image and converts it into a mask
+    permitting all the colours supported by Inky pHAT (0, 1, 2)
+    or an optional list of allowed colours.
+    The whole image is mapped through a lookup table in one operation.
+
+    :param mask: Optional list of Inky pHAT colours to allow.
+
+    """
+    lut = [255 if index in mask else 0 for index in range(256)]
+    return source.point(lut, "1")
+
+def get_mask_key(icon_file: str, source: Image.Image, mask: tuple) -> str:
+    """
+    Return a cache key from the icon file contents, its palette and the allowed colours
+    """
+    key = hashlib.sha1()
+    with open(icon_file, "rb") as icon:
+        key.update(icon.read())
+    key.update(bytes(source.getpalette() or []))
+    key.update(repr(tuple(mask)).encode('ascii'))
+    return key.hexdigest()[:16]
+
+def load_mask(icon_file: str, icon_name: str, source: Image.Image, mask: tuple, cache_dir: str) -> Image.Image:
+    """
+    Return the icon's mask from the cache, creating and caching it if missing or stale
+    """
+    if not cache_dir:
+        return create_mask(source, mask)
+
+    cache_file = os.path.join(cache_dir, "{}-{}.png".format(icon_name, get_mask_key(icon_file, source, mask)))
+    if os.path.exists(cache_file):
+        mask_image = Image.open(cache_file)
+        mask_image.load()
+        return mask_image
+
+    mask_image = create_mask(source, mask)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for stale_file in glob.glob(os.path.join(cache_dir, "{}-*.png".format(icon_name))):
+            os.remove(stale_file)
+        mask_image.save(cache_file + ".tmp", "PNG")
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError as error:
+        print("Unable to cache icon mask:", error)
+    return mask_image
+
+def load_icons(path: str, mask: tuple, cache_dir: str = None) -> tuple:
+    """
+    Load resources/icon-*.png from path and return (icons, masks) dictionaries
+    keyed by icon name. Masks come from cache_dir where possible.
+    """
+    icons = {}
+    masks = {}
+    for icon in glob.glob(os.path.join(path, "resources/icon-*.png")):
+        icon_name = icon.split("icon-")[1].replace(".png", "")
+        icon_image = Image.open(icon)
+        icons[icon_name] = icon_image
+        masks[icon_name] = load_mask(icon, icon_name, icon_image, mask, cache_dir)
+    return (icons, masks)
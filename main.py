@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import glob
+import argparse
 import os
+import signal
 import time
-from sys import exit
 import config
-from open_meteo import weather_api
-from inky import InkyPHAT
-from PIL import Image, ImageDraw, ImageFont
+import metrics
 from weather_logger import weather_logger
+from display import refresh_controller, mock_display
+from scheduler import scheduler
+# render and icons, which load PIL, and inky are imported when first used to keep startup quick on a Pi Zero
 
 # Speed development by disabling display, enable for production
 enable_display = True
@@ -17,95 +18,187 @@ enable_display = True
 # Get the current path
 PATH = os.path.dirname(__file__)
 
-# Set up the display
-try:
-    inky_display = InkyPHAT('red')
-except TypeError:
-    raise TypeError("You need to update the Inky library to >= v1.1.0")
-
-if inky_display.resolution not in ((212, 104), (250, 122)):
-    w, h = inky_display.resolution
-    raise RuntimeError("This example does not support {}x{}".format(w, h))
-    
-weather = weather_logger()
-
-def create_mask(source, mask=(inky_display.WHITE, inky_display.BLACK, inky_display.RED)):
-    """Create a transparency mask.
-
-    Takes a paletized source image and converts it into a mask
-    permitting all the colours supported by Inky pHAT (0, 1, 2)
-    or an optional list of allowed colours.
-
-    :param mask: Optional list of Inky pHAT colours to allow.
-
-    """
-    mask_image = Image.new("1", source.size)
-    w, h = source.size
-    for x in range(w):
-        for y in range(h):
-            p = source.getpixel((x, y))
-            if p in mask:
-                mask_image.putpixel((x, y), 255)
-
-    return mask_image
-
-# Dictionaries to store our icons and icon masks in
-icons = {}
-masks = {}
-
-# Create a new canvas to draw on
-img = Image.new("P", (inky_display.resolution))
-draw = ImageDraw.Draw(img)
-
-# Load our icon files and generate masks
-for icon in glob.glob(os.path.join(PATH, "resources/icon-*.png")):
-   icon_name = icon.split("icon-")[1].replace(".png", "")
-   icon_image = Image.open(icon)
-   icons[icon_name] = icon_image
-   masks[icon_name] = create_mask(icon_image)
-
-# https://webpagepublicity.com/free-fonts-e.html#FreeFonts
-bigfont = ImageFont.load_default()
-# bigfont = ImageFont.truetype("facet.ttf", 14)
-littlefont = ImageFont.load_default()
-# littlefont = ImageFont.truetype("facet.ttf", 12)
-
-# Draw line to separate the weather data
-draw.line(((inky_display.resolution[0] / 2), 2, (inky_display.resolution[0] / 2), inky_display.resolution[1] - 2), inky_display.RED) # Centre division
-
-# Write text with weather values to the canvas - # TODO use reading time as source
-datetime = time.strftime("%d/%m %H:%M", time.localtime(nmea_time))
-offset_time = datetime - offset_hours*60*60
-datetime2 = time.strftime("%d/%m %H:%M", time.localtime(offset_time))
-
-draw.text((0, 0), datetime, inky_display.BLACK, font=bigfont)
-draw.text((0, 15), "{} C".format(weatherdata["temperature"]), inky_display.BLACK, font=littlefont)
-draw.text((0, 28), "{} hPa".format(weatherdata["pressure"]), inky_display.BLACK, font=littlefont)
-draw.text((0, 41), "{} kts".format(weatherdata["wind_speed"]), inky_display.BLACK, font=littlefont)
-draw.text((0, 54), "{} kts Gust".format(weatherdata["wind_gusts"]), inky_display.BLACK, font=littlefont)
-draw.text((0, 67), "{} Deg".format(weatherdata["wind_direction"]), inky_display.BLACK, font=littlefont)
-draw.text((0, 80), "{} C Dew".format(weatherdata["dewpoint"]), inky_display.BLACK, font=littlefont)
-draw.text((0, 93), "{}N,{}E".format(latlong[0], latlong[1]), inky_display.BLACK, font=littlefont)
-img.paste(icons[weatherdata["weather_icon"]], (55, 10), masks[weatherdata["weather_icon"]])
-
-draw.text((((inky_display.resolution[0] / 2) + 5), 0), datetime2, inky_display.RED, font=bigfont)
-draw.text((((inky_display.resolution[0] / 2) + 5), 15), "{} C".format(weatherdata["offset_temperature"]), inky_display.RED, font=littlefont)
-draw.text((((inky_display.resolution[0] / 2) + 5), 28), "{} hPa".format(weatherdata["offset_pressure"]), inky_display.RED, font=littlefont)
-draw.text((((inky_display.resolution[0] / 2) + 5), 41), "{} kts".format(weatherdata["offset_wind_speed"]), inky_display.RED, font=littlefont)
-draw.text((((inky_display.resolution[0] / 2) + 5), 54), "{} kts Gust".format(weatherdata["offset_wind_gusts"]), inky_display.RED, font=littlefont)
-draw.text((((inky_display.resolution[0] / 2) + 5), 67), "{} Deg".format(weatherdata["offset_wind_direction"]), inky_display.RED, font=littlefont)
-draw.text((((inky_display.resolution[0] / 2) + 5), 80), "{} C Dew".format(weatherdata["offset_dewpoint"]), inky_display.RED, font=littlefont)
-draw.text((((inky_display.resolution[0] / 2) + 5), 93), "{}N, {}E".format(latlong[0], latlong[1]), inky_display.RED, font=littlefont)
-img.paste(icons[weatherdata["offset_weather_icon"]], (165, 10), masks[weatherdata["offset_weather_icon"]])
-
-# Draw the current weather icon over the backdrop
-#if weather_icon is not None:
-#   img.paste(icons[weather_icon], (28, 36), masks[weather_icon])
-
-#else:
-#   draw.text((28, 36), "?", inky_display.RED, font=font)
-
-# Display the weather data on Inky pHAT
-if enable_display:
-    inky_display.set_image(img)
-    inky_display.show()
\ No newline at end of file
+def get_display(mock: bool = False, resolution: tuple = (212, 104), output_file: str = None):
+    """
+    Set up the Inky pHAT, or a mock display to run without the hardware
+    """
+    if mock:
+        return mock_display(resolution, output_file)
+
+    from inky import InkyPHAT
+    from render import RESOLUTIONS
+    try:
+        inky_display = InkyPHAT(config.inky_colour)
+    except TypeError:
+        raise TypeError("You need to update the Inky library to >= v1.1.0")
+
+    if inky_display.resolution not in RESOLUTIONS:
+        w, h = inky_display.resolution
+        raise RuntimeError("This example does not support {}x{}".format(w, h))
+    return inky_display
+
+def get_icons(inky_display) -> tuple:
+    """
+    Load our icon files and their masks for the display's colours
+    """
+    from icons import load_icons
+    mask_cache = os.path.join(PATH, config.icon_mask_cache) if config.icon_mask_cache else None
+    return load_icons(PATH, (inky_display.WHITE, inky_display.BLACK, inky_display.RED), mask_cache)
+
+def get_displayed_values(snapshot: dict) -> dict:
+    """
+    Values shown on the display that decide whether it needs refreshing: the
+    rendered rows, position and icon, current and offset. The clock alone and
+    readings that are logged but not shown do not count.
+    """
+    from render import ROWS
+    names = [key for key, template in ROWS] + ["lat_long", "weather_icon"]
+    values = {}
+    for name in names:
+        values[name] = snapshot.get(name)
+        values["offset_" + name] = snapshot.get("offset_" + name)
+    return values
+
+def update_display(weather: weather_logger, inky_display, refresh: refresh_controller, icons: dict, masks: dict, weather_data: dict = None) -> bool:
+    """
+    Render weather_data, or a new reading if not given, and push it to the
+    display if something visible changed
+    """
+    if weather_data is None:
+        weather_data = weather.get_weather_data()
+    from render import render_frame
+    registry = metrics.get_registry()
+    snapshot = weather.get_display_snapshot(weather_data)
+    with registry.timer("render_seconds"):
+        img = render_frame(snapshot, inky_display.resolution, icons, masks)
+    if not enable_display:
+        return False
+    start = time.perf_counter()
+    shown = refresh.refresh(inky_display, img, get_displayed_values(snapshot))
+    if shown:
+        registry.observe("display_refresh_seconds", time.perf_counter() - start)
+    else:
+        print("Display values unchanged, skipping refresh")
+    registry.increment("display_updates_total", labels={"result": "shown" if shown else "skipped"})
+    return shown
+
+def init_metrics(jobs: scheduler = None) -> None:
+    """
+    Describe the display metrics, collect the daemon's job stats and start the
+    localhost endpoint if config.metrics_port is set
+    """
+    registry = metrics.get_registry()
+    registry.describe("render_seconds", "histogram", "Seconds taken to render a frame")
+    registry.describe("display_refresh_seconds", "histogram", "Seconds taken by each e-ink refresh")
+    registry.describe("display_updates_total", "counter", "Display updates by whether the frame was shown or skipped as unchanged")
+    if jobs is not None:
+        registry.describe("job_runs_total", "counter", "Daemon job runs")
+        registry.describe("job_errors_total", "counter", "Daemon job runs that raised an error")
+        registry.describe("job_overruns_total", "counter", "Daemon job runs that overran or started late")
+        registry.describe("job_last_duration_seconds", "gauge", "Seconds taken by the last run of each daemon job")
+        registry.add_collector("scheduler", lambda: get_job_metrics(jobs))
+    if config.metrics_port:
+        host, port = registry.serve(config.metrics_host, config.metrics_port)
+        print("Serving metrics on http://{}:{}/metrics".format(host, port))
+    return None
+
+def get_job_metrics(jobs: scheduler) -> list:
+    """
+    Return (name, labels, value) samples from the scheduler's job stats
+    """
+    samples = []
+    for name, stats in jobs.get_stats().items():
+        samples.append(("job_runs_total", {"job": name}, stats["runs"]))
+        samples.append(("job_errors_total", {"job": name}, stats["errors"]))
+        samples.append(("job_overruns_total", {"job": name}, stats["overruns"]))
+        samples.append(("job_last_duration_seconds", {"job": name}, stats["last_duration"]))
+    return samples
+
+def write_metrics() -> None:
+    """
+    Write the metrics to config.metrics_file if set
+    """
+    if config.metrics_file:
+        try:
+            metrics.get_registry().write(os.path.join(PATH, config.metrics_file))
+        except OSError as error:
+            print("Unable to write metrics:", error)
+    return None
+
+def get_daemon_scheduler(weather: weather_logger, inky_display, refresh: refresh_controller, icons: dict, masks: dict) -> scheduler:
+    """
+    Schedule wind sampling, NMEA staleness checks, logging and display updates on their configured cadences.
+    The display shows the latest logged reading.
+    """
+    latest = {}
+
+    def log_reading() -> None:
+        latest["weather_data"] = weather.get_weather_data()
+        return None
+
+    def show_reading() -> None:
+        update_display(weather, inky_display, refresh, icons, masks, latest.get("weather_data"))
+        return None
+
+    jobs = scheduler()
+    jobs.add_job("sample", config.sample_interval, weather.sample_wind)
+    jobs.add_job("watchdog", config.watchdog_interval, weather.watchdog.check)
+    jobs.add_job("log", config.log_interval, log_reading)
+    # Start the display once the first reading is logged
+    jobs.add_job("display", config.display_interval, show_reading, delay=min(config.log_interval, 1))
+    if weather.memory_guard:
+        jobs.add_job("memory", config.memory_guard_interval, weather.memory_guard.check)
+    if config.metrics_file:
+        jobs.add_job("metrics", config.metrics_interval, write_metrics, delay=config.metrics_interval)
+    return jobs
+
+def run_daemon(weather: weather_logger, inky_display, refresh: refresh_controller, icons: dict, masks: dict) -> None:
+    """
+    Keep running until interrupted or sent SIGTERM, then report stats and write the metrics
+    """
+    jobs = get_daemon_scheduler(weather, inky_display, refresh, icons, masks)
+    init_metrics(jobs)
+    signal.signal(signal.SIGTERM, lambda signum, frame: jobs.stop())
+    try:
+        jobs.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Stopping, job stats:", jobs.get_stats())
+        print("NMEA source ages:", weather.watchdog.get_stats())
+        if weather.memory_guard:
+            print("Memory:", weather.memory_guard.get_stats())
+        write_metrics()
+        metrics.get_registry().stop()
+    return None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Log boat weather data to an Inky pHAT")
+    parser.add_argument("--mock", action="store_true", help="Use a mock display instead of the Inky pHAT")
+    parser.add_argument("--resolution", default="212x104", help="Mock display resolution, 212x104 or 250x122")
+    parser.add_argument("--output", help="Save frames shown on the mock display to this PNG file")
+    parser.add_argument("--daemon", action="store_true", help="Keep running, sampling, logging and updating the display on a schedule")
+    args = parser.parse_args()
+
+    # Start the NMEA readers first so their sentence tables fill while the display and icons load
+    weather = weather_logger()
+    try:
+        resolution = tuple(int(size) for size in args.resolution.split("x"))
+        inky_display = get_display(args.mock, resolution, args.output)
+        icons, masks = get_icons(inky_display)
+        refresh = refresh_controller(config.refresh_thresholds, config.display_force_refresh, os.path.join(PATH, config.display_state_file))
+
+        if args.daemon:
+            run_daemon(weather, inky_display, refresh, icons, masks)
+        else:
+            init_metrics()
+            update_display(weather, inky_display, refresh, icons, masks)
+            write_metrics()
+            metrics.get_registry().stop()
+    finally:
+        # Close the connections, flush the data log and stop the provider threads on every run path
+        weather.close()
+    return None
+
+if __name__ == "__main__":
+    main()
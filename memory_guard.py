@@ -0,0 +1,162 @@
+"""
+Opt-in memory guard for long deployments on small boards. Resident memory is
+sampled periodically, stores such as the history and response caches are held
+to byte budgets by shedding their oldest data, and with tracing on, growth
+since startup is attributed to the allocation sites responsible.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+def get_rss() -> int:
+    """
+    Return the process's resident memory in bytes, None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def get_object_size(item) -> int:
+    """
+    Approximate bytes held by item and the dicts, lists, tuples, sets and strings it contains
+    """
+    size = 0
+    seen = set()
+    pending = [item]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            pending.extend(item)
+    return size
+
+class memory_budget:
+    """
+    A store held to budget bytes. get_size() returns its bytes and shed()
+    frees some of its oldest data, returning False once nothing is left to shed.
+    """
+    def __init__(self, name: str, budget: int, get_size, shed) -> None:
+        self.name = name
+        self.budget = budget
+        self.get_size = get_size
+        self.shed = shed
+        self.size = 0
+        self.sheds = 0
+        return None
+
+    def enforce(self, target: int) -> int:
+        """
+        Shed until the store is within target bytes or can shed no more, returns the bytes freed
+        """
+        start = self.size = self.get_size()
+        while self.size > target and self.shed():
+            self.sheds += 1
+            self.size = self.get_size()
+        if self.size < start:
+            print("Shed {} from {} to {} bytes".format(self.name, start, self.size))
+        return start - self.size
+
+class memory_guard:
+    """
+    Samples RSS and the budgeted stores on each check(). A store over its
+    budget is shed back to it, and once RSS passes rss_budget every store is
+    shed to half its size so the process gives way before the OOM killer
+    steps in. With trace, tracemalloc records trace_frames frames per
+    allocation and each check reports the top sites that grew since start().
+    """
+    def __init__(self, rss_budget: int = None, trace: bool = False, trace_frames: int = 1, top: int = 10) -> None:
+        self.rss_budget = rss_budget
+        self.trace = trace
+        self.trace_frames = trace_frames
+        self.top = top
+        self.budgets = []
+        self.baseline = None # tracemalloc snapshot taken by start()
+        self.start_rss = None
+        self.start_time = None
+        self.rss = None
+        self.peak_rss = None
+        self.checks = 0
+        self.pressure_events = 0 # Checks finding RSS over rss_budget
+        return None
+
+    def add_budget(self, name: str, budget: int, get_size, shed) -> memory_budget:
+        new_budget = memory_budget(name, budget, get_size, shed)
+        self.budgets.append(new_budget)
+        return new_budget
+
+    def start(self) -> None:
+        """
+        Record the starting RSS and, when tracing, the baseline allocations that growth is measured from
+        """
+        self.start_rss = get_rss()
+        self.start_time = time.monotonic()
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.trace_frames)
+            self.baseline = tracemalloc.take_snapshot()
+        return None
+
+    def stop(self) -> None:
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.baseline = None
+        return None
+
+    def get_growth(self) -> list:
+        """
+        Return the top allocation sites by growth since start() as ("file:line", bytes, blocks)
+        """
+        if self.baseline is None or not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        growth = []
+        for difference in snapshot.compare_to(self.baseline, "lineno")[:self.top]:
+            if difference.size_diff <= 0:
+                continue
+            frame = difference.traceback[0]
+            growth.append(("{}:{}".format(frame.filename, frame.lineno), difference.size_diff, difference.count_diff))
+        return growth
+
+    def check(self) -> dict:
+        """
+        Sample memory, enforce the budgets and report any growth, returns get_stats()
+        """
+        if self.start_time is None:
+            self.start()
+        self.checks += 1
+        self.rss = get_rss()
+        if self.rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, self.rss)
+        pressure = bool(self.rss_budget and self.rss is not None and self.rss > self.rss_budget)
+        if pressure:
+            self.pressure_events += 1
+            print("Resident memory {} bytes is over the {} byte budget, shedding".format(self.rss, self.rss_budget))
+        for budget in self.budgets:
+            target = budget.budget
+            if pressure:
+                target = min(target, budget.get_size() // 2)
+            budget.enforce(target)
+
+        for site, size, blocks in self.get_growth():
+            print("Memory growth {} bytes in {} blocks at {}".format(size, blocks, site))
+        return self.get_stats()
+
+    def get_stats(self) -> dict:
+        stats = {"rss": self.rss, "peak_rss": self.peak_rss, "checks": self.checks, "pressure_events": self.pressure_events}
+        if self.rss is not None and self.start_rss is not None:
+            hours = (time.monotonic() - self.start_time) / 3600
+            stats["rss_growth"] = self.rss - self.start_rss
+            stats["rss_growth_per_hour"] = round(stats["rss_growth"] / hours) if hours > 0 else None
+        for budget in self.budgets:
+            stats[budget.name] = {"size": budget.size, "budget": budget.budget, "sheds": budget.sheds}
+        return stats
@@ -2,43 +2,187 @@
 This module was written on python v3.11.3
 """
 
-import config
+import base64
 import json
+import os
+import threading
+import time
+from http_client import http_client, get_client
+from geocode import require_geocoder
 
-try:
-    import geocoder
-except ImportError:
-    exit("This class requires the geocoder module\nInstall with: sudo pip install geocoder")
+TOKEN_URL = "https://login.meteomatics.com/api/v1/token"
 
-try:
-    import requests
-except ImportError:
-    exit("This class requires the requests module\nInstall with: sudo pip install requests")
+class token_manager:
+    """
+    Keeps a Meteomatics API token valid. The token and its expiry are saved to
+    token_file, if given, so restarts reuse it, and a background thread renews
+    it refresh_margin seconds before it expires, retrying failed renewals with
+    backoff up to max_retry_delay. lifetime is assumed if the expiry can't be
+    read from the token.
+    """
+    def __init__(self, username: str, password: str, client: http_client, token_file: str = None,
+                 refresh_margin: float = 300, lifetime: float = 2 * 60 * 60, retry_delay: float = 60, max_retry_delay: float = 30 * 60) -> None:
+        self.username = username
+        self.password = password
+        self.client = client
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+        self.lifetime = lifetime
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.token = None
+        self.expires = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.refresher = None
+        self.load_token()
+        return None
+
+    def load_token(self) -> None:
+        if not self.token_file or not os.path.exists(self.token_file):
+            return None
+        try:
+            with open(self.token_file) as token_file:
+                saved = json.load(token_file)
+            if saved["username"] == self.username:
+                self.token = saved["token"]
+                self.expires = float(saved["expires"])
+        except (OSError, ValueError, KeyError, TypeError):
+            print("Ignoring unreadable Meteomatics token file")
+        return None
+
+    def save_token(self) -> None:
+        """
+        Save the token readable only by this user, replacing the old file in one step
+        """
+        if not self.token_file:
+            return None
+        try:
+            directory = os.path.dirname(self.token_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            descriptor = os.open(self.token_file + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(descriptor, "w") as token_file:
+                json.dump({"username": self.username, "token": self.token, "expires": self.expires}, token_file)
+            os.replace(self.token_file + ".tmp", self.token_file)
+        except OSError as error:
+            print("Unable to save Meteomatics token:", error)
+        return None
+
+    def get_token_expiry(self, token: str, now: float) -> float:
+        """
+        Read the expiry time from the token's JWT exp claim, falling back to now + lifetime
+        """
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+        except (IndexError, ValueError, KeyError, TypeError):
+            return now + self.lifetime
+
+    def needs_refresh(self, now: float = None) -> bool:
+        if now is None:
+            now = time.time()
+        return self.token is None or now >= self.expires - self.refresh_margin
+
+    def refresh(self) -> bool:
+        """
+        Fetch a new token, returns True if successful. The old token is kept if
+        the response can't be used.
+        """
+        with self.lock:
+            response = self.client.get(TOKEN_URL, auth=(self.username, self.password))
+            if response is None or response.status_code != 200:
+                print("Error generating auth token, check credentials provided")
+                return False
+            now = time.time()
+            try:
+                token = response.json()["access_token"]
+            except (ValueError, KeyError, TypeError) as error:
+                print("Unusable Meteomatics auth token response:", repr(error))
+                return False
+            if not isinstance(token, str) or not token:
+                print("Unusable Meteomatics auth token response: no access token")
+                return False
+            self.token = token
+            self.expires = self.get_token_expiry(self.token, now)
+            print("Renewed Meteomatics auth token, valid until", time.strftime("%H:%M", time.localtime(self.expires)))
+            self.save_token()
+        return True
+
+    def get_token(self) -> str:
+        """
+        Return a valid token. One is only fetched here if there is none, it has
+        expired or there is no background thread to renew it.
+        """
+        now = time.time()
+        refresher_running = self.refresher is not None and self.refresher.is_alive()
+        if self.token is None or now >= self.expires or (not refresher_running and self.needs_refresh(now)):
+            self.refresh()
+        return self.token
+
+    def get_retry_delay(self, failures: int) -> float:
+        """
+        Seconds to wait before retrying a renewal after failures consecutive failures (1 = first)
+        """
+        return min(self.max_retry_delay, self.retry_delay * 2 ** (failures - 1))
+
+    def run_refresher(self) -> None:
+        failures = 0
+        while not self.stop_event.is_set():
+            if self.needs_refresh() and not self.refresh():
+                failures += 1
+                wait = self.get_retry_delay(failures)
+            else:
+                failures = 0
+                wait = max(1, self.expires - self.refresh_margin - time.time())
+            self.stop_event.wait(wait)
+        return None
+
+    def start_refresher(self) -> None:
+        """
+        Start the background thread that renews the token before it expires
+        """
+        if self.refresher is None or not self.refresher.is_alive():
+            self.stop_event.clear()
+            self.refresher = threading.Thread(target=self.run_refresher, name="meteomatics-token", daemon=True)
+            self.refresher.start()
+        return None
+
+    def stop_refresher(self) -> None:
+        self.stop_event.set()
+        return None
 
 class weather_api:
     """
     Class for interacting with the Meteomatics API, this assume you have a free
     account and you will need to pass your credentials to instantiate.
+    Requests go through the shared http_client unless another client is given.
+    The API token is kept valid in the background and saved to token_file, if given.
     """
-    def __init__(self, username: str, password: str) -> None:
+    def __init__(self, username: str, password: str, client: http_client = None, token_file: str = None,
+                 refresh_margin: float = 300, background_refresh: bool = True) -> None:
         self.username = username
         self.password = password
-        
-        self.get_auth_token(username, password)
+        self.client = client if client is not None else get_client()
+        self.tokens = token_manager(username, password, self.client, token_file, refresh_margin)
+        if background_refresh:
+            self.tokens.start_refresher()
 
         return
 
-    def get_auth_token(self, username: str, password: str) -> int:
-        """Use your Open Meteo login to obtain an API token"""
-        response = requests.get('https://login.meteomatics.com/api/v1/token', auth=(username, password))
-        response.close()
-        if response.status_code == 200:
-            self.auth_token = response.json()["access_token"]
-            print("Auth token:", self.auth_token)
-            return 1
-        else:
-            print("Error generating auth token, check credentials provided")
-            return 0
+    @property
+    def auth_token(self) -> str:
+        return self.tokens.get_token()
+
+    def get_auth_token(self) -> int:
+        """Use your Meteomatics login to obtain a new API token"""
+        return 1 if self.tokens.refresh() else 0
+
+    def get_weather_url(self, latlong: list) -> str:
+        baseurl = "https://api.meteomatics.com/now/"
+        parameters = "msl_pressure:hPa,wind_speed_10m:kn,wind_dir_10m:d,wind_gusts_10m_1h:kn,weather_symbol_1h:idx/"
+        return baseurl + parameters + str(latlong[0]) + "," + str(latlong[1]) + "/json?access_token=" + str(self.auth_token)
 
     def get_weather(self, latlong: list) -> dict:
         """
@@ -49,21 +193,20 @@ class weather_api:
         Returns a dictionary of weather information with human readable key names - Nautical metric units.
         """
         weather = {}
-        baseurl = "https://api.meteomatics.com/now/"
-        parameters = "msl_pressure:hPa,wind_speed_10m:kn,wind_dir_10m:d,wind_gusts_10m_1h:kn,weather_symbol_1h:idx/"
-        url = baseurl + parameters + str(latlong[0]) + "," + str(latlong[1]) +"/json?access_token=" + self.auth_token
-        print(url)
-
-        response = requests.get(url)
-        response.close()
+        response = self.client.get(self.get_weather_url(latlong))
+        if response is None:
+            print("Failure to get weather data, no response")
+            return weather
         print("response data:", response.text)
         print("response code:", response.status_code)
 
         if response.status_code == 403:
             print("Renewing auth token")
-            self.get_auth_token(config.username, config.password)
-            response = requests.get(url)
-            response.close()
+            self.get_auth_token()
+            response = self.client.get(self.get_weather_url(latlong))
+            if response is None:
+                print("Failure to get weather data, no response")
+                return weather
 
         if response.status_code == 200:
             weather = self.process_weather(json.loads(response.text))
@@ -150,6 +293,7 @@ class weather_api:
         """
         Pass a city and country code to get a lat long for weather lookups
         """
+        geocoder = require_geocoder()
         location_string = "{}, {}".format(city, countrycode)
         g = geocoder.arcgis(location_string)
         latlong = g.latlng
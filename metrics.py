@@ -0,0 +1,217 @@
+"""
+Counters and histograms for the logging pipeline, exposed in the Prometheus
+text format as a file (e.g. for the node_exporter textfile collector) or on a
+localhost HTTP endpoint. State the pipeline already counts, such as sentences
+read or cache hits, is gathered by collectors when the metrics are read so the
+NMEA hot path does no extra work.
+"""
+
+import contextlib
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, from parsing a batch of sentences to an e-ink refresh
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def format_labels(labels: tuple) -> str:
+    """
+    Format sorted (name, value) label pairs for the text format
+    Example:
+    format_labels((("id", "$GPRMC"), ("source", "gps"))) = '{id="$GPRMC",source="gps"}'
+    """
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append("{}=\"{}\"".format(name, value))
+    return "{" + ",".join(pairs) + "}"
+
+def get_label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+class histogram:
+    """
+    Cumulative bucket counts, sum and count of observed values
+    """
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        return None
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        return None
+
+    def get_samples(self, name: str, labels: tuple) -> list:
+        """
+        Return (name, labels, value) samples for the text format, buckets cumulative
+        """
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            samples.append((name + "_bucket", labels + (("le", repr(float(bound))),), cumulative))
+        samples.append((name + "_bucket", labels + (("le", "+Inf"),), self.count))
+        samples.append((name + "_sum", labels, self.sum))
+        samples.append((name + "_count", labels, self.count))
+        return samples
+
+class metrics_registry:
+    """
+    Named counters and histograms with optional labels, plus named collectors
+    called at read time. A collector returns a list of (name, labels dict,
+    value) samples, its metrics described with describe().
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.descriptions = {} # name: (type, help)
+        self.counters = {} # name: {label key: value}
+        self.histograms = {} # name: {label key: histogram}
+        self.collectors = {} # name: collector
+        self.server = None
+        return None
+
+    def describe(self, name: str, metric_type: str, help: str) -> None:
+        """
+        Set the type (counter, gauge or histogram) and help text of a metric
+        """
+        self.descriptions[name] = (metric_type, help)
+        return None
+
+    def increment(self, name: str, amount: float = 1, labels: dict = None) -> None:
+        key = get_label_key(labels)
+        with self.lock:
+            values = self.counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + amount
+        return None
+
+    def observe(self, name: str, value: float, labels: dict = None, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        key = get_label_key(labels)
+        with self.lock:
+            values = self.histograms.setdefault(name, {})
+            if key not in values:
+                values[key] = histogram(buckets)
+            values[key].observe(value)
+        return None
+
+    @contextlib.contextmanager
+    def timer(self, name: str, labels: dict = None):
+        """
+        Observe the seconds taken by a with block in histogram name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def add_collector(self, name: str, collector) -> None:
+        """
+        Add a collector, replacing any added before under the same name
+        """
+        self.collectors[name] = collector
+        return None
+
+    def get_value(self, name: str, labels: dict = None) -> float:
+        """
+        Return a counter's value, 0 if it has not been incremented
+        """
+        return self.counters.get(name, {}).get(get_label_key(labels), 0)
+
+    def get_text(self) -> str:
+        """
+        Return every metric in the Prometheus text exposition format
+        """
+        samples = {} # name: [(sample name, labels, value)]
+        with self.lock:
+            for name, values in self.counters.items():
+                samples[name] = [(name, key, value) for key, value in values.items()]
+            for name, values in self.histograms.items():
+                samples[name] = []
+                for key, value in values.items():
+                    samples[name] += value.get_samples(name, key)
+        for collector_name, collector in list(self.collectors.items()):
+            try:
+                collected = collector()
+            except Exception as error:
+                print("Metrics collector {} failed: {}".format(collector_name, error))
+                continue
+            for name, labels, value in collected:
+                samples.setdefault(name, []).append((name, get_label_key(labels), value))
+
+        lines = []
+        for name in sorted(samples):
+            if name in self.descriptions:
+                metric_type, help = self.descriptions[name]
+                lines.append("# HELP {} {}".format(name, help))
+                lines.append("# TYPE {} {}".format(name, metric_type))
+            for sample_name, labels, value in samples[name]:
+                if value is None:
+                    continue
+                lines.append("{}{} {}".format(sample_name, format_labels(labels), repr(float(value))))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write the metrics to path, replacing it in one step so a reader never sees a partial file
+        """
+        temporary = path + ".tmp"
+        with open(temporary, "w") as metrics_file:
+            metrics_file.write(self.get_text())
+        os.replace(temporary, path)
+        return None
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9108) -> tuple:
+        """
+        Serve the metrics at http://host:port/metrics from a background thread, returns the address
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class metrics_handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return None
+                body = registry.get_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return None
+
+            def log_message(self, format: str, *args) -> None:
+                return None # Keep scrapes out of the log
+
+        self.server = ThreadingHTTPServer((host, port), metrics_handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
+        return self.server.server_address
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        return None
+
+shared_registry = None
+
+def get_registry() -> metrics_registry:
+    """
+    Return the metrics registry shared by the whole pipeline
+    """
+    global shared_registry
+    if shared_registry is None:
+        shared_registry = metrics_registry()
+    return shared_registry
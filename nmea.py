@@ -1,12 +1,229 @@
-import telnetlib
+import asyncio
+import random
 import time
-import re
 import config
-import socket
+import threading
+
+# One event loop, run in a background thread, serves every NMEA connection
+event_loop = None
+event_loop_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the event loop shared by all NMEA connections, starting its thread on first use
+    """
+    global event_loop
+    with event_loop_lock:
+        if event_loop is None:
+            event_loop = asyncio.new_event_loop()
+            threading.Thread(target=event_loop.run_forever, name="nmea-event-loop", daemon=True).start()
+    return event_loop
+
+def run_on_event_loop(coroutine, timeout: float = None):
+    """
+    Run a coroutine on the shared NMEA event loop and block for its result
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result(timeout)
+
+def nmea_checksum(data) -> int:
+    """
+    XOR of every byte in data (bytes or memoryview). The bytes are folded in
+    halves as one integer so the work is done in C rather than a loop per byte.
+    """
+    value = int.from_bytes(data, "little")
+    width = len(data)
+    while width > 8:
+        width = (width + 1) // 2
+        value = (value >> (width * 8)) ^ (value & ((1 << (width * 8)) - 1))
+    value ^= value >> 32
+    value ^= value >> 16
+    value ^= value >> 8
+    return value & 0xFF
+
+def split_nmea_words(sentence: str) -> list:
+    """
+    Split the part of a sentence after its ID into words including null values,
+    with the checksum as the last word
+    e.g. "230.5,R,2.9,N,A*32" -> ["230.5", "R", "2.9", "N", "A", "32"]
+    """
+    body, star, checksum = sentence.rstrip("\r\n").partition("*")
+    words = body.split(",")
+    if star:
+        words.append(checksum)
+    return words
+
+class nmea_sentence:
+    """
+    A validated NMEA sentence kept as the bytes it was received as. Words are
+    only split out when first indexed and each is decoded when asked for, so
+    sentences nobody reads (AIS etc.) are never decoded.
+    Indexing matches get_nmea_sentence_words, the words after the sentence ID
+    followed by the checksum.
+    """
+    __slots__ = ("line", "id", "body_start", "body_end", "raw_words")
+
+    def __init__(self, line: bytes, id: str, body_start: int, body_end: int) -> None:
+        self.line = line # With line ending removed
+        self.id = id
+        self.body_start = body_start
+        self.body_end = body_end # Position of the * or the end of the line
+        self.raw_words = None
+        return None
+
+    @property
+    def checksum(self) -> str:
+        return self.line[self.body_end + 1:].decode('ascii')
+
+    def get_raw_words(self) -> list:
+        if self.raw_words is None:
+            self.raw_words = self.line[self.body_start:self.body_end].split(b",")
+            if self.body_end < len(self.line):
+                self.raw_words.append(self.line[self.body_end + 1:])
+        return self.raw_words
+
+    def __len__(self) -> int:
+        return len(self.get_raw_words())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [word.decode('ascii', 'replace') for word in self.get_raw_words()[index]]
+        return self.get_raw_words()[index].decode('ascii', 'replace')
+
+    def words(self) -> list:
+        """
+        Return every word decoded, as get_nmea_sentence_words
+        """
+        return self[:]
+
+    def body(self) -> str:
+        """
+        Return the sentence after its ID as text, e.g. "230.5,R,2.9,N,A*32"
+        """
+        return self.line[self.body_start:].decode('ascii', 'replace')
+
+def parse_sentence(line: bytes) -> nmea_sentence:
+    """
+    Locate the ID, words and checksum of a raw NMEA line and verify the XOR
+    checksum over a memoryview of it. Returns None if the line is malformed or corrupt.
+    Lines with no checksum are only accepted if config.nmea_require_checksum is False.
+    """
+    line = line.rstrip(b"\r\n")
+    start = line.find(b"$")
+    if start == -1:
+        start = line.find(b"!") # AIS and other encapsulated sentences
+        if start == -1:
+            return None
+    separator = line.find(b",", start)
+    if separator == -1:
+        return None
+
+    star = len(line) - 3
+    if star >= separator and line[star] == 42: # "*"
+        try:
+            expected = int(line[star + 1:], 16)
+        except ValueError:
+            return None
+        if nmea_checksum(memoryview(line)[start + 1:star]) != expected:
+            return None
+    elif config.nmea_require_checksum or line.find(b"*", separator) != -1:
+        return None
+    else:
+        star = len(line)
+
+    try:
+        sentence_id = line[start:separator].decode('ascii')
+    except UnicodeDecodeError:
+        return None
+
+    return nmea_sentence(line, sentence_id, separator + 1, star)
+
+def is_checksum_failure(line: bytes) -> bool:
+    """
+    True if a line rejected by parse_sentence is a whole sentence whose *hh
+    checksum doesn't match, rather than a malformed or truncated line
+    """
+    line = line.rstrip(b"\r\n")
+    star = len(line) - 3
+    if star < 1 or line[star] != 42: # "*"
+        return False
+    start = max(line.rfind(b"$", 0, star), line.rfind(b"!", 0, star))
+    if start == -1:
+        return False
+    try:
+        expected = int(line[star + 1:], 16)
+    except ValueError:
+        return False
+    return nmea_checksum(memoryview(line)[start + 1:star]) != expected
+
+class nmea_pool:
+    """
+    One tcp_nmea connection per (host, port), shared by any number of roles
+    such as "gps" and "wind". Each connection is read by one background reader
+    that reconnects with backoff whenever the source drops, so a multiplexer
+    restart only leaves a gap in the readings.
+    """
+    def __init__(self) -> None:
+        self.connections = {} # (host, port): tcp_nmea
+        self.roles = {} # role: (host, port)
+        return None
+
+    def get_connection(self, role: str, host: str, port: int) -> "tcp_nmea":
+        """
+        Return the connection for role, opening one to host:port if no other
+        role uses it. Returns None if host or port is not set. A source that
+        can't be reached yet is retried in the background.
+        """
+        if not host or not port:
+            return None
+        key = (host, port)
+        if key not in self.connections:
+            connection = tcp_nmea()
+            try:
+                connection.connect(host, port)
+            except (asyncio.TimeoutError, OSError) as error:
+                print("Unable to connect to NMEA source {}:{} for {} ({}), retrying in the background".format(host, port, role, error))
+            connection.start_reader(reconnect=True)
+            self.connections[key] = connection
+        self.roles[role] = key
+        return self.connections[key]
+
+    def get_role(self, role: str) -> "tcp_nmea":
+        key = self.roles.get(role)
+        return self.connections.get(key) if key else None
+
+    def get_metrics(self) -> list:
+        """
+        Return (name, labels, value) samples for each connection, a metrics.metrics_registry collector
+        """
+        samples = []
+        for (host, port), connection in self.connections.items():
+            source = "{}:{}".format(host, port)
+            for id, count in list(connection.sentence_counts.items()):
+                samples.append(("nmea_sentences_total", {"source": source, "id": id}, count))
+            samples.append(("nmea_rejected_sentences_total", {"source": source}, connection.rejected_sentences))
+            samples.append(("nmea_checksum_failures_total", {"source": source}, connection.checksum_failures))
+            samples.append(("nmea_reconnects_total", {"source": source}, connection.reconnects))
+            samples.append(("nmea_connected", {"source": source}, int(connection.connected)))
+        return samples
+
+    def close(self) -> None:
+        """
+        Stop every reader and close every connection
+        """
+        for (host, port), connection in self.connections.items():
+            try:
+                connection.disconnect()
+            except (OSError, RuntimeError, asyncio.TimeoutError) as error:
+                print("Error closing NMEA connection {}:{}: {}".format(host, port, error))
+        self.connections = {}
+        self.roles = {}
+        return None
 
 class tcp_nmea:
     """
-    Connect to Telnet NMEA 0183 source over TCP and extract data
+    Connect to NMEA 0183 source over TCP and extract data.
+    Connections are asyncio streams on a shared event loop, the methods below
+    are a synchronous facade over them.
     """
     def __init__(self) -> None:
         self.transducer_types = {
@@ -44,17 +261,217 @@ class tcp_nmea:
             "K": "Knots",
             "M":"m/s"
         }
+        # Latest sentence seen for each talker/sentence ID, e.g.
+        # {"$GPRMC": {"sentence": "124027.00,A,...*63", "received": 1686483627.1}}
+        self.sentences = {}
+        self.sentence_wait = 2 # Seconds to wait for a sentence not yet seen by the reader
+        self.sentences_updated = threading.Condition()
+        self.reader = None
+        self.reader_running = False
+        self.rejected_sentences = 0 # Lines dropped as malformed or failing their checksum
+        self.checksum_failures = 0 # Rejected lines that were whole sentences failing their checksum
+        self.sentence_counts = {} # Sentences stored for each ID, for the metrics
+        self.host = None
+        self.port = None
+        self.stream_reader = None
+        self.stream_writer = None
+        self.connected = False
+        self.connected_since = None # Time the current connection was opened
+        self.reconnect = False # Set by start_reader to keep reconnecting after the connection drops
+        self.reconnects = 0
 
         return None
     
-    def connect(self, host: str, port: int) -> None:
-        self.tn = telnetlib.Telnet(host, port, 2)
+    def connect(self, host: str, port: int, timeout: float = None) -> None:
+        """
+        Open the TCP connection on the shared NMEA event loop, waiting at most
+        timeout seconds, config.nmea_connect_timeout by default
+        """
+        self.host = host
+        self.port = port
+        if timeout is None:
+            timeout = config.nmea_connect_timeout
+        run_on_event_loop(self.open_connection(host, port, timeout))
         return None
-    
-    def disconnect(self):
-        self.tn.get_socket().shutdown(socket.SHUT_WR)
-        data = self.tn.read_all()
-        self.tn.close()
+
+    async def open_connection(self, host: str, port: int, timeout: float) -> None:
+        """
+        Open an asyncio stream to the NMEA source
+        """
+        self.stream_reader, self.stream_writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        self.connected = True
+        self.connected_since = time.time()
+        return None
+
+    def drop_connection(self) -> None:
+        """
+        Forget a failed connection and wake anyone waiting on the sentence table
+        """
+        if self.stream_writer:
+            self.stream_writer.close()
+        self.stream_reader = None
+        self.stream_writer = None
+        self.connected = False
+        self.connected_since = None
+        with self.sentences_updated:
+            self.sentences_updated.notify_all()
+        return None
+
+    def get_reconnect_delay(self, attempt: int) -> float:
+        """
+        Seconds to wait before reconnect attempt (0 = first), doubling each
+        attempt up to config.nmea_reconnect_max_backoff. Half of it is random
+        so connections dropped together don't all retry at once.
+        """
+        delay = min(config.nmea_reconnect_max_backoff, config.nmea_reconnect_backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def start_reader(self, reconnect: bool = False) -> None:
+        """
+        Start a reader task on the shared NMEA event loop that reads every
+        sentence from the connection once and keeps the latest of each in the
+        sentence table. All connections share one loop so sources are read concurrently.
+        With reconnect the reader reopens the connection whenever it drops,
+        or was never made, until stop_reader is called.
+        """
+        if self.reader_running:
+            return None
+        self.reconnect = reconnect
+        self.reader_running = True
+        self.reader = asyncio.run_coroutine_threadsafe(self.read_sentences(), get_event_loop())
+        return None
+
+    def stop_reader(self) -> None:
+        """
+        Stop the background reader, sentences already in the table are kept
+        """
+        self.reader_running = False
+        if self.reader:
+            self.reader.cancel()
+            self.reader = None
+        return None
+
+    async def read_sentences(self) -> None:
+        """
+        Reader task, demultiplex every line from the connection into the sentence table.
+        Reconnects back off until a valid sentence arrives, so a source that
+        accepts and then closes at once is not retried in a tight loop.
+        """
+        attempt = 0
+        try:
+            while self.reader_running:
+                if not self.connected:
+                    if not self.reconnect or self.host is None:
+                        break
+                    try:
+                        await self.open_connection(self.host, self.port, config.nmea_connect_timeout)
+                    except (asyncio.TimeoutError, OSError) as error:
+                        delay = self.get_reconnect_delay(attempt)
+                        attempt += 1
+                        print("Unable to connect to NMEA source {}:{} ({}), retrying in {:.1f}s".format(self.host, self.port, error, delay))
+                        await asyncio.sleep(delay)
+                        continue
+                    self.reconnects += 1
+                    print("Connected to NMEA source {}:{}".format(self.host, self.port))
+
+                try:
+                    line = await self.stream_reader.readline()
+                except (ConnectionError, OSError):
+                    line = b""
+                if not line:
+                    self.drop_connection()
+                    if not self.reconnect:
+                        print("NMEA connection to {}:{} closed, stopping reader".format(self.host, self.port))
+                        continue
+                    delay = self.get_reconnect_delay(attempt)
+                    attempt += 1
+                    print("NMEA connection to {}:{} closed, reconnecting in {:.1f}s".format(self.host, self.port, delay))
+                    await asyncio.sleep(delay)
+                    continue
+                if self.process_line(line, time.time()) is not None:
+                    attempt = 0
+        finally:
+            self.reader_running = False
+            with self.sentences_updated:
+                self.sentences_updated.notify_all()
+        return None
+
+    async def read_until_sentence(self, id: str) -> nmea_sentence:
+        """
+        Read lines from the connection, discarding them until a valid sentence
+        with the given ID is found, and return it
+        """
+        while True:
+            line = await self.stream_reader.readline()
+            if not line:
+                raise EOFError("NMEA connection closed")
+            sentence = self.parse_line(line)
+            if sentence and sentence.id == id:
+                return sentence
+
+    def parse_line(self, line: bytes) -> nmea_sentence:
+        """
+        Parse a raw line, counting it in rejected_sentences if it is malformed or fails its checksum
+        """
+        sentence = parse_sentence(line)
+        if sentence is None and line.strip():
+            self.rejected_sentences += 1
+            if is_checksum_failure(line):
+                self.checksum_failures += 1
+        return sentence
+
+    def process_line(self, line: bytes, received: float) -> nmea_sentence:
+        """
+        Parse a raw NMEA line and store it in the sentence table against its
+        talker/sentence ID with the time it was received. Returns the
+        sentence, or None if the line was rejected.
+        """
+        sentence = self.parse_line(line)
+        if sentence is None:
+            return None
+
+        with self.sentences_updated:
+            self.sentences[sentence.id] = {"sentence": sentence, "received": received}
+            self.sentence_counts[sentence.id] = self.sentence_counts.get(sentence.id, 0) + 1
+            self.sentences_updated.notify_all()
+        return sentence
+
+    def get_latest_sentence(self, id: str) -> dict:
+        """
+        Return the latest table entry for a sentence ID (e.g. "$GPRMC") without
+        touching the connection, or an empty dict if it has not been seen
+        """
+        return self.sentences.get(id, {})
+
+    def disconnect(self) -> bytes:
+        """
+        Stop reading, close the connection and return any data left unread
+        """
+        self.stop_reader()
+        return run_on_event_loop(self.close_connection())
+
+    async def close_connection(self) -> bytes:
+        """
+        Half close the stream, drain what the source still sends and close
+        """
+        data = b""
+        if self.stream_writer is None:
+            return data
+        if self.stream_writer.can_write_eof():
+            self.stream_writer.write_eof()
+        try:
+            data = await asyncio.wait_for(self.stream_reader.read(), 2)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            pass
+        self.stream_writer.close()
+        try:
+            await self.stream_writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+        self.stream_reader = None
+        self.stream_writer = None
+        self.connected = False
+        self.connected_since = None
         return data
 
     def get_transducer_types(self) -> dict:
@@ -69,28 +486,96 @@ class tcp_nmea:
         """
         return self.transducer_units
 
-    def get_nmea_sentence(self, id: str) -> list:
+    def get_nmea_sentence(self, id: str) -> str:
         """
-        Scan for specific sentence id (e.g. "$GPRMC") and return that line
+        Return the latest sentence for a specific sentence id (e.g. "$GPRMC").
+        With the reader running this is a table lookup, waiting at most
+        sentence_wait seconds for an ID that has not been seen yet. Without the
+        reader, scan the connection for the next occurrence of that sentence,
+        giving up once the sentence would be stale.
         """
-        sentence_id = id + ","
-        sentence_id = sentence_id.encode('ascii')
+        if self.reader_running:
+            sentence = self.wait_for_sentence(id)
+            return sentence.body() if sentence else ""
 
-        self.tn.read_until(sentence_id).decode('ascii')
+        try:
+            sentence = run_on_event_loop(asyncio.wait_for(self.read_until_sentence(id), self.get_stale_after(id)))
+        except asyncio.TimeoutError:
+            return "" # Source quiet for longer than the sentence is fresh
 
-        sentence = self.tn.read_until(b"\n").decode('ascii')
+        return sentence.body()
 
-        return sentence
+    def wait_for_sentence(self, id: str) -> nmea_sentence:
+        """
+        Return the latest parsed sentence for an ID from the table, waiting at
+        most sentence_wait seconds if it has not been seen yet. A stale
+        sentence is not returned, so old values never pass for live ones, and
+        a sentence that has not arrived since connecting is not waited on once
+        it would be stale.
+        """
+        if self.is_stale(id):
+            return None
+        with self.sentences_updated:
+            self.sentences_updated.wait_for(lambda: id in self.sentences or not self.reader_running or not self.connected, self.sentence_wait)
+        if self.is_stale(id):
+            return None
+        return self.get_latest_sentence(id).get("sentence")
+
+    def get_stale_after(self, id: str) -> float:
+        """
+        Seconds after it was received that a sentence ID is stale, from config.nmea_stale_after
+        """
+        return config.nmea_stale_after.get(id, config.nmea_stale_default)
+
+    def get_sentence_age(self, id: str, now: float = None) -> float:
+        """
+        Seconds since a sentence ID was last received, None if it has not been seen
+        """
+        received = self.get_latest_sentence(id).get("received")
+        if received is None:
+            return None
+        if now is None:
+            now = time.time()
+        return max(0.0, now - received)
+
+    def is_stale(self, id: str, now: float = None) -> bool:
+        """
+        True if a sentence ID has not been seen within its staleness threshold,
+        or has never been seen on a connection open for longer than that
+        """
+        age = self.get_sentence_age(id, now)
+        if age is None:
+            if self.connected_since is None:
+                return False
+            if now is None:
+                now = time.time()
+            age = now - self.connected_since
+        return age > self.get_stale_after(id)
+
+    def is_available(self, id: str, now: float = None) -> bool:
+        """
+        False if a sentence ID can't be fresh, because it is stale, has not
+        arrived since connecting or the reader is waiting to reconnect, so
+        callers can skip the source rather than wait on it
+        """
+        if self.reader_running and not self.connected:
+            return False
+        return not self.is_stale(id, now)
     
     def get_nmea_sentence_words(self, id: str) -> list:
         """
-        Request a sentence based on ID (e.g. "$GPRMC") and return a comma separated list of sentence words including null values
+        Request a sentence based on ID (e.g. "$GPRMC") and return a comma separated list of sentence words including null values.
+        With the reader running the parsed sentence is returned as is, indexing it only decodes the words used.
         """
+        if self.reader_running:
+            sentence = self.wait_for_sentence(id)
+            return sentence if sentence else []
+
         sentence = self.get_nmea_sentence(id)
-        
-        words = re.split(',|\*', sentence) # Split on comma and * for checksum
+        if not sentence:
+            return []
 
-        return words
+        return split_nmea_words(sentence)
 
     def get_datetime(self) -> time:
         """
@@ -139,7 +624,9 @@ class tcp_nmea:
         Find transducer sentence and extract all items, return a list of readings
         using transducer types and units where valid (get_transducer_types, get_transducer_units)
         """
-        weather_data = self.get_nmea_sentence_words("$YXXDR")
+        weather_data = list(self.get_nmea_sentence_words("$YXXDR"))
+        # Stamp readings with when the sentence arrived, the time of the scan without the reader
+        received = self.get_latest_sentence("$YXXDR").get("received", time.time())
         
         weather_readings = {}
         while len(weather_data) >= 4:
@@ -151,7 +638,7 @@ class tcp_nmea:
 
             weather_readings[weather_data[0]] = {"value" : weather_data[1], "unit" : weather_data[2], "label" : weather_data[3]}
             weather_data = weather_data[4:]
-            weather_readings["timestamp"] = time.time()      
+            weather_readings["timestamp"] = received
 
         return weather_readings
     
@@ -181,7 +668,8 @@ class tcp_nmea:
         cog_sog_data = {}
 
         cog_sog_words = self.get_nmea_sentence_words("$GPVTG")
-        cog_sog_data["cog"] = cog_sog_words[1]
-        cog_sog_data["sog"] = cog_sog_words[5]
+        if cog_sog_words:
+            cog_sog_data["cog"] = cog_sog_words[1]
+            cog_sog_data["sog"] = cog_sog_words[5]
         
         return cog_sog_data
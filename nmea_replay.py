@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the NMEA multiplexer, serving recorded NMEA logs or a
+synthetic stream of RMC, VTG, MWV and XDR sentences with AIS traffic and line
+noise over TCP. Rates, corruption and disconnects are configurable so
+nmea.tcp_nmea can be exercised and benchmarked without the boat.
+Run: python nmea_replay.py --rate 10 --port 2000 [--log recorded.nmea]
+"""
+
+import argparse
+import itertools
+import math
+import random
+import socket
+import threading
+import time
+from nmea import nmea_checksum
+
+AIS_SENTENCES = [
+    b"!AIVDM,1,1,,B,177KQJ5000G?tO`K>RA1wUbN0TKH,0*5C\r\n",
+    b"!AIVDM,1,1,,A,13u?etPv2;0n:dDPwUM1U1Cb069D,0*24\r\n",
+]
+
+def make_sentence(body: str, start: str = "$") -> bytes:
+    """
+    Add the start character, checksum and line ending to a sentence body
+    Example:
+    make_sentence("IIMWV,230.5,R,2.9,N,A") = b"$IIMWV,230.5,R,2.9,N,A*32\r\n"
+    """
+    data = body.encode('ascii')
+    return start.encode('ascii') + data + "*{:02X}\r\n".format(nmea_checksum(memoryview(data))).encode('ascii')
+
+def synthetic_sentences(seed: int = None, start_time: float = None, noise: float = 0.02, ais: float = 0.2):
+    """
+    Endless generator of sentences as a multiplexer would send them: one
+    RMC, VTG, MWV and XDR per simulated second, slowly varying, with AIS
+    sentences and lines of noise mixed in at the given proportions
+    """
+    generator = random.Random(seed)
+    timestamp = time.time() if start_time is None else start_time
+    lat, long = 50.8834, -1.3036
+    course, speed = 45.0, 5.0
+    wind_angle, wind_speed = -40.0, 12.0
+    temperature, pressure, humidity = 18.0, 1.01325, 70.0
+    for second in itertools.count():
+        moment = time.gmtime(timestamp + second)
+        course = (course + generator.uniform(-2, 2)) % 360
+        speed = max(0.0, speed + generator.uniform(-0.2, 0.2))
+        wind_angle = max(-180.0, min(180.0, wind_angle + generator.uniform(-3, 3)))
+        wind_speed = max(0.0, wind_speed + generator.uniform(-0.5, 0.5))
+        temperature += generator.uniform(-0.05, 0.05)
+        pressure += generator.uniform(-0.00005, 0.00005)
+        humidity = max(0.0, min(100.0, humidity + generator.uniform(-0.2, 0.2)))
+        lat_minutes = abs(lat) % 1 * 60
+        long_minutes = abs(long) % 1 * 60
+        sentences = [
+            make_sentence("GPRMC,{},A,{:02d}{:08.5f},{},{:03d}{:08.5f},{},{:.3f},{:.1f},{},,,A".format(
+                time.strftime("%H%M%S.00", moment), int(abs(lat)), lat_minutes, "N" if lat >= 0 else "S",
+                int(abs(long)), long_minutes, "E" if long >= 0 else "W", speed, course, time.strftime("%d%m%y", moment))),
+            make_sentence("GPVTG,,{:03.0f},T,{:03.0f},M,{:.1f},N,{:.3f},K,A".format(course, (course + 3) % 360, speed, speed * 1.852)),
+            make_sentence("IIMWV,{:.1f},R,{:.1f},N,A".format(wind_angle % 360, wind_speed)),
+            make_sentence("YXXDR,C,{:.2f},C,AIRTEMP,P,{:.5f},B,BARO,H,{:.2f},P,HUMIDITY".format(temperature, pressure, humidity)),
+        ]
+        for sentence in sentences:
+            yield sentence
+            if generator.random() < ais:
+                yield generator.choice(AIS_SENTENCES)
+            if generator.random() < noise:
+                yield bytes(generator.randrange(32, 127) for character in range(generator.randrange(1, 40))) + b"\r\n"
+        # Move one second along the course, a knot is a nautical mile (a minute of latitude) an hour
+        lat += speed / 3600 / 60 * math.cos(math.radians(course))
+        long += speed / 3600 / 60 * math.sin(math.radians(course)) / math.cos(math.radians(lat))
+
+def load_log(log_file: str) -> list:
+    """
+    Read a recorded NMEA log, one sentence per line, as lines ending \\r\\n
+    """
+    lines = []
+    with open(log_file, "rb") as log:
+        for line in log:
+            line = line.rstrip(b"\r\n")
+            if line:
+                lines.append(line + b"\r\n")
+    return lines
+
+def corrupt_line(line: bytes, generator: random.Random) -> bytes:
+    """
+    Damage a line the way a noisy link would, flipping a character or truncating it
+    """
+    body = bytearray(line.rstrip(b"\r\n"))
+    if len(body) > 2 and generator.random() < 0.5:
+        position = generator.randrange(1, len(body))
+        body[position] = body[position] ^ 0x01
+    else:
+        body = body[:generator.randrange(1, max(2, len(body)))]
+    return bytes(body) + b"\r\n"
+
+class replay_server:
+    """
+    TCP server sending lines, from a list (replayed in a loop if repeat) or a
+    generator such as synthetic_sentences(), to each client that connects, one
+    client at a time. rate is sentences per second, 0 to send as fast as
+    possible. corruption is the share of lines damaged and disconnect_after
+    closes each client connection after that many lines.
+    Stats are kept in sent, corrupted and connections.
+    """
+    def __init__(self, source, rate: float = 10, corruption: float = 0.0, disconnect_after: int = None,
+                 repeat: bool = True, host: str = "127.0.0.1", port: int = 0, seed: int = None) -> None:
+        if isinstance(source, list):
+            self.lines = itertools.cycle(source) if repeat else iter(source)
+        else:
+            self.lines = iter(source)
+        self.rate = rate
+        self.corruption = corruption
+        self.disconnect_after = disconnect_after
+        self.generator = random.Random(seed)
+        self.sent = 0
+        self.corrupted = 0
+        self.connections = 0
+        self.finished = False # Set when a finite source has been sent in full
+        self.stop_event = threading.Event()
+        self.server = socket.create_server((host, port))
+        self.server.settimeout(0.2)
+        self.address = self.server.getsockname()
+        self.thread = None
+        return None
+
+    def start(self) -> tuple:
+        """
+        Start serving in a background thread and return the (host, port) listened on
+        """
+        self.thread = threading.Thread(target=self.serve, name="nmea-replay", daemon=True)
+        self.thread.start()
+        return self.address
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(2)
+        self.server.close()
+        return None
+
+    def serve(self) -> None:
+        while not self.stop_event.is_set() and not self.finished:
+            try:
+                connection, address = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.connections += 1
+            try:
+                self.send_lines(connection)
+            except OSError:
+                pass # Client went away, wait for the next one
+            finally:
+                connection.close()
+        return None
+
+    def get_batch(self, size: int) -> list:
+        batch = []
+        for line in itertools.islice(self.lines, size):
+            if self.corruption and self.generator.random() < self.corruption:
+                line = corrupt_line(line, self.generator)
+                self.corrupted += 1
+            batch.append(line)
+        if len(batch) < size:
+            self.finished = True
+        return batch
+
+    def send_lines(self, connection: socket.socket) -> None:
+        """
+        Send lines to one client at the configured rate, in batches every 10ms at high rates
+        """
+        sent_here = 0
+        tick = 0.01 if self.rate == 0 or self.rate > 100 else 1 / self.rate
+        per_tick = 256 if self.rate == 0 else max(1, round(self.rate * tick))
+        next_send = time.monotonic()
+        while not self.stop_event.is_set():
+            size = per_tick
+            if self.disconnect_after is not None:
+                size = min(size, self.disconnect_after - sent_here)
+            batch = self.get_batch(size)
+            if batch:
+                connection.sendall(b"".join(batch))
+                sent_here += len(batch)
+                self.sent += len(batch)
+            if self.finished or (self.disconnect_after is not None and sent_here >= self.disconnect_after):
+                break
+            if self.rate:
+                next_send += tick
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        connection.shutdown(socket.SHUT_WR)
+        return None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve recorded or synthetic NMEA sentences over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2000)
+    parser.add_argument("--log", help="Recorded NMEA log to replay in a loop, synthetic sentences if not given")
+    parser.add_argument("--rate", type=float, default=10, help="Sentences per second, 0 for as fast as possible")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="Share of sentences to corrupt, e.g. 0.01")
+    parser.add_argument("--disconnect-after", type=int, help="Drop each client after this many sentences")
+    parser.add_argument("--seed", type=int, help="Random seed for repeatable streams")
+    args = parser.parse_args()
+
+    source = load_log(args.log) if args.log else synthetic_sentences(args.seed)
+    server = replay_server(source, args.rate, args.corrupt, args.disconnect_after, host=args.host, port=args.port, seed=args.seed)
+    print("Serving NMEA on {}:{}".format(*server.start()))
+    try:
+        while server.thread.is_alive():
+            server.thread.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print("Sent {} sentences ({} corrupted) to {} connections".format(server.sent, server.corrupted, server.connections))
+    return None
+
+if __name__ == "__main__":
+    main()
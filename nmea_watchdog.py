@@ -0,0 +1,65 @@
+"""
+Staleness watchdog for the NMEA sources, reporting when a source stops sending
+a sentence and when it comes back, with the age of each source's latest data.
+"""
+
+import time
+
+class staleness_watchdog:
+    """
+    Watches named sources, each a sentence ID on a tcp_nmea connection, e.g.
+    watch("wind", wind_nmea, "$IIMWV"). A source is quiet once its sentence is
+    stale, has not arrived since connecting or its connection is down, see
+    tcp_nmea.is_available.
+    """
+    def __init__(self) -> None:
+        self.sources = {} # name: (connection, sentence ID)
+        self.quiet_since = {} # name: time the source was first found quiet
+        self.alerts = 0 # Sources that have gone quiet, counting each time
+        return None
+
+    def watch(self, name: str, connection, id: str) -> None:
+        """
+        Watch sentence ID on connection as source name, ignored if the connection is not configured
+        """
+        if connection:
+            self.sources[name] = (connection, id)
+        return None
+
+    def is_quiet(self, name: str) -> bool:
+        return name in self.quiet_since
+
+    def check(self, now: float = None) -> list:
+        """
+        Check each source, report any that have gone quiet or recovered since
+        the last check and return the names of those now quiet
+        """
+        if now is None:
+            now = time.time()
+        for name, (connection, id) in self.sources.items():
+            available = connection.is_available(id, now)
+            if not available and name not in self.quiet_since:
+                self.quiet_since[name] = now
+                self.alerts += 1
+                age = connection.get_sentence_age(id, now)
+                if age is None and connection.connected_since is not None:
+                    print("NMEA source {} ({}) is quiet, nothing received since connecting {:.0f}s ago".format(name, id, now - connection.connected_since))
+                elif age is None:
+                    print("NMEA source {} ({}) is quiet, not connected".format(name, id))
+                else:
+                    print("NMEA source {} ({}) is quiet, last received {:.0f}s ago".format(name, id, age))
+            elif available and name in self.quiet_since:
+                print("NMEA source {} ({}) recovered after {:.0f}s".format(name, id, now - self.quiet_since.pop(name)))
+        return list(self.quiet_since)
+
+    def get_stats(self, now: float = None) -> dict:
+        """
+        Age in seconds of each source's latest sentence, None if not seen, and whether it is quiet
+        """
+        if now is None:
+            now = time.time()
+        stats = {}
+        for name, (connection, id) in self.sources.items():
+            age = connection.get_sentence_age(id, now)
+            stats[name] = {"id": id, "age": None if age is None else round(age, 1), "quiet": name in self.quiet_since}
+        return stats
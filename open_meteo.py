@@ -5,45 +5,83 @@ This module was written on python v3.9.2
 
 import json
 import time
+from forecast import hourly_forecast
+from response_cache import response_cache
+from http_client import http_client, get_client
+from geocode import require_geocoder
 
-try:
-    import geocoder
-except ImportError:
-    exit("This class requires the geocoder module\nInstall with: sudo pip install geocoder")
-
-try:
-    import requests
-except ImportError:
-    exit("This class requires the requests module\nInstall with: sudo pip install requests")
+# Readings returned by weather_api.get_weather and the hourly variable each comes from
+HOURLY_VARIABLES = {
+    "temperature": "temperature_2m",
+    "dewpoint": "dewpoint_2m",
+    "weather_code": "weathercode",
+    "pressure": "pressure_msl",
+    "wind_speed": "windspeed_10m",
+    "wind_direction": "winddirection_10m",
+    "wind_gusts": "windgusts_10m"
+}
 
 class weather_api:
     """
     Class for interacting with the Open_Meteo API
+    Pass a response_cache to reuse responses for the same place within the hour.
+    Requests go through the shared http_client unless another client is given.
     """
-    def __init__(self) -> None:
+    def __init__(self, cache: response_cache = None, client: http_client = None) -> None:
+        self.cache = cache
+        self.client = client if client is not None else get_client()
         return
 
-    def get_weather(self, latlong: list, offset_hours: int) -> dict:
+    def get_query(self, offset_hours: int, readings: list = None) -> str:
+        """
+        Return the query parameters for readings, any of HOURLY_VARIABLES, over
+        just the current hour and offset_hours before. Without readings every
+        variable is requested for yesterday and today.
+        Returns "" if none of the readings are available.
+        """
+        if readings is None:
+            return "&hourly=temperature_2m,dewpoint_2m,weathercode,pressure_msl,windspeed_10m,winddirection_10m,windgusts_10m&current_weather=true&past_days=1&forecast_days=1&windspeed_unit=kn&timezone=GB&timeformat=unixtime"
+        variables = [HOURLY_VARIABLES[reading] for reading in HOURLY_VARIABLES if reading in readings]
+        if not variables:
+            return ""
+        return "&hourly={}&past_hours={}&forecast_hours=1&windspeed_unit=kn&timezone=GB&timeformat=unixtime".format(",".join(variables), offset_hours)
+
+    def get_weather(self, latlong: list, offset_hours: int, readings: list = None) -> dict:
         """
         Get basic weather information for a specified location as of now and offset_hours in the past to a maximum of 24
         Provide a lat and long in decimal format array with Lattitude in 0
         postion and Longitude in 1
         e.g. latlong[50.9048, -1.4043] for Southampton UK.
+        Pass a list of readings, keys of HOURLY_VARIABLES, to only fetch those, e.g. ["pressure", "weather_code"]
         Returns a dictionary of weather information with human readable key names - Nautical metric units.
         """
         weather = {}
         baseurl = "https://api.open-meteo.com/v1/forecast?latitude={}&longitude={}".format(latlong[0], latlong[1])
-        parameters = "&hourly=temperature_2m,dewpoint_2m,weathercode,pressure_msl,windspeed_10m,winddirection_10m,windgusts_10m&current_weather=true&past_days=1&forecast_days=1&windspeed_unit=kn&timezone=GB&timeformat=unixtime"
+        parameters = self.get_query(offset_hours, readings)
+        if not parameters:
+            return weather
         url = baseurl + parameters
+
+        if self.cache is not None:
+            key = self.cache.get_key(latlong, parameters)
+            cached = self.cache.get(key)
+            if cached is not None:
+                print("Using cached weather data for", key)
+                return self.process_weather(cached, offset_hours)
+
         print(url)
 
-        response = requests.get(url)
-        response.close()
-        print("response data:", response.text)
+        response = self.client.get(url)
+        if response is None:
+            print("Failure to get weather data, no response")
+            return weather
         print("response code:", response.status_code)
 
         if response.status_code == 200:
-            weather = self.process_weather(json.loads(response.text), offset_hours)
+            response_json = json.loads(response.text)
+            if self.cache is not None:
+                self.cache.put(key, response_json)
+            weather = self.process_weather(response_json, offset_hours)
         else:
             print("Failure to get weather data.\nStatus code: {}\nResponse text: {}".format(response.status_code, response.text))
 
@@ -57,11 +95,9 @@ class weather_api:
         
         """
         weather = {}
-        data = response_text_json["hourly"]
-        print("JSON data:", data, "\n")
-        hour = time.localtime()[3]
-        current_hour = hour + 24
-        offset_hour = current_hour - offset_hours
+        forecast = hourly_forecast(response_text_json["hourly"])
+        now = time.time()
+        offset_time = now - offset_hours * 3600
         
         #Weather codes from: https://www.meteomatics.com/en/api/available-parameters/derived-weather-and-convenience-parameters/general-weather-state/#weather_symb
         icon_map = {
@@ -73,28 +109,25 @@ class weather_api:
             "wind": []
         }
         
-        weather["temperature"] = data["temperature_2m"][current_hour]
-        weather["offset_temperature"] = data["temperature_2m"][offset_hour]
-        weather["dewpoint"] = data["dewpoint_2m"][current_hour]
-        weather["offset_dewpoint"] = data["dewpoint_2m"][offset_hour]
-        weather["weather_code"] = data["weathercode"][current_hour]
-        weather["offset_weather_code"] = data["weathercode"][offset_hour]
-        weather["pressure"] = data["pressure_msl"][current_hour]
-        weather["offset_pressure"] = data["pressure_msl"][offset_hour]
-        weather["wind_speed"] = data["windspeed_10m"][current_hour]
-        weather["offset_wind_speed"] = data["windspeed_10m"][offset_hour]
-        weather["wind_direction"] = data["winddirection_10m"][current_hour]
-        weather["offset_wind_direction"] = data["winddirection_10m"][offset_hour]
-        weather["wind_gusts"] = data["windgusts_10m"][current_hour]
-        weather["offset_wind_gusts"] = data["windgusts_10m"][offset_hour]
+        for reading, variable in HOURLY_VARIABLES.items():
+            if variable not in forecast:
+                continue
+            for key, timestamp in ((reading, now), ("offset_" + reading, offset_time)):
+                value = forecast.get_value(variable, timestamp, reading != "weather_code", reading == "wind_direction")
+                if value is None:
+                    continue
+                if reading in ["weather_code", "wind_direction"]:
+                    weather[key] = round(value)
+                else:
+                    weather[key] = round(value, 1)
 
         for icon in icon_map:
-            if weather["weather_code"] in icon_map[icon]:
+            if weather.get("weather_code") in icon_map[icon]:
                 weather["weather_icon"] = icon
                 break
         
         for icon in icon_map:
-            if weather["offset_weather_code"] in icon_map[icon]:
+            if weather.get("offset_weather_code") in icon_map[icon]:
                 weather["offset_weather_icon"] = icon
                 break
         
@@ -107,6 +140,7 @@ class weather_api:
         """
         Pass a city and country code to get a lat long for weather lookups
         """
+        geocoder = require_geocoder()
         location_string = "{}, {}".format(city, countrycode)
         g = geocoder.arcgis(location_string)
         latlong = g.latlng
@@ -0,0 +1,192 @@
+"""
+Online weather providers behind one interface. Enabled providers are queried
+concurrently with a deadline and their readings merged by health, priority
+and freshness, while per-provider latency and success rate are tracked so a
+failing provider gives way to a healthy one and the fastest is preferred.
+"""
+
+import time
+import metrics
+from concurrent.futures import ThreadPoolExecutor, wait
+
+class weather_provider:
+    """
+    Base class for online weather providers. Subclasses implement fetch() and
+    return readings keyed as open_meteo.HOURLY_VARIABLES plus "weather_icon",
+    with offset readings prefixed "offset_".
+    Lower priority values are preferred, providers sharing a priority form a tier.
+    """
+    name = "provider"
+
+    def __init__(self, priority: int = 0) -> None:
+        self.priority = priority
+        self.attempts = 0
+        self.successes = 0
+        self.latency = None # Moving average of successful request seconds
+        return None
+
+    def fetch(self, lat_long: list, offset_hours: int, readings: list) -> tuple:
+        """
+        Return (readings dict, data time) for the position, data time being when the readings apply
+        """
+        raise NotImplementedError
+
+    def get_success_rate(self) -> float:
+        """
+        Share of recent requests that returned data, an untried provider counts as healthy
+        """
+        return (self.successes + 1) / (self.attempts + 1)
+
+    def record(self, success: bool, latency: float) -> None:
+        """
+        Update the stats after a request, recent requests count for most
+        """
+        if self.attempts >= 20:
+            # Decay old results so a provider that recovers is trusted again
+            self.successes *= 19 / 20
+            self.attempts *= 19 / 20
+        self.attempts += 1
+        if success:
+            self.successes += 1
+            self.latency = latency if self.latency is None else self.latency * 0.7 + latency * 0.3
+        return None
+
+    def get_rank(self) -> tuple:
+        """
+        Sort key preferring healthy providers, then priority, then the fastest
+        within a priority tier, so a failing provider ranks behind every healthy one
+        """
+        healthy = self.get_success_rate() >= 0.5
+        latency = self.latency if self.latency is not None else 0
+        return (not healthy, self.priority, latency)
+
+    def get_stats(self) -> dict:
+        return {"priority": self.priority, "attempts": round(self.attempts, 1), "success_rate": round(self.get_success_rate(), 2),
+                "latency": None if self.latency is None else round(self.latency, 3)}
+
+class open_meteo_provider(weather_provider):
+    """
+    Open-Meteo hourly model data through an open_meteo.weather_api
+    """
+    name = "open_meteo"
+
+    def __init__(self, api, priority: int = 0) -> None:
+        super().__init__(priority)
+        self.api = api
+        return None
+
+    def fetch(self, lat_long: list, offset_hours: int, readings: list) -> tuple:
+        now = time.time()
+        return (self.api.get_weather(lat_long, offset_hours, readings), now - now % 3600)
+
+class meteomatics_provider(weather_provider):
+    """
+    Meteomatics current conditions through a meteomatics.weather_api, which
+    has no offset readings and its own weather symbols, mapped here to icons
+    """
+    name = "meteomatics"
+
+    # Weather symbol (day, night is +100) to icon name
+    icon_map = {1: "sun", 2: "cloud", 3: "cloud", 4: "cloud", 5: "rain", 6: "snow", 7: "snow", 8: "rain",
+                9: "snow", 10: "snow", 11: "cloud", 12: "cloud", 13: "rain", 14: "storm", 15: "rain", 16: "wind"}
+
+    def __init__(self, api, priority: int = 0) -> None:
+        super().__init__(priority)
+        self.api = api
+        return None
+
+    def fetch(self, lat_long: list, offset_hours: int, readings: list) -> tuple:
+        weather = self.api.get_weather(lat_long)
+        code = weather.pop("weather_code", None)
+        weather.pop("weather_icon", None)
+        if code is not None and code % 100 in self.icon_map:
+            weather["weather_icon"] = self.icon_map[code % 100]
+        return (weather, time.time())
+
+class provider_registry:
+    """
+    Providers queried together for each online lookup
+    """
+    def __init__(self, deadline: float = 30) -> None:
+        self.deadline = deadline
+        self.providers = []
+        self.executor = None
+        return None
+
+    def __len__(self) -> int:
+        return len(self.providers)
+
+    def register(self, provider: weather_provider) -> None:
+        self.providers.append(provider)
+        return None
+
+    def get_ranked_providers(self) -> list:
+        """
+        Providers best first, see weather_provider.get_rank()
+        """
+        return sorted(self.providers, key=lambda provider: provider.get_rank())
+
+    def fetch(self, provider: weather_provider, lat_long: list, offset_hours: int, readings: list) -> tuple:
+        """
+        Run one provider's fetch, recording its latency and whether it returned data
+        """
+        start = time.monotonic()
+        try:
+            weather, data_time = provider.fetch(lat_long, offset_hours, readings)
+        except Exception as error:
+            print("{} weather lookup failed: {}".format(provider.name, error))
+            weather, data_time = {}, 0
+        latency = time.monotonic() - start
+        provider.record(bool(weather), latency)
+        registry = metrics.get_registry()
+        registry.observe("weather_provider_request_seconds", latency, {"provider": provider.name})
+        if not weather:
+            registry.increment("weather_provider_failures_total", labels={"provider": provider.name})
+        return (weather, data_time)
+
+    def get_weather(self, lat_long: list, offset_hours: int, readings: list = None) -> dict:
+        """
+        Query every provider at once and merge what arrives within the deadline.
+        Each reading is taken from the healthy providers before failing ones,
+        then by priority, then from the freshest data within a priority tier,
+        ties going to the fastest.
+        """
+        if not self.providers:
+            return {}
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.providers), thread_name_prefix="weather-provider")
+        futures = {}
+        for provider in self.get_ranked_providers():
+            futures[self.executor.submit(self.fetch, provider, lat_long, offset_hours, readings)] = provider
+        done, late = wait(futures, timeout=self.deadline)
+        for future in late:
+            print("{} weather lookup missed the {}s deadline".format(futures[future].name, self.deadline))
+            metrics.get_registry().increment("weather_provider_deadline_misses_total", labels={"provider": futures[future].name})
+
+        results = []
+        for future in done:
+            provider = futures[future]
+            weather, data_time = future.result()
+            if weather:
+                unhealthy, priority, latency = provider.get_rank()
+                results.append(((unhealthy, priority, -data_time, latency), weather))
+        results.sort(key=lambda result: result[0])
+
+        merged = {}
+        for rank, weather in results:
+            for reading, value in weather.items():
+                if value is not None and reading not in merged:
+                    merged[reading] = value
+        return merged
+
+    def get_stats(self) -> dict:
+        stats = {}
+        for provider in self.providers:
+            stats[provider.name] = provider.get_stats()
+        return stats
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        return None
@@ -0,0 +1,102 @@
+"""
+NumPy batched versions of the weather_logger humidity functions, for working
+over whole history series in one call instead of a Python loop per reading.
+Formulas and constants match the scalar methods in weather_logger.
+"""
+
+from constants import *
+
+numpy = None # Imported on first use, it takes seconds to load on a Pi Zero
+
+def require_numpy() -> None:
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("Batched psychrometric functions require the numpy module\nInstall with: sudo apt install python3-numpy")
+    return None
+
+def celcius_to_kelvin(temperature_in_c):
+    require_numpy()
+    return numpy.asarray(temperature_in_c, dtype=float) + 273.15
+
+# https://www.omnicalculator.com/physics/dew-point#how-to-calculate-dew-point-how-to-calculate-relative-humidity
+def get_dew_point(temperature_in_c, relative_humidity):
+    """
+    Dew point in C for arrays of temperature in C and relative humidity in %
+    """
+    require_numpy()
+    temperature_in_c = numpy.asarray(temperature_in_c, dtype=float)
+    relative_humidity = numpy.asarray(relative_humidity, dtype=float)
+    alphatrh = (numpy.log((relative_humidity / 100))) + ((17.625 * temperature_in_c) / (243.04 + temperature_in_c))
+    return (243.04 * alphatrh) / (17.625 - alphatrh)
+
+# https://www.calctool.org/atmospheric-thermodynamics/absolute-humidity#what-is-and-how-to-calculate-absolute-humidity
+def relative_to_absolute_humidity(relative_humidity, temperature_in_c):
+    """
+    Absolute humidity in kg/m3 for arrays of relative humidity in % and temperature in C
+    """
+    require_numpy()
+    temperature_in_k = celcius_to_kelvin(temperature_in_c)
+    actual_vapor_pressure = get_actual_vapor_pressure(relative_humidity, temperature_in_k)
+
+    return actual_vapor_pressure / (WATER_VAPOR_SPECIFIC_GAS_CONSTANT * temperature_in_k)
+
+def absolute_to_relative_humidity(absolute_humidity, temperature_in_c):
+    """
+    Relative humidity in % for arrays of absolute humidity in kg/m3 and temperature in C
+    """
+    require_numpy()
+    temperature_in_k = celcius_to_kelvin(temperature_in_c)
+    saturation_vapor_pressure = get_saturation_vapor_pressure(temperature_in_k)
+
+    return (WATER_VAPOR_SPECIFIC_GAS_CONSTANT * temperature_in_k * numpy.asarray(absolute_humidity, dtype=float)) / saturation_vapor_pressure * 100
+
+# https://www.calctool.org/atmospheric-thermodynamics/absolute-humidity#actual-vapor-pressure
+# http://cires1.colorado.edu/~voemel/vp.html
+def get_actual_vapor_pressure(relative_humidity, temperature_in_k):
+    require_numpy()
+    return get_saturation_vapor_pressure(temperature_in_k) * (numpy.asarray(relative_humidity, dtype=float) / 100)
+
+def get_saturation_vapor_pressure(temperature_in_k):
+    """
+    Saturation vapour pressure in Pa for an array of temperature in K
+    """
+    require_numpy()
+    temperature_in_k = numpy.asarray(temperature_in_k, dtype=float)
+    v = 1 - (temperature_in_k / CRITICAL_WATER_TEMPERATURE)
+
+    # empirical constants
+    a1 = -7.85951783
+    a2 = 1.84408259
+    a3 = -11.7866497
+    a4 = 22.6807411
+    a5 = -15.9618719
+    a6 = 1.80122502
+
+    return CRITICAL_WATER_PRESSURE * numpy.exp(
+        CRITICAL_WATER_TEMPERATURE /
+        temperature_in_k *
+        (a1*v + a2*v**1.5 + a3*v**3 + a4*v**3.5 + a5*v**4 + a6*v**7.5)
+    )
+
+def get_humidity_series(temperature_times, temperatures, humidity_times, humidities) -> dict:
+    """
+    Pair temperature and humidity samples taken at the same times, typically
+    from history ring_buffer.get_range(), and return numpy arrays of
+    {"timestamps", "dewpoint", "absolute_humidity"} computed in one batch.
+    Typed arrays are read in place rather than copied.
+    """
+    require_numpy()
+    temperature_times = numpy.frombuffer(temperature_times, dtype=float)
+    humidity_times = numpy.frombuffer(humidity_times, dtype=float)
+    timestamps, temperature_index, humidity_index = numpy.intersect1d(temperature_times, humidity_times, assume_unique=True, return_indices=True)
+    temperature_in_c = numpy.frombuffer(temperatures, dtype=float)[temperature_index]
+    relative_humidity = numpy.frombuffer(humidities, dtype=float)[humidity_index]
+
+    series = {}
+    series["timestamps"] = timestamps
+    series["dewpoint"] = get_dew_point(temperature_in_c, relative_humidity)
+    series["absolute_humidity"] = relative_to_absolute_humidity(relative_humidity, temperature_in_c)
+    return series
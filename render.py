@@ -0,0 +1,102 @@
+"""
+Draw the logger display as a palettised image, independent of the display
+hardware so layout can be exercised and benchmarked on any machine.
+"""
+
+import time
+from PIL import Image, ImageDraw, ImageFont
+
+# Inky pHAT palette indexes
+WHITE = 0
+BLACK = 1
+RED = 2
+
+PALETTE = [255, 255, 255, 0, 0, 0, 255, 0, 0]
+
+RESOLUTIONS = ((212, 104), (250, 122))
+
+# (snapshot key, format) for each row under the time, in display order
+ROWS = [
+    ("temperature", "{} C"),
+    ("pressure", "{} hPa"),
+    ("wind_speed", "{} kts"),
+    ("wind_gusts", "{} kts Gust"),
+    ("wind_direction", "{} Deg"),
+    ("dewpoint", "{} C Dew")
+]
+
+# https://webpagepublicity.com/free-fonts-e.html#FreeFonts
+bigfont = None
+littlefont = None
+
+def load_fonts() -> None:
+    global bigfont, littlefont
+    if bigfont is None:
+        bigfont = ImageFont.load_default()
+        # bigfont = ImageFont.truetype("facet.ttf", 14)
+        littlefont = ImageFont.load_default()
+        # littlefont = ImageFont.truetype("facet.ttf", 12)
+    return None
+
+def format_value(template: str, value) -> str:
+    """
+    Fill a row template, showing -- for a missing value
+    """
+    if value is None:
+        return template.format("--")
+    if isinstance(value, float):
+        value = round(value, 1)
+    return template.format(value)
+
+def format_lat_long(lat_long: list) -> str:
+    """
+    Format a signed decimal degrees [lat, long], showing -- if missing or not numeric
+    """
+    try:
+        return "{}N, {}E".format(round(float(lat_long[0]), 4), round(float(lat_long[1]), 4))
+    except (TypeError, ValueError, IndexError):
+        return "--N, --E"
+
+def draw_column(image: Image.Image, draw: ImageDraw.ImageDraw, snapshot: dict, prefix: str, x: int, colour: int, icons: dict, masks: dict) -> None:
+    """
+    Draw one column of readings, prefix "" for current or "offset_" for the offset readings
+    """
+    width, height = image.size
+    row_height = (height - 11) // 7
+
+    reading_time = snapshot.get(prefix + "time")
+    datetime = time.strftime("%d/%m %H:%M", time.localtime(reading_time)) if reading_time else "--/-- --:--"
+    draw.text((x, 0), datetime, colour, font=bigfont)
+
+    for row, (key, template) in enumerate(ROWS, 1):
+        draw.text((x, 2 + row * row_height), format_value(template, snapshot.get(prefix + key)), colour, font=littlefont)
+    draw.text((x, 2 + 7 * row_height), format_lat_long(snapshot.get(prefix + "lat_long")), colour, font=littlefont)
+
+    icon = snapshot.get(prefix + "weather_icon")
+    if icon in icons:
+        icon_x = x + width // 2 - icons[icon].size[0] - 8
+        image.paste(icons[icon], (icon_x, 10), masks[icon])
+    return None
+
+def render_frame(snapshot: dict, resolution: tuple, icons: dict = {}, masks: dict = {}) -> Image.Image:
+    """
+    Render a weather snapshot to a palettised image for a 212x104 or 250x122 display.
+    The snapshot holds "time", "lat_long", the ROWS readings and "weather_icon",
+    and the same keys prefixed "offset_" for the right hand column. Missing
+    keys or None values are shown as --.
+    """
+    if tuple(resolution) not in RESOLUTIONS:
+        raise RuntimeError("This display does not support {}x{}".format(*resolution))
+    load_fonts()
+
+    image = Image.new("P", tuple(resolution))
+    image.putpalette(PALETTE)
+    draw = ImageDraw.Draw(image)
+    width, height = image.size
+
+    # Draw line to separate the weather data
+    draw.line((width / 2, 2, width / 2, height - 2), RED) # Centre division
+
+    draw_column(image, draw, snapshot, "", 0, BLACK, icons, masks)
+    draw_column(image, draw, snapshot, "offset_", width // 2 + 5, RED, icons, masks)
+    return image
@@ -0,0 +1,116 @@
+"""
+Cache of online weather responses keyed by position rounded to the model grid
+and the hour, so repeated lookups within the hour, even across reboots, do not
+use the network.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+
+class response_cache:
+    """
+    Least recently used cache of decoded JSON responses held in memory and saved
+    to cache_file, if given. Entries expire ttl seconds after they were stored
+    and the least recently used are dropped beyond max_entries.
+    Positions are rounded to grid degrees, e.g. 0.1 for a ~11 km weather model.
+    """
+    def __init__(self, cache_file: str = None, ttl: float = 3600, max_entries: int = 24, grid: float = 0.1) -> None:
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.grid = grid
+        self.entries = OrderedDict() # key: {"stored": timestamp, "response": data}, oldest use first
+        self.hits = 0
+        self.misses = 0
+        self.load()
+        return None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_key(self, lat_long: list, query: str = "", now: float = None) -> str:
+        """
+        Return the cache key for a position, query and the hour containing now
+        """
+        if now is None:
+            now = time.time()
+        lat = round(round(float(lat_long[0]) / self.grid) * self.grid, 4)
+        long = round(round(float(lat_long[1]) / self.grid) * self.grid, 4)
+        return "{},{},{},{}".format(lat, long, int(now // 3600), query)
+
+    def get(self, key: str, now: float = None):
+        """
+        Return the cached response for key, or None if missing or expired
+        """
+        if now is None:
+            now = time.time()
+        entry = self.entries.get(key)
+        if entry is None or now - entry["stored"] >= self.ttl or now < entry["stored"]:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry["response"]
+
+    def put(self, key: str, response, now: float = None) -> None:
+        """
+        Store a decoded response, dropping expired and least recently used entries
+        """
+        if now is None:
+            now = time.time()
+        self.entries[key] = {"stored": now, "response": response}
+        self.entries.move_to_end(key)
+        self.expire(now)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.save()
+        return None
+
+    def drop_oldest(self) -> bool:
+        """
+        Drop the least recently used entry to free memory, False if the cache is empty
+        """
+        if not self.entries:
+            return False
+        self.entries.popitem(last=False)
+        return True
+
+    def expire(self, now: float) -> None:
+        for key in [key for key, entry in self.entries.items() if now - entry["stored"] >= self.ttl]:
+            del self.entries[key]
+        return None
+
+    def load(self) -> None:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file) as cache_file:
+                entries = json.load(cache_file)
+            for key, entry in entries:
+                self.entries[key] = {"stored": float(entry["stored"]), "response": entry["response"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            print("Ignoring unreadable weather cache file")
+            self.entries.clear()
+        self.expire(time.time())
+        return None
+
+    def save(self) -> None:
+        """
+        Write the cache to cache_file, replacing the old file in one step
+        """
+        if not self.cache_file:
+            return None
+        try:
+            directory = os.path.dirname(self.cache_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.cache_file + ".tmp", "w") as cache_file:
+                json.dump(list(self.entries.items()), cache_file)
+            os.replace(self.cache_file + ".tmp", self.cache_file)
+        except (OSError, TypeError, ValueError) as error:
+            print("Unable to save weather cache:", error)
+        return None
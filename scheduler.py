@@ -0,0 +1,120 @@
+"""
+Cadence scheduler for running the logger as a long-lived daemon, each job on
+its own interval, with overruns detected and reported rather than letting
+jobs pile up.
+"""
+
+import threading
+import time
+
+class job:
+    """
+    A function run every interval seconds. An overrun is a run that took
+    longer than its interval, or that started so late whole runs were missed.
+    """
+    def __init__(self, name: str, interval: float, function, delay: float = 0) -> None:
+        self.name = name
+        self.interval = interval
+        self.function = function
+        self.delay = delay # Seconds after the scheduler starts before the first run
+        self.next_run = None
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0
+        self.skipped = 0 # Runs missed because the job or others overran
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        return None
+
+    def get_stats(self) -> dict:
+        return {"interval": self.interval, "runs": self.runs, "errors": self.errors, "overruns": self.overruns,
+                "skipped": self.skipped, "last_duration": round(self.last_duration, 3), "max_duration": round(self.max_duration, 3)}
+
+class scheduler:
+    """
+    Runs jobs on their cadences in the calling thread, one at a time, on the
+    monotonic clock so changes to the system time don't disturb the schedule.
+    Missed runs are skipped, not caught up, so an overrun never causes a burst.
+    """
+    def __init__(self) -> None:
+        self.jobs = []
+        self.stop_event = threading.Event()
+        return None
+
+    def add_job(self, name: str, interval: float, function, delay: float = 0) -> job:
+        """
+        Schedule function() every interval seconds, first after delay seconds
+        """
+        new_job = job(name, interval, function, delay)
+        self.jobs.append(new_job)
+        return new_job
+
+    def run_job(self, due_job: job, now: float) -> None:
+        """
+        Run a due job, record how long it took and schedule its next run
+        """
+        late = now - due_job.next_run
+        missed = int(late // due_job.interval)
+        if missed:
+            due_job.skipped += missed
+            due_job.overruns += 1
+            print("Job {} started {:.1f}s late, skipping {} run(s)".format(due_job.name, late, missed))
+
+        start = time.monotonic()
+        try:
+            due_job.function()
+        except Exception as error:
+            due_job.errors += 1
+            print("Job {} failed: {}".format(due_job.name, error))
+        duration = time.monotonic() - start
+        due_job.runs += 1
+        due_job.last_duration = duration
+        due_job.max_duration = max(due_job.max_duration, duration)
+        if duration > due_job.interval:
+            due_job.overruns += 1
+            print("Job {} overran, took {:.1f}s of its {}s interval".format(due_job.name, duration, due_job.interval))
+
+        # Keep to the original cadence, moving past any runs already missed
+        due_job.next_run += due_job.interval * (missed + 1)
+        return None
+
+    def run_pending(self, now: float = None) -> float:
+        """
+        Run every job that is due, most overdue first, and return the seconds until the next is due
+        """
+        clock = now is None
+        if clock:
+            now = time.monotonic()
+        for scheduled_job in self.jobs:
+            if scheduled_job.next_run is None:
+                scheduled_job.next_run = now + scheduled_job.delay
+        for due_job in sorted(self.jobs, key=lambda scheduled_job: scheduled_job.next_run):
+            if due_job.next_run <= now:
+                self.run_job(due_job, now)
+                if clock:
+                    now = time.monotonic()
+        if not self.jobs:
+            return None
+        return max(0, min(scheduled_job.next_run for scheduled_job in self.jobs) - now)
+
+    def run(self) -> None:
+        """
+        Run jobs until stop() is called
+        """
+        self.stop_event.clear()
+        while not self.stop_event.is_set():
+            wait = self.run_pending()
+            if wait is None:
+                break
+            self.stop_event.wait(wait)
+        return None
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        return None
+
+    def get_stats(self) -> dict:
+        stats = {}
+        for scheduled_job in self.jobs:
+            stats[scheduled_job.name] = scheduled_job.get_stats()
+        return stats
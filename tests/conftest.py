@@ -0,0 +1,26 @@
+import pytest
+from tests.offline_settings import OFFLINE_SETTINGS
+
+@pytest.fixture(autouse=True)
+def data_files(tmp_path, mocker):
+    """
+    Point the data log, caches and state files at a temporary directory so
+    tests never read or write the real files under data/
+    """
+    mocker.patch("config.data_log_file", str(tmp_path / "weather_log.bin"))
+    mocker.patch("config.weather_cache_file", str(tmp_path / "weather_cache.json"))
+    mocker.patch("config.geocode_cache_file", str(tmp_path / "geocode_cache.json"))
+    mocker.patch("config.display_state_file", str(tmp_path / "display_state.json"))
+    mocker.patch("config.meteomatics_token_file", str(tmp_path / "meteomatics_token.json"))
+    mocker.patch("config.icon_mask_cache", False)
+    mocker.patch("config.metrics_file", False)
+    return tmp_path
+
+@pytest.fixture
+def offline_config(mocker):
+    """
+    Configure no NMEA sources and keep the data log and weather cache in memory
+    """
+    for setting in OFFLINE_SETTINGS:
+        mocker.patch("config." + setting, False)
+    return None
@@ -0,0 +1,7 @@
+"""
+Settings turned off to run the logger offline, with no NMEA sources and the
+data log and weather cache in memory. Shared by the tests and the benchmarks.
+"""
+
+OFFLINE_SETTINGS = ["gps_nmea_host", "gps_nmea_port", "wind_nmea_host", "wind_nmea_port", "sensors_nmea_host", "sensors_nmea_port",
+                    "data_log_file", "weather_cache_file"]
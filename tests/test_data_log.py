@@ -0,0 +1,128 @@
+from data_log import data_log, RECORD_SIZE, RECORD_V1, CRC, MAGIC
+import math
+import os
+import zlib
+
+def write_records(path: str, count: int, retention_hours: float = 24) -> data_log:
+    log = data_log(path, retention_hours, 60)
+    for minute in range(count):
+        log.append(1687600000 + minute * 60, {"temperature": 20.5, "pressure": 1000 + minute, "humidity": None, "latitude": 50.88339, "longitude": -1.30363})
+    return log
+
+def test_append_and_reload(tmp_path):
+    """
+    Test records are reloaded with missing values as None
+    """
+    path = str(tmp_path / "weather.log")
+    write_records(path, 5).close()
+    log = data_log(path, 24, 60)
+    records = log.load(0)
+    assert len(records) == 5
+    timestamp, readings = records[4]
+    assert timestamp == 1687600240
+    assert readings["pressure"] == 1004
+    assert readings["temperature"] == 20.5
+    assert readings["humidity"] == None
+    assert readings["latitude"] == 50.88339
+
+def test_wind_gusts_logged(tmp_path):
+    """
+    Test wind gusts are stored and reloaded with the other readings
+    """
+    path = str(tmp_path / "weather.log")
+    log = data_log(path, 24, 60)
+    log.append(1687600000, {"wind_speed": 12.5, "wind_gusts": 18.25})
+    log.close()
+    timestamp, readings = data_log(path, 24, 60).load(0)[0]
+    assert readings["wind_speed"] == 12.5
+    assert readings["wind_gusts"] == 18.25
+
+def test_version_1_log_upgraded(tmp_path):
+    """
+    Test a log written before wind gusts were stored is upgraded when opened, keeping its records
+    """
+    path = str(tmp_path / "weather.log")
+    with open(path, "wb") as log_file:
+        for minute in range(3):
+            record = RECORD_V1.pack(MAGIC, 1, 1687600000 + minute * 60, 20.5, 1000 + minute, math.nan, 12.5, 180, 50.88339, -1.30363)
+            log_file.write(record + CRC.pack(zlib.crc32(record)))
+    log = data_log(path, 24, 60)
+    records = log.load(0)
+    assert [record[1]["pressure"] for record in records] == [1000, 1001, 1002]
+    assert records[2][1]["wind_direction"] == 180
+    assert records[2][1]["wind_gusts"] is None
+    assert records[2][1]["humidity"] is None
+    assert records[2][1]["latitude"] == 50.88339
+    log.append(1687600000 + 3 * 60, {"pressure": 1003, "wind_gusts": 20})
+    log.close()
+    assert [record[1]["wind_gusts"] for record in data_log(path, 24, 60).load(0)] == [None, None, None, 20]
+    assert not os.path.exists(path + ".tmp")
+
+def test_load_since(tmp_path):
+    """
+    Test only records at or after the given time are loaded
+    """
+    log = write_records(str(tmp_path / "weather.log"), 10)
+    records = log.load(1687600000 + 7 * 60)
+    assert [record[1]["pressure"] for record in records] == [1007, 1008, 1009]
+
+def test_unflushed_records_survive_reopen(tmp_path):
+    """
+    Test records written through the map are visible after the process loses the log without closing it
+    """
+    path = str(tmp_path / "weather.log")
+    log = write_records(path, 3)
+    log.mmap.flush()
+    reopened = data_log(path, 24, 60)
+    assert len(reopened.load(0)) == 3
+
+def test_torn_last_record_truncated(tmp_path):
+    """
+    Test a file cut off part way through a record reloads the complete records and appends after them
+    """
+    path = str(tmp_path / "weather.log")
+    write_records(path, 4).close()
+    with open(path, "r+b") as log_file:
+        log_file.truncate(3 * RECORD_SIZE + RECORD_SIZE // 2)
+    log = data_log(path, 24, 60)
+    assert len(log.load(0)) == 3
+    assert log.discarded_records == 1
+    log.append(1687600000 + 10 * 60, {"pressure": 1010})
+    log.close()
+    records = data_log(path, 24, 60).load(0)
+    assert [record[1]["pressure"] for record in records] == [1000, 1001, 1002, 1010]
+
+def test_corrupt_last_record(tmp_path):
+    """
+    Test a record with a bad checksum ends the log
+    """
+    path = str(tmp_path / "weather.log")
+    write_records(path, 4).close()
+    with open(path, "r+b") as log_file:
+        log_file.seek(3 * RECORD_SIZE + 12)
+        log_file.write(b"\xff\xff")
+    log = data_log(path, 24, 60)
+    assert len(log.load(0)) == 3
+
+def test_grow_past_preallocation(tmp_path):
+    """
+    Test the file grows when the preallocated records are used
+    """
+    path = str(tmp_path / "weather.log")
+    log = write_records(path, 300)
+    log.close()
+    assert os.path.getsize(path) == 512 * RECORD_SIZE
+    assert len(data_log(path, 24, 60).load(0)) == 300
+
+def test_compact(tmp_path):
+    """
+    Test the log is compacted to the retention period when full
+    """
+    path = str(tmp_path / "weather.log")
+    log = write_records(path, 200, 1)
+    assert log.count <= log.max_records
+    records = log.load(0)
+    assert records[-1][1]["pressure"] == 1199
+    assert records[-1][0] - records[0][0] < 2 * 3600
+    assert len(records) < 200
+    assert not os.path.exists(path + ".tmp")
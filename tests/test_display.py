@@ -0,0 +1,78 @@
+from display import refresh_controller
+from PIL import Image, ImageDraw
+
+class fake_display:
+    def __init__(self) -> None:
+        self.shown = 0
+    def set_image(self, image) -> None:
+        self.image = image
+    def show(self) -> None:
+        self.shown += 1
+
+def frame(text: str) -> Image.Image:
+    image = Image.new("P", (212, 104))
+    ImageDraw.Draw(image).text((0, 0), text, 1)
+    return image
+
+thresholds = {"pressure": 0.5, "wind_speed": 1, "wind_direction": 10, "lat_long": 0.01}
+
+def test_first_frame_shown():
+    """
+    Test the first frame is always pushed
+    """
+    display = fake_display()
+    controller = refresh_controller(thresholds, 3600)
+    assert controller.refresh(display, frame("a"), {"pressure": 1000.0}, 0)
+    assert display.shown == 1
+
+def test_identical_frame_skipped():
+    """
+    Test an unchanged frame is not pushed
+    """
+    display = fake_display()
+    controller = refresh_controller(thresholds, 3600)
+    controller.refresh(display, frame("a"), {"pressure": 1000.0}, 0)
+    assert not controller.refresh(display, frame("a"), {"pressure": 1000.0}, 60)
+    assert display.shown == 1
+    assert controller.skipped == 1
+
+def test_changes_below_threshold_skipped():
+    """
+    Test a frame whose values moved less than their thresholds is not pushed, even if pixels differ
+    """
+    display = fake_display()
+    controller = refresh_controller(thresholds, 3600)
+    controller.refresh(display, frame("10:00"), {"pressure": 1000.0, "wind_speed": 10, "wind_direction": 355, "lat_long": [50.9, -1.4]}, 0)
+    assert not controller.refresh(display, frame("10:01"), {"pressure": 1000.4, "wind_speed": 10.5, "wind_direction": 3, "lat_long": [50.905, -1.4]}, 60)
+    assert controller.refresh(display, frame("10:02"), {"pressure": 1000.5, "wind_speed": 10.5, "wind_direction": 3, "lat_long": [50.905, -1.4]}, 120)
+    assert display.shown == 2
+
+def test_untracked_value_change_shown():
+    """
+    Test values without thresholds refresh on any change
+    """
+    display = fake_display()
+    controller = refresh_controller(thresholds, 3600)
+    controller.refresh(display, frame("a"), {"weather_icon": "sun"}, 0)
+    assert controller.refresh(display, frame("b"), {"weather_icon": "rain"}, 60)
+
+def test_forced_refresh():
+    """
+    Test an unchanged frame is pushed once the forced refresh interval passes
+    """
+    display = fake_display()
+    controller = refresh_controller(thresholds, 3600)
+    controller.refresh(display, frame("a"), {}, 0)
+    assert not controller.refresh(display, frame("a"), {}, 3599)
+    assert controller.refresh(display, frame("a"), {}, 3600)
+
+def test_state_persisted(tmp_path):
+    """
+    Test a new controller, as in the next cron run, compares against the last pushed frame
+    """
+    state_file = str(tmp_path / "display_state.json")
+    display = fake_display()
+    refresh_controller(thresholds, 3600, state_file).refresh(display, frame("a"), {"pressure": 1000.0, "lat_long": [50.9, -1.4]}, 0)
+    controller = refresh_controller(thresholds, 3600, state_file)
+    assert not controller.refresh(display, frame("b"), {"pressure": 1000.1, "lat_long": [50.9, -1.4]}, 60)
+    assert display.shown == 1
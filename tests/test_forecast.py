@@ -0,0 +1,47 @@
+from forecast import hourly_forecast
+import pytest
+
+HOURLY = {
+    "time": [1687622400, 1687626000, 1687629600, 1687633200],
+    "pressure_msl": [1021.5, 1021.0, None, 1020.3],
+    "winddirection_10m": [350, 10, 20, 30],
+    "weathercode": [0, 0, 2, 61]
+}
+
+def test_columns_are_typed():
+    """
+    Test each variable is held as a typed column alongside the time index
+    """
+    forecast = hourly_forecast(HOURLY)
+    assert len(forecast) == 4
+    assert forecast.columns["pressure_msl"].typecode == "d"
+    assert "weathercode" in forecast
+    assert "humidity" not in forecast
+
+def test_exact_and_interpolated_values():
+    """
+    Test values on the hour are exact and values between hours are interpolated
+    """
+    forecast = hourly_forecast(HOURLY)
+    assert forecast.get_value("pressure_msl", 1687622400) == 1021.5
+    assert forecast.get_value("pressure_msl", 1687624200) == pytest.approx(1021.25)
+    assert forecast.get_value("weathercode", 1687631400, interpolate=False) == 2
+
+def test_circular_interpolation():
+    """
+    Test directions are interpolated the short way round through north
+    """
+    forecast = hourly_forecast(HOURLY)
+    assert forecast.get_value("winddirection_10m", 1687624200, circular=True) == pytest.approx(0)
+
+def test_out_of_range_and_missing():
+    """
+    Test times outside the forecast and missing values return None
+    """
+    forecast = hourly_forecast(HOURLY)
+    assert forecast.get_value("pressure_msl", 1687622399) is None
+    assert forecast.get_value("pressure_msl", 1687633200 + 3599) == 1020.3
+    assert forecast.get_value("pressure_msl", 1687633200 + 3600) is None
+    assert forecast.get_value("pressure_msl", 1687629600) is None
+    assert forecast.get_value("pressure_msl", 1687627000) == 1021.0
+    assert forecast.get_value("humidity", 1687629600) is None
@@ -0,0 +1,50 @@
+import geocode
+import os
+
+GAZETTEER = os.path.join(os.path.dirname(__file__), "..", "resources", "gazetteer.csv")
+
+def test_gazetteer_lookup():
+    """
+    Test exact lookups ignore case and unknown places return None
+    """
+    places = geocode.gazetteer(GAZETTEER)
+    assert places.lookup("southampton", "GB") == [50.9049, -1.4043]
+    assert places.lookup("Southampton", "gb") == [50.9049, -1.4043]
+    assert places.lookup("Atlantis", "GB") is None
+
+def test_gazetteer_prefix_search():
+    """
+    Test prefix search returns matches in name order, filtered by country
+    """
+    places = geocode.gazetteer(GAZETTEER)
+    names = [place[0] for place in places.search("Port")]
+    assert names == ["Portland", "Portsmouth"]
+    assert [place[0] for place in places.search("st", "jE")] == ["St Helier"]
+    assert places.search("zzz") == []
+
+def test_geocode_cache_persists(tmp_path):
+    """
+    Test cached positions are reloaded from disk
+    """
+    cache_file = os.path.join(tmp_path, "geocode.json")
+    geocode.geocode_cache(cache_file).put("Hamble", "GB", [50.8596, -1.3235])
+    assert geocode.geocode_cache(cache_file).get("hamble", "gb") == [50.8596, -1.3235]
+
+def test_resolve_order(mocker):
+    """
+    Test the cache is used first, then the gazetteer and only then the network
+    """
+    online = mocker.Mock(return_value=[51.123456, -2.123456])
+    places = geocode.gazetteer(GAZETTEER)
+    cache = geocode.geocode_cache()
+    assert geocode.resolve_latlong("Poole", "GB", cache, places, online) == [50.715, -1.9872]
+    assert geocode.resolve_latlong("Nowhere", "GB", cache, places, online) == [51.1235, -2.1235]
+    assert geocode.resolve_latlong("Nowhere", "GB", cache, places, online) == [51.1235, -2.1235]
+    assert online.call_count == 1
+
+def test_resolve_offline_failure(mocker):
+    """
+    Test a failed online lookup resolves to an empty position
+    """
+    online = mocker.Mock(side_effect=TypeError("'NoneType' object is not subscriptable"))
+    assert geocode.resolve_latlong("Nowhere", "GB", None, None, online) == []
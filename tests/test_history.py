@@ -0,0 +1,179 @@
+from history import ring_buffer, history_store, rollup_tier, tiered_history
+import pytest
+
+def test_ring_buffer_append():
+    """
+    Test samples are kept oldest first until capacity
+    """
+    buffer = ring_buffer(3)
+    buffer.append(10, 1.0)
+    buffer.append(20, 2.0)
+    assert len(buffer) == 2
+    assert buffer.oldest() == (10, 1.0)
+    assert buffer.latest() == (20, 2.0)
+
+def test_ring_buffer_overwrite():
+    """
+    Test the oldest sample is overwritten once full and memory stays fixed
+    """
+    buffer = ring_buffer(3)
+    for timestamp in range(5):
+        buffer.append(timestamp, timestamp * 10.0)
+    assert len(buffer) == 3
+    assert len(buffer.values) == 3
+    assert buffer.oldest() == (2, 20.0)
+    assert buffer.latest() == (4, 40.0)
+
+def test_ring_buffer_out_of_order():
+    """
+    Test appending an older sample is refused
+    """
+    buffer = ring_buffer(3)
+    buffer.append(20, 2.0)
+    with pytest.raises(ValueError):
+        buffer.append(10, 1.0)
+
+def test_ring_buffer_value_at():
+    """
+    Test lookup returns the newest sample at or before the time within tolerance
+    """
+    buffer = ring_buffer(4)
+    for timestamp in range(0, 600, 60):
+        buffer.append(timestamp, timestamp / 60)
+    assert buffer.value_at(420, 120) == 7.0
+    assert buffer.value_at(450, 120) == 7.0
+    assert buffer.value_at(10000, 120) == None
+    assert buffer.value_at(300, 120) == None
+
+def test_ring_buffer_get_range():
+    """
+    Test a time range is returned oldest first across the wrap point
+    """
+    buffer = ring_buffer(4)
+    for timestamp in range(6):
+        buffer.append(timestamp, timestamp * 1.0)
+    timestamps, values = buffer.get_range(3, 10)
+    assert list(timestamps) == [3, 4, 5]
+    assert list(values) == [3.0, 4.0, 5.0]
+
+def test_history_store_capacity():
+    """
+    Test buffers are sized from retention and interval
+    """
+    store = history_store(24, 60)
+    assert store.capacity == 1441
+    assert len(store.get_channel("pressure").values) == 1441
+
+def test_history_store_offset_lookup():
+    """
+    Test readings logged offset hours ago are returned, missing channels are None
+    """
+    store = history_store(24, 60)
+    for minute in range(0, 4 * 60):
+        store.record(minute * 60, {"temperature": 20 + minute, "pressure": 1000.0, "humidity": None})
+    readings = store.get_readings_at(90)
+    assert readings["temperature"] == 21.0
+    assert readings["pressure"] == 1000.0
+    assert readings["humidity"] == None
+    assert readings["latitude"] == None
+
+def test_history_store_replaces_within_interval():
+    """
+    Test readings closer together than the interval replace the last sample
+    """
+    store = history_store(1, 60)
+    store.record(0, {"pressure": 1000.0})
+    store.record(30, {"pressure": 1001.0})
+    store.record(60, {"pressure": 1002.0})
+    buffer = store.get_channel("pressure")
+    assert len(buffer) == 2
+    assert buffer.oldest() == (30, 1001.0)
+    store.record(10, {"pressure": 999.0})
+    assert buffer.latest() == (60, 1002.0)
+
+def test_rollup_tier_aggregates():
+    """
+    Test each period keeps min, max, mean and last, stored once the next period starts
+    """
+    tier = rollup_tier(60, 1)
+    for second, value in [(0, 3.0), (20, 1.0), (40, 5.0), (59, 3.0)]:
+        tier.add(second, value)
+    assert len(tier) == 0
+    tier.add(60, 10.0)
+    aggregates = tier.get_aggregates(0, 60)
+    assert list(aggregates["time"]) == [0]
+    assert (aggregates["min"][0], aggregates["max"][0], aggregates["mean"][0], aggregates["last"][0]) == (1.0, 5.0, 3.0, 3.0)
+    tier.add(30, 100.0)
+    tier.add(120, 0.0)
+    assert list(tier.get_aggregates(0, 120)["mean"]) == [3.0, 10.0]
+
+def test_rollup_tier_circular_mean():
+    """
+    Test directions either side of north average to north
+    """
+    tier = rollup_tier(60, 1, circular=True)
+    tier.add(0, 350.0)
+    tier.add(30, 10.0)
+    tier.add(60, 180.0)
+    mean = tier.get_aggregates(0, 0)["mean"][0]
+    assert min(mean, 360 - mean) == pytest.approx(0, abs=1e-9)
+
+def test_rollup_tier_capacity():
+    """
+    Test a tier holds its hours of periods in fixed memory
+    """
+    tier = rollup_tier(600, 72)
+    assert tier.capacity == 433
+    for period in range(1000):
+        tier.add(period * 600, float(period))
+    assert len(tier) == 433
+    assert tier.oldest() == (566 * 600, 566.0)
+
+def test_tiered_history_finest_tier():
+    """
+    Test lookups use raw samples where they reach back, then the finest rollup covering the time
+    """
+    history = tiered_history(10, 1, [[600, 72], [60, 12]])
+    for second in range(0, 24 * 3600, 5):
+        history.record(second, {"pressure": 1000 + second / 3600, "wind_direction": 90.0})
+    now = 24 * 3600 - 5
+    assert history.get_tier("pressure", now - 300) is history.raw.get_channel("pressure")
+    assert history.get_tier("pressure", now - 3 * 3600).seconds == 60
+    assert history.get_tier("pressure", now - 20 * 3600).seconds == 600
+    readings = history.get_readings_at(now - 3 * 3600)
+    assert readings["pressure"] == pytest.approx(1000 + (now - 3 * 3600) / 3600, abs=0.02)
+    assert readings["wind_direction"] == pytest.approx(90.0)
+    assert readings["temperature"] == None
+    timestamps, values = history.get_range("pressure", now - 20 * 3600, now)
+    assert timestamps[1] - timestamps[0] == 600
+
+def test_ring_buffer_resize():
+    """
+    Test a resized buffer keeps its newest samples in order and can be appended to
+    """
+    buffer = ring_buffer(5)
+    for timestamp in range(7):
+        buffer.append(timestamp, timestamp * 10)
+    buffer.resize(3)
+    assert buffer.get_memory_size() == 3 * 2 * 8
+    assert list(buffer.get_range(0, 10)[0]) == [4, 5, 6]
+    buffer.append(7, 70)
+    assert list(buffer.get_range(0, 10)[1]) == [50, 60, 70]
+
+def test_tiered_history_shed():
+    """
+    Test shedding trims the largest tier, never below min_hours, and keeps recent aggregates
+    """
+    history = tiered_history(10, 1, [[60, 12], [600, 72]])
+    start = 1687600000 - 1687600000 % 600
+    for minute in range(600):
+        history.record(start + minute * 60, {"pressure": 1000 + minute})
+    size = history.get_memory_size()
+    assert history.shed(3)
+    assert history.get_memory_size() < size
+    assert history.tiers[0]["pressure"].capacity == 721 * 3 // 4
+    while history.shed(3):
+        pass
+    assert history.tiers[0]["pressure"].capacity == 182
+    assert history.tiers[1]["pressure"].capacity == 20
+    assert history.get_readings_at(start + 597 * 60 - 3 * 3600)["pressure"] is not None
@@ -0,0 +1,94 @@
+from http_client import http_client, circuit_breaker
+import requests
+import responses
+
+URL = "https://api.example.com/v1/forecast"
+
+@responses.activate
+def test_get_success():
+    """
+    Test a successful response is returned with the configured timeouts
+    """
+    responses.add(responses.GET, URL, json={"ok": True}, status=200)
+    client = http_client(connect_timeout=3, read_timeout=7)
+    response = client.get(URL)
+    assert response.json() == {"ok": True}
+    assert responses.calls[0].request.req_kwargs["timeout"] == (3, 7)
+
+@responses.activate
+def test_get_retries_with_backoff(mocker):
+    """
+    Test server errors and connection errors are retried with doubling delays
+    """
+    sleep = mocker.patch("time.sleep")
+    responses.add(responses.GET, URL, status=503)
+    responses.add(responses.GET, URL, body=requests.exceptions.ConnectionError("offline"))
+    responses.add(responses.GET, URL, json={"ok": True}, status=200)
+    client = http_client(retries=2, backoff=2)
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert len(responses.calls) == 3
+    assert [call.args[0] for call in sleep.call_args_list] == [2, 4]
+
+@responses.activate
+def test_get_client_error_not_retried(mocker):
+    """
+    Test a client error is returned without retrying
+    """
+    mocker.patch("time.sleep")
+    responses.add(responses.GET, URL, status=403)
+    client = http_client(retries=2)
+    assert client.get(URL).status_code == 403
+    assert len(responses.calls) == 1
+
+def test_backoff_is_bounded():
+    """
+    Test the retry delay stops growing at max_backoff
+    """
+    client = http_client(backoff=2, max_backoff=30)
+    assert [client.get_backoff(attempt) for attempt in range(6)] == [2, 4, 8, 16, 30, 30]
+
+@responses.activate
+def test_circuit_opens_after_failures(mocker):
+    """
+    Test a host that keeps failing is not requested again until the circuit resets
+    """
+    mocker.patch("time.sleep")
+    responses.add(responses.GET, URL, body=requests.exceptions.ConnectionError("offline"))
+    client = http_client(retries=0, failure_threshold=2, reset_timeout=300)
+    assert client.get(URL) is None
+    assert client.get(URL) is None
+    assert client.get(URL) is None
+    assert len(responses.calls) == 2
+    assert client.get("https://other.example.com/") is None
+    assert len(responses.calls) == 3
+
+def test_circuit_breaker_half_open():
+    """
+    Test the breaker allows a trial after reset_timeout and reopens if it fails
+    """
+    breaker = circuit_breaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure(now=100)
+    assert not breaker.allow_request(now=159)
+    assert breaker.allow_request(now=160)
+    breaker.record_failure(now=160)
+    assert not breaker.allow_request(now=200)
+    breaker.record_success()
+    assert breaker.allow_request(now=200)
+
+def test_circuit_breaker_single_trial():
+    """
+    Test only one caller gets the half-open trial, others are refused until it finishes
+    """
+    breaker = circuit_breaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure(now=100)
+    assert breaker.allow_request(now=160)
+    assert not breaker.allow_request(now=160)
+    assert not breaker.allow_request(now=500)
+    breaker.record_failure(now=170)
+    assert not breaker.allow_request(now=200)
+    assert breaker.allow_request(now=230)
+    assert not breaker.allow_request(now=230)
+    breaker.record_success()
+    assert breaker.allow_request(now=231)
+    assert breaker.allow_request(now=231)
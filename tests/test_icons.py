@@ -0,0 +1,56 @@
+from icons import create_mask, load_icons
+from PIL import Image
+import glob
+import os
+
+PATH = os.path.join(os.path.dirname(__file__), "..")
+
+def pixel_mask(source: Image.Image, mask: tuple) -> Image.Image:
+    """
+    Reference mask built pixel by pixel
+    """
+    mask_image = Image.new("1", source.size)
+    w, h = source.size
+    for x in range(w):
+        for y in range(h):
+            if source.getpixel((x, y)) in mask:
+                mask_image.putpixel((x, y), 255)
+    return mask_image
+
+def test_create_mask_matches_pixel_loop():
+    """
+    Test the lookup table mask matches a pixel by pixel mask for every icon
+    """
+    for icon in glob.glob(os.path.join(PATH, "resources/icon-*.png")):
+        source = Image.open(icon)
+        for mask in [(0, 1, 2), (1, 2)]:
+            assert create_mask(source, mask).tobytes() == pixel_mask(source, mask).tobytes()
+
+def test_load_icons_caches_masks(tmp_path, mocker):
+    """
+    Test masks are written to the cache then loaded from it without being rebuilt
+    """
+    cache_dir = str(tmp_path / "masks")
+    icons, masks = load_icons(PATH, (0, 1, 2), cache_dir)
+    assert len(os.listdir(cache_dir)) == len(icons) == 6
+    create = mocker.patch("icons.create_mask")
+    cached_icons, cached_masks = load_icons(PATH, (0, 1, 2), cache_dir)
+    create.assert_not_called()
+    assert cached_masks["sun"].tobytes() == masks["sun"].tobytes()
+
+def test_load_icons_palette_change(tmp_path):
+    """
+    Test a different set of allowed colours replaces the cached masks
+    """
+    cache_dir = str(tmp_path / "masks")
+    load_icons(PATH, (0, 1, 2), cache_dir)
+    icons, masks = load_icons(PATH, (1, 2), cache_dir)
+    assert len(os.listdir(cache_dir)) == 6
+    assert masks["sun"].tobytes() == pixel_mask(icons["sun"], (1, 2)).tobytes()
+
+def test_load_icons_no_cache():
+    """
+    Test masks are built when caching is disabled
+    """
+    icons, masks = load_icons(PATH, (0, 1, 2))
+    assert sorted(masks) == ["cloud", "rain", "snow", "storm", "sun", "wind"]
@@ -0,0 +1,55 @@
+from memory_guard import memory_guard, get_rss, get_object_size
+
+def test_get_rss():
+    rss = get_rss()
+    assert rss is None or rss > 0
+
+def test_get_object_size():
+    """
+    Test nested containers are counted and shared objects only once
+    """
+    shared = ["x" * 1000]
+    assert get_object_size({"a": shared, "b": shared}) < get_object_size({"a": shared, "b": ["y" * 1000]})
+    assert get_object_size([shared]) > 1000
+
+def test_budget_shed_to_size():
+    """
+    Test a store over its budget is shed back within it
+    """
+    store = list(range(10))
+    guard = memory_guard()
+    budget = guard.add_budget("store", 4, lambda: len(store), lambda: bool(store) and store.pop(0) is not None)
+    guard.check()
+    assert store == [6, 7, 8, 9]
+    assert budget.sheds == 6
+    assert guard.get_stats()["store"] == {"size": 4, "budget": 4, "sheds": 6}
+
+def test_rss_pressure_sheds_half(mocker):
+    """
+    Test every store is shed to half its size once RSS is over its budget, and a store that can't shed stops
+    """
+    mocker.patch("memory_guard.get_rss", return_value=2000)
+    store = list(range(10))
+    fixed = [1, 2]
+    guard = memory_guard(rss_budget=1000)
+    guard.add_budget("store", 100, lambda: len(store), lambda: bool(store) and store.pop(0) is not None)
+    guard.add_budget("fixed", 1, lambda: len(fixed), lambda: False)
+    stats = guard.check()
+    assert len(store) == 5
+    assert fixed == [1, 2]
+    assert stats["pressure_events"] == 1
+    assert stats["peak_rss"] == 2000
+
+def test_trace_growth():
+    """
+    Test growth since start is attributed to the allocating line
+    """
+    guard = memory_guard(trace=True, top=5)
+    guard.start()
+    leak = [bytearray(10000) for block in range(50)]
+    growth = guard.get_growth()
+    guard.stop()
+    assert growth
+    assert growth[0][0].endswith("test_memory_guard.py:{}".format(test_trace_growth.__code__.co_firstlineno + 6))
+    assert growth[0][1] >= 500000
+    assert leak
@@ -0,0 +1,112 @@
+from meteomatics import weather_api, token_manager, TOKEN_URL
+from http_client import http_client
+import base64
+import json
+import os
+import responses
+import time
+
+def make_token(expires: float) -> str:
+    """
+    Unsigned JWT with an exp claim
+    """
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": expires}).encode()).decode().rstrip("=")
+    return "header." + payload + ".signature"
+
+@responses.activate
+def test_token_expiry_from_jwt():
+    """
+    Test the token's expiry is read from its exp claim
+    """
+    expires = int(time.time()) + 7200
+    responses.add(responses.GET, TOKEN_URL, json={"access_token": make_token(expires)}, status=200)
+    tokens = token_manager("user", "password", http_client())
+    assert tokens.get_token() == make_token(expires)
+    assert tokens.expires == expires
+    assert not tokens.needs_refresh()
+    assert tokens.needs_refresh(expires - 299)
+
+@responses.activate
+def test_token_persisted(tmp_path):
+    """
+    Test a saved token is reused after a restart without fetching a new one
+    """
+    token_file = os.path.join(tmp_path, "token.json")
+    token = make_token(int(time.time()) + 7200)
+    responses.add(responses.GET, TOKEN_URL, json={"access_token": token}, status=200)
+    token_manager("user", "password", http_client(), token_file).get_token()
+    assert token_manager("user", "password", http_client(), token_file).get_token() == token
+    assert len(responses.calls) == 1
+    assert os.stat(token_file).st_mode & 0o777 == 0o600
+    assert token_manager("other", "password", http_client(), token_file).token is None
+
+@responses.activate
+def test_expired_token_refreshed(tmp_path):
+    """
+    Test an expired saved token is replaced before use
+    """
+    token_file = os.path.join(tmp_path, "token.json")
+    with open(token_file, "w") as saved:
+        json.dump({"username": "user", "token": make_token(1000), "expires": 1000}, saved)
+    token = make_token(int(time.time()) + 7200)
+    responses.add(responses.GET, TOKEN_URL, json={"access_token": token}, status=200)
+    assert token_manager("user", "password", http_client(), token_file).get_token() == token
+
+@responses.activate
+def test_malformed_token_response_keeps_old_token():
+    """
+    Test a renewal returning bad JSON or no access token keeps the old token and the refresher retries with backoff
+    """
+    old_token = make_token(int(time.time()) + 60)
+    responses.add(responses.GET, TOKEN_URL, body="<html>Service unavailable</html>", status=200)
+    responses.add(responses.GET, TOKEN_URL, json={"error": "no token"}, status=200)
+    tokens = token_manager("user", "password", http_client(), refresh_margin=300, retry_delay=0.01)
+    tokens.token = old_token
+    tokens.expires = time.time() + 60
+    assert not tokens.refresh()
+    assert not tokens.refresh()
+    assert tokens.token == old_token
+    assert [tokens.get_retry_delay(failures) for failures in [1, 2, 3]] == [0.01, 0.02, 0.04]
+
+    tokens.start_refresher()
+    for attempt in range(100):
+        if len(responses.calls) >= 4:
+            break
+        time.sleep(0.01)
+    assert tokens.refresher.is_alive()
+    tokens.stop_refresher()
+    assert len(responses.calls) >= 4
+    assert tokens.token == old_token
+
+@responses.activate
+def test_forbidden_retry_uses_new_token(mocker):
+    """
+    Test a 403 renews the token and retries with the new token in the URL
+    """
+    mocker.patch("meteomatics.weather_api.process_weather", return_value={"pressure": 1020})
+    old_token = make_token(int(time.time()) + 7200)
+    new_token = make_token(int(time.time()) + 7201)
+    responses.add(responses.GET, TOKEN_URL, json={"access_token": old_token}, status=200)
+    responses.add(responses.GET, TOKEN_URL, json={"access_token": new_token}, status=200)
+    responses.add(responses.GET, "https://api.meteomatics.com/now/msl_pressure:hPa,wind_speed_10m:kn,wind_dir_10m:d,wind_gusts_10m_1h:kn,weather_symbol_1h:idx/50.9,-1.4/json?access_token=" + old_token, status=403)
+    responses.add(responses.GET, "https://api.meteomatics.com/now/msl_pressure:hPa,wind_speed_10m:kn,wind_dir_10m:d,wind_gusts_10m_1h:kn,weather_symbol_1h:idx/50.9,-1.4/json?access_token=" + new_token, json={"data": []}, status=200)
+    weather = weather_api("user", "password", http_client(), background_refresh=False)
+    assert weather.get_weather([50.9, -1.4]) == {"pressure": 1020}
+
+@responses.activate
+def test_background_refresh():
+    """
+    Test the background thread renews a token that is about to expire
+    """
+    new_token = make_token(int(time.time()) + 7200)
+    responses.add(responses.GET, TOKEN_URL, json={"access_token": new_token}, status=200)
+    tokens = token_manager("user", "password", http_client(), refresh_margin=300)
+    tokens.token = make_token(int(time.time()) + 60)
+    tokens.expires = time.time() + 60
+    tokens.start_refresher()
+    for attempt in range(100):
+        if tokens.token == new_token:
+            break
+        time.sleep(0.01)
+    tokens.stop_refresher()
+    assert tokens.token == new_token
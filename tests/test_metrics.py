@@ -0,0 +1,71 @@
+from metrics import metrics_registry, histogram, format_labels
+import urllib.request
+
+def test_counters_and_labels():
+    """
+    Test counters are kept per label set and formatted with their description
+    """
+    registry = metrics_registry()
+    registry.describe("requests_total", "counter", "Requests made")
+    registry.increment("requests_total", labels={"provider": "open_meteo"})
+    registry.increment("requests_total", 2, {"provider": "open_meteo"})
+    registry.increment("requests_total", labels={"provider": "meteomatics"})
+    assert registry.get_value("requests_total", {"provider": "open_meteo"}) == 3
+    assert registry.get_value("requests_total", {"provider": "other"}) == 0
+    text = registry.get_text()
+    assert "# HELP requests_total Requests made\n# TYPE requests_total counter\n" in text
+    assert 'requests_total{provider="open_meteo"} 3.0\n' in text
+    assert 'requests_total{provider="meteomatics"} 1.0\n' in text
+
+def test_histogram_buckets():
+    """
+    Test histogram buckets are cumulative with the sum and count
+    """
+    values = histogram((0.1, 1))
+    for value in [0.05, 0.1, 0.5, 5]:
+        values.observe(value)
+    samples = values.get_samples("render_seconds", ())
+    assert samples == [("render_seconds_bucket", (("le", "0.1"),), 2), ("render_seconds_bucket", (("le", "1.0"),), 3),
+                       ("render_seconds_bucket", (("le", "+Inf"),), 4), ("render_seconds_sum", (), 5.65),
+                       ("render_seconds_count", (), 4)]
+
+def test_timer():
+    """
+    Test a timed block is observed in its histogram
+    """
+    registry = metrics_registry()
+    with registry.timer("render_seconds"):
+        pass
+    assert "render_seconds_count 1.0\n" in registry.get_text()
+
+def test_collectors():
+    """
+    Test collectors are read with the metrics, replaced by name and skipped if they fail
+    """
+    registry = metrics_registry()
+    registry.add_collector("cache", lambda: [("cache_hits_total", {}, 1)])
+    registry.add_collector("cache", lambda: [("cache_hits_total", {}, 4), ("cache_age_seconds", {}, None)])
+    registry.add_collector("broken", lambda: 1 / 0)
+    text = registry.get_text()
+    assert text == "cache_hits_total 4.0\n"
+
+def test_format_labels_escaped():
+    assert format_labels((("id", "$GPRMC"), ("source", "gps"))) == '{id="$GPRMC",source="gps"}'
+    assert format_labels((("name", 'a"b\\c'),)) == '{name="a\\"b\\\\c"}'
+
+def test_write_and_serve(tmp_path):
+    """
+    Test metrics are written to a file and served on the local endpoint
+    """
+    registry = metrics_registry()
+    registry.increment("frames_total")
+    path = str(tmp_path / "metrics.prom")
+    registry.write(path)
+    with open(path) as metrics_file:
+        assert metrics_file.read() == "frames_total 1.0\n"
+    host, port = registry.serve("127.0.0.1", 0)
+    try:
+        with urllib.request.urlopen("http://{}:{}/metrics".format(host, port), timeout=5) as response:
+            assert response.read() == b"frames_total 1.0\n"
+    finally:
+        registry.stop()
@@ -1,5 +1,8 @@
-from nmea import tcp_nmea
+from nmea import tcp_nmea, nmea_pool, parse_sentence, nmea_checksum, split_nmea_words
+from functools import reduce
 import time
+import socket
+import threading
 
 def test_get_transducer_types():
     """
@@ -131,4 +134,334 @@ def test_get_cog_sog_data(mocker):
     nmea = tcp_nmea()
     nmea_cog_sog_data = nmea.get_cog_sog_data()
     cog_sog_data = {'cog': '018', 'sog': '2.4'}
-    assert nmea_cog_sog_data == cog_sog_data
\ No newline at end of file
+    assert nmea_cog_sog_data == cog_sog_data
+
+def test_process_line_sentence_table():
+    """
+    Test each line is stored once against its sentence ID with receive time
+    """
+    nmea = tcp_nmea()
+    nmea.process_line(b"$GPRMC,124027.00,A,5053.00348,N,00118.21794,W,0.009,,110623,,,A*63\r\n", 1686483627.5)
+    nmea.process_line(b"$IIMWV,230.5,R,2.9,N,A*32\r\n", 1686483628.0)
+    nmea.process_line(b"$IIMWV,231.0,R,3.1,N,A*3F\r\n", 1686483629.0)
+    assert nmea.get_latest_sentence("$GPRMC")["sentence"].body() == "124027.00,A,5053.00348,N,00118.21794,W,0.009,,110623,,,A*63"
+    assert nmea.get_latest_sentence("$GPRMC")["received"] == 1686483627.5
+    assert nmea.get_latest_sentence("$IIMWV")["sentence"].body() == "231.0,R,3.1,N,A*3F"
+    assert nmea.get_latest_sentence("$IIMWV")["received"] == 1686483629.0
+    assert nmea.get_latest_sentence("$GPVTG") == {}
+
+def test_process_line_ignores_noise():
+    """
+    Test lines without a sentence ID are not stored
+    """
+    nmea = tcp_nmea()
+    nmea.process_line(b"garbage\r\n", 0)
+    nmea.process_line(b"\r\n", 0)
+    assert nmea.sentences == {}
+
+def test_get_wind_data_from_table(mocker):
+    """
+    Test accessors are served from the sentence table while the reader is running
+    """
+    mocker.patch('config.st60_fix', False)
+    nmea = tcp_nmea()
+    nmea.reader_running = True
+    nmea.process_line(b"$IIMWV,230.5,R,2.9,N,A*32\r\n", time.time())
+    nmea_wind_data = nmea.get_wind_data()
+    wind_data = {'angle': '230.5', 'reference': 'R', 'speed': '2.9', 'units': 'Knots'}
+    assert nmea_wind_data == wind_data
+
+def test_get_nmea_sentence_not_seen():
+    """
+    Test an unseen sentence returns empty after waiting rather than blocking
+    """
+    nmea = tcp_nmea()
+    nmea.reader_running = True
+    nmea.sentence_wait = 0.01
+    assert nmea.get_nmea_sentence("$GPVTG") == ""
+    assert nmea.get_cog_sog_data() == {}
+
+def test_nmea_checksum():
+    """
+    Test folded checksum matches a byte by byte XOR for odd and even lengths
+    """
+    for data in [b"", b"G", b"GPRMC", b"IIMWV,230.5,R,2.9,N,A", b"YXXDR,C,22.36,C,AIRTEMP,P,1.00167,B,BARO,H,62.21,P,HUMIDITY"]:
+        assert nmea_checksum(data) == reduce(lambda a, b: a ^ b, data, 0)
+
+def test_parse_sentence():
+    """
+    Test a valid sentence is indexed the same as get_nmea_sentence_words
+    """
+    sentence = parse_sentence(b"$GPRMC,124027.00,A,5053.00348,N,00118.21794,W,0.009,,110623,,,A*63\r\n")
+    words = ["124027.00","A","5053.00348","N","00118.21794","W","0.009","","110623","","","A","63"]
+    assert sentence.id == "$GPRMC"
+    assert sentence.words() == words
+    assert len(sentence) == len(words)
+    assert sentence[8] == "110623"
+    assert sentence[-1] == "63"
+    assert sentence[2:4] == ["5053.00348", "N"]
+
+def test_parse_sentence_checksum_failure():
+    """
+    Test corrupt, truncated and malformed sentences are rejected
+    """
+    assert parse_sentence(b"$IIMWV,230.5,R,2.9,N,A*33\r\n") is None
+    assert parse_sentence(b"$IIMWV,280.5,R,2.9,N,A*32\r\n") is None
+    assert parse_sentence(b"$IIMWV,230.5,R,2.9,N,A*3\r\n") is None
+    assert parse_sentence(b"$IIMWV,230.5,R,2.9,N,A*ZZ\r\n") is None
+    assert parse_sentence(b"$IIMWV\r\n") is None
+    assert parse_sentence(b"noise\r\n") is None
+
+def test_parse_sentence_no_checksum(mocker):
+    """
+    Test sentences without a checksum depend on nmea_require_checksum
+    """
+    mocker.patch('config.nmea_require_checksum', True)
+    assert parse_sentence(b"$IIMWV,230.5,R,2.9,N,A\r\n") is None
+    mocker.patch('config.nmea_require_checksum', False)
+    assert parse_sentence(b"$IIMWV,230.5,R,2.9,N,A\r\n").words() == ["230.5", "R", "2.9", "N", "A"]
+
+def test_parse_sentence_ais():
+    """
+    Test encapsulated sentences are keyed by their ! ID
+    """
+    sentence = parse_sentence(b"!AIVDM,1,1,,B,177KQJ5000G?tO`K>RA1wUbN0TKH,0*5C\r\n")
+    assert sentence.id == "!AIVDM"
+
+def test_split_nmea_words():
+    """
+    Test splitting on commas with the checksum last and line ending removed
+    """
+    assert split_nmea_words("230.5,R,2.9,N,A*32\r\n") == ["230.5", "R", "2.9", "N", "A", "32"]
+    assert split_nmea_words("230.5,R,2.9,N,A") == ["230.5", "R", "2.9", "N", "A"]
+
+def test_process_line_counts_rejected():
+    """
+    Test rejected lines are counted and not stored, blank lines are ignored
+    """
+    nmea = tcp_nmea()
+    nmea.process_line(b"$IIMWV,230.5,R,2.9,N,A*32\r\n", 1)
+    nmea.process_line(b"$IIMWV,231.0,R,3.1,N,A*32\r\n", 2)
+    nmea.process_line(b"\r\n", 3)
+    assert nmea.rejected_sentences == 1
+    assert nmea.get_latest_sentence("$IIMWV")["received"] == 1
+
+def serve_nmea_lines(lines: list) -> tuple:
+    """
+    Start a one shot local TCP source that sends the given lines then waits for the client to close
+    """
+    server = socket.create_server(("127.0.0.1", 0))
+    def send():
+        connection, address = server.accept()
+        connection.sendall(b"".join(lines))
+        connection.recv(1024)
+        connection.close()
+        server.close()
+    threading.Thread(target=send, daemon=True).start()
+    return server.getsockname()
+
+def test_connect_reader_concurrent_sources(mocker):
+    """
+    Test two sources read concurrently on the shared event loop fill their own sentence tables
+    """
+    mocker.patch('config.st60_fix', False)
+    gps_host, gps_port = serve_nmea_lines([b"$GPRMC,124027.00,A,5053.00348,N,00118.21794,W,0.009,,110623,,,A*63\r\n"])
+    wind_host, wind_port = serve_nmea_lines([b"$IIMWV,230.5,R,2.9,N,A*32\r\n"])
+    gps = tcp_nmea()
+    gps.connect(gps_host, gps_port)
+    gps.start_reader()
+    wind = tcp_nmea()
+    wind.connect(wind_host, wind_port)
+    wind.start_reader()
+    assert gps.get_lat_long() == {"lat":"5053.00348", "ns":"N", "long":"00118.21794", "ew":"W"}
+    assert wind.get_wind_data() == {'angle': '230.5', 'reference': 'R', 'speed': '2.9', 'units': 'Knots'}
+    assert "$IIMWV" not in gps.sentences
+    gps.disconnect()
+    wind.disconnect()
+
+def test_get_nmea_sentence_without_reader():
+    """
+    Test the blocking scan skips other sentences to find the requested ID
+    """
+    host, port = serve_nmea_lines([b"$IIMWV,230.5,R,2.9,N,A*32\r\n", b"$GPVTG,,018,T,021,M,2.4,N,4.445,K,A*02\r\n"])
+    nmea = tcp_nmea()
+    nmea.connect(host, port)
+    assert nmea.get_cog_sog_data() == {'cog': '018', 'sog': '2.4'}
+    nmea.disconnect()
+
+def wait_until(condition, timeout: float = 3) -> bool:
+    """
+    Poll condition until it is true or timeout seconds pass
+    """
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_pool_shares_connections(mocker):
+    """
+    Test roles on the same host and port share one connection and unset roles get none
+    """
+    connect = mocker.patch("nmea.tcp_nmea.connect")
+    mocker.patch("nmea.tcp_nmea.start_reader")
+    pool = nmea_pool()
+    gps = pool.get_connection("gps", "192.168.4.90", 2000)
+    wind = pool.get_connection("wind", "192.168.4.90", 2000)
+    sensors = pool.get_connection("sensors", "192.168.68.201", 2000)
+    assert gps is wind
+    assert sensors is not gps
+    assert pool.get_connection("depth", None, None) is None
+    assert pool.get_role("wind") is gps
+    assert connect.call_count == 2
+
+def test_reconnect_delay_backoff(mocker):
+    """
+    Test reconnect delays double up to the maximum with up to half of each random
+    """
+    mocker.patch("config.nmea_reconnect_backoff", 1)
+    mocker.patch("config.nmea_reconnect_max_backoff", 60)
+    nmea = tcp_nmea()
+    for attempt, delay in [(0, 1), (3, 8), (10, 60)]:
+        for trial in range(20):
+            assert delay / 2 <= nmea.get_reconnect_delay(attempt) <= delay
+
+def test_pool_reconnects(mocker):
+    """
+    Test a pooled connection reconnects after the source drops it, and connects once a missing source appears
+    """
+    mocker.patch("config.nmea_reconnect_backoff", 0.05)
+    from nmea_replay import replay_server
+    server = replay_server([b"$IIMWV,230.5,R,2.9,N,A*32\r\n"], rate=200, disconnect_after=3)
+    host, port = server.start()
+    pool = nmea_pool()
+    wind = pool.get_connection("wind", host, port)
+    assert wait_until(lambda: server.connections >= 2 and wind.reconnects >= 1)
+    assert "$IIMWV" in wind.sentences
+
+    listener = socket.create_server(("127.0.0.1", 0))
+    missing_port = listener.getsockname()[1]
+    listener.close()
+    late = pool.get_connection("gps", "127.0.0.1", missing_port)
+    assert late.reader_running and not late.connected
+    late_server = replay_server([b"$IIMWV,230.5,R,2.9,N,A*32\r\n"], rate=200, port=missing_port)
+    late_server.start()
+    assert wait_until(lambda: late.connected and "$IIMWV" in late.sentences)
+    pool.close()
+    server.stop()
+    late_server.stop()
+
+def test_pool_backs_off_after_drop(mocker):
+    """
+    Test a source that accepts and then closes at once is retried with backoff, not in a tight loop
+    """
+    mocker.patch("config.nmea_reconnect_backoff", 0.2)
+    listener = socket.create_server(("127.0.0.1", 0))
+    host, port = listener.getsockname()
+    accepted = []
+
+    def accept_and_close() -> None:
+        while True:
+            try:
+                connection, address = listener.accept()
+            except OSError:
+                return None
+            accepted.append(address)
+            connection.close()
+
+    threading.Thread(target=accept_and_close, daemon=True).start()
+    pool = nmea_pool()
+    wind = pool.get_connection("wind", host, port)
+    assert wait_until(lambda: len(accepted) >= 2)
+    time.sleep(1)
+    assert wind.reader_running
+    assert len(accepted) <= 6
+    pool.close()
+    listener.close()
+
+def test_sentence_age_and_staleness(mocker):
+    """
+    Test ages come from receive times and stale sentences are not served as live
+    """
+    mocker.patch("config.nmea_stale_after", {"$IIMWV": 10})
+    mocker.patch("config.nmea_stale_default", 30)
+    mocker.patch('config.st60_fix', False)
+    nmea = tcp_nmea()
+    nmea.reader_running = True
+    nmea.connected = True
+    nmea.process_line(b"$IIMWV,230.5,R,2.9,N,A*32\r\n", 1000.0)
+    assert nmea.get_sentence_age("$IIMWV", 1004.0) == 4.0
+    assert nmea.get_sentence_age("$GPVTG", 1004.0) is None
+    assert nmea.get_stale_after("$GPVTG") == 30
+    assert not nmea.is_stale("$IIMWV", 1010.0)
+    assert nmea.is_stale("$IIMWV", 1010.5)
+    assert not nmea.is_stale("$GPVTG", 5000.0)
+    assert nmea.is_available("$IIMWV", 1004.0)
+    assert not nmea.is_available("$IIMWV", 1011.0)
+    nmea.connected = False
+    assert not nmea.is_available("$IIMWV", 1004.0)
+    assert nmea.get_wind_data() == {}
+
+def test_never_seen_sentence_stale(mocker):
+    """
+    Test a connected source that never sends a sentence is unavailable once it would be stale, without waiting on it
+    """
+    mocker.patch("config.nmea_stale_after", {"$IIMWV": 10})
+    nmea = tcp_nmea()
+    nmea.reader_running = True
+    nmea.connected = True
+    nmea.connected_since = 1000.0
+    assert not nmea.is_stale("$IIMWV", 1010.0)
+    assert nmea.is_available("$IIMWV", 1010.0)
+    assert nmea.is_stale("$IIMWV", 1010.5)
+    assert not nmea.is_available("$IIMWV", 1010.5)
+    nmea.connected_since = time.time() - 11
+    start = time.monotonic()
+    assert nmea.get_wind_data() == {}
+    assert time.monotonic() - start < nmea.sentence_wait
+
+def test_get_transducer_data_receive_time():
+    """
+    Test transducer readings are stamped with when their sentence was received
+    """
+    nmea = tcp_nmea()
+    nmea.reader_running = True
+    received = time.time() - 5
+    nmea.process_line(b"$YXXDR,C,22.36,C,AIRTEMP,P,1.00167,B,BARO,H,62.21,P,HUMIDITY*39\r\n", received)
+    assert nmea.get_transducer_data()["timestamp"] == received
+
+def test_get_nmea_sentence_without_reader_quiet(mocker):
+    """
+    Test the blocking scan gives up on a quiet source once the sentence would be stale
+    """
+    mocker.patch("config.nmea_stale_after", {"$GPVTG": 0.1})
+    listener = socket.create_server(("127.0.0.1", 0))
+    host, port = listener.getsockname()
+    nmea = tcp_nmea()
+    nmea.connect(host, port)
+    start = time.monotonic()
+    assert nmea.get_cog_sog_data() == {}
+    assert time.monotonic() - start < 1
+    nmea.stream_writer.close()
+    listener.close()
+
+def test_sentence_counts_and_checksum_failures(mocker):
+    """
+    Test sentences are counted by ID and checksum failures told apart from malformed lines in the pool metrics
+    """
+    mocker.patch("nmea.tcp_nmea.connect")
+    mocker.patch("nmea.tcp_nmea.start_reader")
+    pool = nmea_pool()
+    wind = pool.get_connection("wind", "192.168.1.2", 2000)
+    wind.process_line(b"$IIMWV,230.5,R,2.9,N,A*32\r\n", 1)
+    wind.process_line(b"$IIMWV,231.0,R,3.1,N,A*3F\r\n", 2)
+    wind.process_line(b"$IIMWV,231.0,R,3.1,N,A*32\r\n", 3)
+    wind.process_line(b"$IIMWV,231.0,R\r\n", 4)
+    assert wind.sentence_counts == {"$IIMWV": 2}
+    assert wind.rejected_sentences == 2
+    assert wind.checksum_failures == 1
+    samples = pool.get_metrics()
+    assert ("nmea_sentences_total", {"source": "192.168.1.2:2000", "id": "$IIMWV"}, 2) in samples
+    assert ("nmea_checksum_failures_total", {"source": "192.168.1.2:2000"}, 1) in samples
+    assert ("nmea_connected", {"source": "192.168.1.2:2000"}, 0) in samples
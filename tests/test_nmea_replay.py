@@ -0,0 +1,72 @@
+from nmea_replay import make_sentence, synthetic_sentences, corrupt_line, load_log, replay_server
+from nmea import tcp_nmea, parse_sentence
+import itertools
+import os
+import random
+import time
+
+def test_make_sentence():
+    """
+    Test sentences get a valid checksum and line ending
+    """
+    assert make_sentence("IIMWV,230.5,R,2.9,N,A") == b"$IIMWV,230.5,R,2.9,N,A*32\r\n"
+
+def test_synthetic_sentences():
+    """
+    Test the synthetic stream is repeatable and every sentence apart from noise parses
+    """
+    lines = list(itertools.islice(synthetic_sentences(1, 1686483627, noise=0), 200))
+    assert lines == list(itertools.islice(synthetic_sentences(1, 1686483627, noise=0), 200))
+    ids = set(parse_sentence(line).id for line in lines)
+    assert ids == {"$GPRMC", "$GPVTG", "$IIMWV", "$YXXDR", "!AIVDM"}
+
+def test_corrupt_line_fails_checksum():
+    """
+    Test corrupted lines are rejected by the parser
+    """
+    generator = random.Random(1)
+    line = make_sentence("IIMWV,230.5,R,2.9,N,A")
+    for attempt in range(50):
+        assert parse_sentence(corrupt_line(line, generator)) is None
+
+def test_load_log(tmp_path):
+    """
+    Test a recorded log is read with normalised line endings and blank lines dropped
+    """
+    log_file = os.path.join(tmp_path, "recorded.nmea")
+    with open(log_file, "wb") as log:
+        log.write(b"$IIMWV,230.5,R,2.9,N,A*32\n\n$GPVTG,,018,T,021,M,2.4,N,4.445,K,A*02\r\n")
+    assert load_log(log_file) == [b"$IIMWV,230.5,R,2.9,N,A*32\r\n", b"$GPVTG,,018,T,021,M,2.4,N,4.445,K,A*02\r\n"]
+
+def test_replay_to_tcp_nmea():
+    """
+    Test tcp_nmea reads a replayed stream into its sentence table and counts corrupted lines
+    """
+    lines = list(itertools.islice(synthetic_sentences(2, noise=0), 400))
+    server = replay_server(lines, rate=0, corruption=0.1, repeat=False, seed=3)
+    host, port = server.start()
+    nmea = tcp_nmea()
+    nmea.connect(host, port)
+    nmea.start_reader()
+    for attempt in range(200):
+        if not nmea.reader_running:
+            break
+        time.sleep(0.01)
+    assert server.sent == 400
+    assert nmea.rejected_sentences == server.corrupted > 0
+    assert nmea.get_latest_sentence("$IIMWV")["sentence"][1] == "R"
+    server.stop()
+
+def test_replay_disconnects():
+    """
+    Test clients are dropped after disconnect_after lines and the next client is served
+    """
+    server = replay_server([make_sentence("IIMWV,230.5,R,2.9,N,A")], rate=0, disconnect_after=5)
+    host, port = server.start()
+    for client in range(2):
+        nmea = tcp_nmea()
+        nmea.connect(host, port)
+        assert nmea.disconnect().count(b"\r\n") == 5
+    assert server.connections == 2
+    assert server.sent == 10
+    server.stop()
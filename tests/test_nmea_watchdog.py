@@ -0,0 +1,50 @@
+from nmea import tcp_nmea
+from nmea_watchdog import staleness_watchdog
+
+def test_watchdog_quiet_and_recovered(mocker):
+    """
+    Test a source is reported quiet once its sentence is stale and cleared once it arrives again
+    """
+    mocker.patch("config.nmea_stale_after", {"$IIMWV": 10})
+    wind = tcp_nmea()
+    watchdog = staleness_watchdog()
+    watchdog.watch("wind", wind, "$IIMWV")
+    watchdog.watch("depth", None, "$SDDBT")
+    assert list(watchdog.sources) == ["wind"]
+    wind.process_line(b"$IIMWV,230.5,R,2.9,N,A*32\r\n", 1000.0)
+    assert watchdog.check(1005.0) == []
+    assert watchdog.check(1020.0) == ["wind"]
+    assert watchdog.check(1030.0) == ["wind"]
+    assert watchdog.alerts == 1
+    assert watchdog.get_stats(1030.0) == {"wind": {"id": "$IIMWV", "age": 30.0, "quiet": True}}
+    wind.process_line(b"$IIMWV,230.5,R,2.9,N,A*32\r\n", 1031.0)
+    assert watchdog.check(1032.0) == []
+    assert not watchdog.is_quiet("wind")
+
+def test_watchdog_never_seen_sentence(mocker):
+    """
+    Test a connected source that never sends its sentence goes quiet once it would be stale
+    """
+    mocker.patch("config.nmea_stale_after", {"$IIMWV": 10})
+    wind = tcp_nmea()
+    wind.reader_running = True
+    wind.connected = True
+    wind.connected_since = 1000.0
+    watchdog = staleness_watchdog()
+    watchdog.watch("wind", wind, "$IIMWV")
+    assert watchdog.check(1005.0) == []
+    assert watchdog.check(1011.0) == ["wind"]
+    assert watchdog.get_stats(1011.0)["wind"] == {"id": "$IIMWV", "age": None, "quiet": True}
+    wind.process_line(b"$IIMWV,230.5,R,2.9,N,A*32\r\n", 1012.0)
+    assert watchdog.check(1013.0) == []
+
+def test_watchdog_disconnected_source():
+    """
+    Test a source whose reader is waiting to reconnect is quiet even before its sentence is stale
+    """
+    gps = tcp_nmea()
+    gps.reader_running = True
+    watchdog = staleness_watchdog()
+    watchdog.watch("gps", gps, "$GPRMC")
+    assert watchdog.check(1000.0) == ["gps"]
+    assert watchdog.get_stats(1000.0)["gps"]["age"] is None
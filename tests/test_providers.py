@@ -0,0 +1,117 @@
+from providers import weather_provider, provider_registry, meteomatics_provider
+import time
+
+class fake_provider(weather_provider):
+    """
+    Provider returning fixed readings after a delay
+    """
+    def __init__(self, name: str, priority: int, weather: dict, data_time: float = 0, delay: float = 0, error: Exception = None) -> None:
+        super().__init__(priority)
+        self.name = name
+        self.weather = weather
+        self.data_time = data_time
+        self.delay = delay
+        self.error = error
+
+    def fetch(self, lat_long: list, offset_hours: int, readings: list) -> tuple:
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return (dict(self.weather), self.data_time)
+
+def test_merge_by_priority():
+    """
+    Test each reading comes from the preferred provider that has it
+    """
+    registry = provider_registry()
+    registry.register(fake_provider("first", 0, {"pressure": 1020.3, "temperature": None}))
+    registry.register(fake_provider("second", 1, {"pressure": 1019.0, "temperature": 21.5}))
+    assert registry.get_weather([50.9, -1.4], 3) == {"pressure": 1020.3, "temperature": 21.5}
+    registry.close()
+
+def test_merge_by_freshness():
+    """
+    Test fresher data wins between providers of equal priority
+    """
+    registry = provider_registry()
+    registry.register(fake_provider("hourly", 0, {"pressure": 1020.3}, data_time=1687629600))
+    registry.register(fake_provider("now", 0, {"pressure": 1020.1}, data_time=1687631000))
+    assert registry.get_weather([50.9, -1.4], 3) == {"pressure": 1020.1}
+    registry.close()
+
+def test_deadline_and_failures():
+    """
+    Test slow and failing providers don't hold up or break the lookup, and are recorded
+    """
+    registry = provider_registry(deadline=0.2)
+    fast = fake_provider("fast", 1, {"pressure": 1020.3})
+    slow = fake_provider("slow", 0, {"pressure": 1019.0}, delay=1)
+    broken = fake_provider("broken", 0, {}, error=OSError("offline"))
+    for provider in [fast, slow, broken]:
+        registry.register(provider)
+    start = time.monotonic()
+    assert registry.get_weather([50.9, -1.4], 3) == {"pressure": 1020.3}
+    assert time.monotonic() - start < 0.9
+    assert fast.successes == 1 and fast.latency is not None
+    assert broken.attempts == 1 and broken.successes == 0
+    registry.close()
+
+def test_healthy_fast_provider_preferred():
+    """
+    Test ranking prefers healthy providers, then the fastest, within a priority
+    """
+    registry = provider_registry()
+    flaky = fake_provider("flaky", 0, {})
+    slow = fake_provider("slow", 0, {})
+    fast = fake_provider("fast", 0, {})
+    for attempt in range(5):
+        flaky.record(False, 0.1)
+        slow.record(True, 2.0)
+        fast.record(True, 0.2)
+    for provider in [flaky, slow, fast]:
+        registry.register(provider)
+    assert [provider.name for provider in registry.get_ranked_providers()] == ["fast", "slow", "flaky"]
+    assert registry.get_stats()["fast"]["success_rate"] == 1.0
+
+def test_failing_provider_loses_priority():
+    """
+    Test a higher priority provider that keeps failing loses to a healthy one
+    """
+    registry = provider_registry()
+    failing = fake_provider("failing", 0, {"pressure": 1000.0})
+    healthy = fake_provider("healthy", 1, {"pressure": 1020.3})
+    for attempt in range(5):
+        failing.record(False, 0.1)
+        healthy.record(True, 0.5)
+    for provider in [failing, healthy]:
+        registry.register(provider)
+    assert [provider.name for provider in registry.get_ranked_providers()] == ["healthy", "failing"]
+    assert registry.get_weather([50.9, -1.4], 3) == {"pressure": 1020.3}
+    registry.close()
+
+def test_meteomatics_icons(mocker):
+    """
+    Test Meteomatics weather symbols become display icons
+    """
+    api = mocker.Mock()
+    api.get_weather.return_value = {"pressure": 1020.3, "weather_code": 105, "weather_icon": "Rain"}
+    weather, data_time = meteomatics_provider(api).fetch([50.9, -1.4], 3, ["pressure"])
+    assert weather == {"pressure": 1020.3, "weather_icon": "rain"}
+
+def test_provider_metrics(mocker):
+    """
+    Test request latency and failures are recorded per provider
+    """
+    from metrics import metrics_registry
+    metrics = metrics_registry()
+    mocker.patch("metrics.get_registry", return_value=metrics)
+    registry = provider_registry()
+    registry.register(fake_provider("working", 0, {"pressure": 1020.3}))
+    registry.register(fake_provider("broken", 1, {}, error=OSError("offline")))
+    registry.get_weather([50.9, -1.4], 3)
+    text = metrics.get_text()
+    assert 'weather_provider_request_seconds_count{provider="working"} 1.0\n' in text
+    assert 'weather_provider_request_seconds_count{provider="broken"} 1.0\n' in text
+    assert metrics.get_value("weather_provider_failures_total", {"provider": "broken"}) == 1
+    assert metrics.get_value("weather_provider_failures_total", {"provider": "working"}) == 0
+    registry.close()
@@ -0,0 +1,74 @@
+import psychrometrics
+from weather_logger import weather_logger
+from array import array
+import numpy
+import pytest
+
+@pytest.fixture
+def offline_logger(offline_config, mocker) -> weather_logger:
+    """
+    weather_logger with no network, NMEA or data log
+    """
+    mocker.patch("config.use_online_weather", False)
+    return weather_logger()
+
+temperatures = numpy.linspace(-15, 40, 56)
+humidities = numpy.linspace(5, 100, 56)
+
+def test_dew_point_matches_scalar(offline_logger):
+    """
+    Test batched dew point matches the scalar method for every reading
+    """
+    wl = offline_logger
+    batched = psychrometrics.get_dew_point(temperatures, humidities)
+    scalar = [wl.get_dew_point(t, h) for t, h in zip(temperatures, humidities)]
+    numpy.testing.assert_allclose(batched, scalar, rtol=1e-12)
+
+def test_absolute_humidity_matches_scalar(offline_logger):
+    """
+    Test batched relative to absolute humidity matches the scalar method
+    """
+    wl = offline_logger
+    batched = psychrometrics.relative_to_absolute_humidity(humidities, temperatures)
+    scalar = [wl.relative_to_absolute_humidity(h, t) for t, h in zip(temperatures, humidities)]
+    numpy.testing.assert_allclose(batched, scalar, rtol=1e-12)
+
+def test_relative_humidity_round_trip(offline_logger):
+    """
+    Test absolute to relative humidity inverts the conversion and matches the scalar method
+    """
+    wl = offline_logger
+    absolute = psychrometrics.relative_to_absolute_humidity(humidities, temperatures)
+    batched = psychrometrics.absolute_to_relative_humidity(absolute, temperatures)
+    scalar = [wl.absolute_to_relative_humidity(a, t) for t, a in zip(temperatures, absolute)]
+    numpy.testing.assert_allclose(batched, humidities, rtol=1e-12)
+    numpy.testing.assert_allclose(batched, scalar, rtol=1e-12)
+
+def test_saturation_vapor_pressure_matches_scalar(offline_logger):
+    """
+    Test batched saturation vapour pressure matches the scalar method
+    """
+    wl = offline_logger
+    kelvin = temperatures + 273.15
+    batched = psychrometrics.get_saturation_vapor_pressure(kelvin)
+    scalar = [wl.get_saturation_vapor_pressure(k) for k in kelvin]
+    numpy.testing.assert_allclose(batched, scalar, rtol=1e-12)
+
+def test_get_humidity_series():
+    """
+    Test only samples with both temperature and humidity are paired
+    """
+    series = psychrometrics.get_humidity_series(array('d', [0, 60, 120]), array('d', [20, 21, 22]), array('d', [60, 120, 180]), array('d', [50, 60, 70]))
+    assert list(series["timestamps"]) == [60, 120]
+    numpy.testing.assert_allclose(series["dewpoint"], psychrometrics.get_dew_point([21, 22], [50, 60]))
+
+def test_weather_logger_humidity_series(offline_logger):
+    """
+    Test series are built from the logged history
+    """
+    wl = offline_logger
+    for minute in range(10):
+        wl.history.record(minute * 60, {"temperature": 20.0, "humidity": 50.0 + minute})
+    series = wl.get_humidity_series(120, 300)
+    assert len(series["dewpoint"]) == 4
+    numpy.testing.assert_allclose(series["dewpoint"][0], wl.get_dew_point(20.0, 52.0), rtol=1e-12)
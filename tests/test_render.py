@@ -0,0 +1,126 @@
+from render import render_frame, WHITE, BLACK, RED
+from icons import load_icons
+from display import mock_display, refresh_controller
+from render import format_lat_long
+from weather_logger import weather_logger
+from nmea import tcp_nmea
+import main
+import config
+import os
+import time
+import pytest
+
+PATH = os.path.join(os.path.dirname(__file__), "..")
+
+snapshot = {
+    "time": 1687633200, "lat_long": [50.8834, -1.3036], "temperature": 22.7, "pressure": 1020.3,
+    "wind_speed": 3.8, "wind_gusts": 10.7, "wind_direction": 165, "dewpoint": 12.6, "weather_icon": "sun",
+    "offset_time": 1687622400, "offset_lat_long": [50.8, -1.3], "offset_temperature": 24.4, "offset_pressure": 1021.5,
+    "offset_wind_speed": 5.8, "offset_wind_gusts": 14.0, "offset_wind_direction": 201, "offset_dewpoint": 13.9, "offset_weather_icon": "rain"
+}
+
+@pytest.mark.parametrize("resolution", [(212, 104), (250, 122)])
+def test_render_frame(resolution):
+    """
+    Test a palettised frame of the display size using only Inky colours is rendered
+    """
+    icons, masks = load_icons(PATH, (WHITE, BLACK, RED))
+    image = render_frame(snapshot, resolution, icons, masks)
+    assert image.mode == "P"
+    assert image.size == resolution
+    assert set(image.tobytes()) == {WHITE, BLACK, RED}
+
+def test_render_frame_columns():
+    """
+    Test current readings are black on the left and offset readings red on the right
+    """
+    image = render_frame(snapshot, (212, 104))
+    left = set(image.crop((0, 0, 105, 104)).tobytes())
+    right = set(image.crop((107, 0, 212, 104)).tobytes())
+    assert BLACK in left and RED not in left
+    assert RED in right and BLACK not in right
+
+def test_render_frame_repeatable():
+    """
+    Test the same snapshot always renders the same frame, so unchanged readings skip refreshes
+    """
+    assert render_frame(snapshot, (250, 122)).tobytes() == render_frame(dict(snapshot), (250, 122)).tobytes()
+
+def test_render_frame_missing_values():
+    """
+    Test an empty snapshot renders placeholders rather than failing
+    """
+    image = render_frame({}, (212, 104))
+    assert image.size == (212, 104)
+
+def test_render_frame_unsupported_resolution():
+    with pytest.raises(RuntimeError):
+        render_frame(snapshot, (400, 300))
+
+def test_update_display_mock(tmp_path):
+    """
+    Test the pipeline from weather snapshot to mock display, and the skip of an unchanged frame
+    """
+    class stub_weather:
+        def get_weather_data(self) -> dict:
+            return {}
+        def get_display_snapshot(self, weather_data: dict) -> dict:
+            return dict(snapshot)
+    output_file = str(tmp_path / "frame.png")
+    display = mock_display((212, 104), output_file)
+    icons, masks = main.get_icons(display)
+    refresh = refresh_controller({}, 3600)
+    assert main.update_display(stub_weather(), display, refresh, icons, masks)
+    assert not main.update_display(stub_weather(), display, refresh, icons, masks)
+    assert display.shown == 1
+    assert os.path.exists(output_file)
+
+def test_format_lat_long():
+    assert format_lat_long([50.883391, -1.303632]) == "50.8834N, -1.3036E"
+    assert format_lat_long([]) == "--N, --E"
+    assert format_lat_long(["N/A", None]) == "--N, --E"
+
+def test_render_with_gps_fix(offline_config, mocker):
+    """
+    Test a frame renders from a logged reading with a real GPS fix
+    """
+    mocker.patch("config.use_online_weather", False)
+    weather = weather_logger()
+    weather.gps_nmea = tcp_nmea()
+    weather.gps_nmea.reader_running = True
+    weather.gps_nmea.connected = True
+    weather.gps_nmea.process_line(b"$GPRMC,124027.00,A,5053.00348,N,00118.21794,W,0.009,,110623,,,A*63\r\n", time.time())
+    snapshot = weather.get_display_snapshot(weather.get_weather_data())
+    assert snapshot["lat_long"] == [50.883391, -1.303632]
+    image = render_frame(snapshot, (212, 104))
+    assert image.size == (212, 104)
+
+def test_undisplayed_changes_skipped(mocker):
+    """
+    Test changes below threshold in displayed values, with any change in values not displayed, skip the refresh
+    """
+    mocker.patch("config.refresh_thresholds", {"temperature": 0.5, "lat_long": 0.01, "offset_lat_long": 0.01})
+    refresh = refresh_controller(config.refresh_thresholds, 3600)
+    display = mock_display((212, 104))
+    current = dict(snapshot, humidity=62.21, offset_humidity=70.0, offset_latitude=50.8, offset_longitude=-1.3)
+    assert refresh.refresh(display, render_frame(current, (212, 104)), main.get_displayed_values(current), 1000)
+    changed = dict(current, temperature=22.8, humidity=62.25, offset_humidity=70.4, offset_latitude=50.801,
+                   offset_lat_long=[50.801, -1.3], lat_long=[50.8844, -1.3036], time=1687633260)
+    assert "humidity" not in main.get_displayed_values(changed)
+    assert not refresh.refresh(display, render_frame(changed, (212, 104)), main.get_displayed_values(changed), 1060)
+    moved = dict(changed, offset_lat_long=[50.9, -1.3])
+    assert refresh.refresh(display, render_frame(moved, (212, 104)), main.get_displayed_values(moved), 1120)
+
+@pytest.mark.parametrize("argv", [["main.py", "--mock"], ["main.py", "--mock", "--daemon"]])
+def test_main_closes_weather_logger(argv, mocker):
+    """
+    Test the weather logger is closed on both run paths, even when the run fails
+    """
+    mocker.patch("sys.argv", argv)
+    weather = mocker.patch("main.weather_logger").return_value
+    mocker.patch("main.get_icons", return_value=({}, {}))
+    mocker.patch("main.update_display", side_effect=OSError("display unplugged"))
+    mocker.patch("main.run_daemon", side_effect=KeyboardInterrupt)
+    with pytest.raises((OSError, KeyboardInterrupt)):
+        main.main()
+    weather.close.assert_called_once()
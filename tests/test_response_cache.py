@@ -0,0 +1,71 @@
+from response_cache import response_cache
+import os
+
+def test_key_rounds_to_grid_and_hour():
+    """
+    Test nearby positions in the same hour share a key and the next hour does not
+    """
+    cache = response_cache(grid=0.1)
+    key = cache.get_key([50.904, -1.404], "q", 1687633200)
+    assert key == cache.get_key([50.88, -1.37], "q", 1687633200 + 3599)
+    assert key != cache.get_key([50.904, -1.404], "q", 1687633200 + 3600)
+    assert key != cache.get_key([51.0, -1.404], "q", 1687633200)
+    assert key != cache.get_key([50.904, -1.404], "other", 1687633200)
+
+def test_get_put_and_ttl():
+    """
+    Test stored responses are returned until the TTL expires
+    """
+    cache = response_cache(ttl=60)
+    cache.put("a", {"value": 1}, now=1000)
+    assert cache.get("a", now=1059) == {"value": 1}
+    assert cache.get("a", now=1060) is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_lru_eviction():
+    """
+    Test the least recently used entry is dropped when full
+    """
+    cache = response_cache(max_entries=2)
+    cache.put("a", 1, now=1000)
+    cache.put("b", 2, now=1000)
+    cache.get("a", now=1001)
+    cache.put("c", 3, now=1002)
+    assert cache.get("b", now=1003) is None
+    assert cache.get("a", now=1003) == 1
+    assert cache.get("c", now=1003) == 3
+
+def test_persists_to_disk(tmp_path):
+    """
+    Test a new cache reloads entries saved by an earlier one
+    """
+    cache_file = os.path.join(tmp_path, "cache", "weather.json")
+    cache = response_cache(cache_file, ttl=3600)
+    key = cache.get_key([50.9, -1.4], "q")
+    cache.put(key, {"hourly": {"temperature_2m": [21.5]}})
+    reloaded = response_cache(cache_file, ttl=3600)
+    assert reloaded.get(key) == {"hourly": {"temperature_2m": [21.5]}}
+
+def test_ignores_corrupt_file(tmp_path):
+    """
+    Test an unreadable cache file starts an empty cache
+    """
+    cache_file = os.path.join(tmp_path, "weather.json")
+    with open(cache_file, "w") as broken:
+        broken.write("{not json")
+    cache = response_cache(cache_file)
+    assert len(cache) == 0
+
+def test_drop_oldest():
+    """
+    Test the least recently used entry is dropped first
+    """
+    cache = response_cache()
+    cache.put("a", 1, 1000)
+    cache.put("b", 2, 1000)
+    cache.get("a", 1001)
+    assert cache.drop_oldest()
+    assert list(cache.entries) == ["a"]
+    assert cache.drop_oldest()
+    assert not cache.drop_oldest()
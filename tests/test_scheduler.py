@@ -0,0 +1,63 @@
+from scheduler import scheduler
+import threading
+
+def test_jobs_run_on_their_cadence():
+    """
+    Test each job runs when due on its own interval
+    """
+    runs = []
+    jobs = scheduler()
+    jobs.add_job("fast", 1, lambda: runs.append("fast"))
+    jobs.add_job("slow", 3, lambda: runs.append("slow"), delay=1)
+    for now in range(5):
+        jobs.run_pending(1000 + now)
+    assert runs == ["fast", "fast", "slow", "fast", "fast", "fast", "slow"]
+
+def test_wait_until_next_job():
+    """
+    Test run_pending returns the time until the next job is due
+    """
+    jobs = scheduler()
+    jobs.add_job("log", 60, lambda: None)
+    jobs.add_job("display", 300, lambda: None, delay=10)
+    assert jobs.run_pending(1000) == 10
+    assert jobs.run_pending(1010) == 50
+
+def test_missed_runs_skipped():
+    """
+    Test a job started late skips the missed runs instead of catching up
+    """
+    runs = []
+    jobs = scheduler()
+    logging = jobs.add_job("log", 10, lambda: runs.append(1))
+    jobs.run_pending(1000)
+    jobs.run_pending(1035)
+    jobs.run_pending(1036)
+    assert len(runs) == 2
+    assert logging.skipped == 2
+    assert logging.overruns == 1
+    assert logging.next_run == 1040
+
+def test_overrun_and_errors_reported(mocker):
+    """
+    Test a job longer than its interval counts as an overrun and errors don't stop the scheduler
+    """
+    mocker.patch("time.monotonic", side_effect=[0, 5, 5, 5])
+    jobs = scheduler()
+    slow = jobs.add_job("slow", 2, lambda: None)
+    broken = jobs.add_job("broken", 2, lambda: 1 / 0)
+    jobs.run_pending(0)
+    assert slow.overruns == 1 and slow.max_duration == 5
+    assert broken.errors == 1 and broken.runs == 1
+    assert jobs.get_stats()["slow"]["runs"] == 1
+
+def test_run_until_stopped():
+    """
+    Test run() returns once stop() is called
+    """
+    jobs = scheduler()
+    jobs.add_job("stop", 0.01, jobs.stop)
+    thread = threading.Thread(target=jobs.run)
+    thread.start()
+    thread.join(2)
+    assert not thread.is_alive()
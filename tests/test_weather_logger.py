@@ -1,7 +1,11 @@
 from weather_logger import weather_logger
+from memory_guard import get_object_size
 import config
 from open_meteo import weather_api
 import time
+import os
+import json
+from nmea import tcp_nmea
 
 def test_weather_logger_online_weather_false(mocker):
     """
@@ -133,6 +137,26 @@ def test_cardinal_to_signed_lat_long():
     lat_long3 = [56.345, 1.045]
     assert converted3 == lat_long3
 
+def test_get_lat_long_from_gps(offline_config, mocker):
+    """
+    Test a GPS fix is converted from NMEA degrees and minutes to signed decimal degrees, for N/E and S/W
+    """
+    mocker.patch("config.use_online_weather", False)
+    wl = weather_logger()
+    wl.gps_nmea = mocker.Mock()
+    wl.gps_nmea.get_lat_long.return_value = {"lat": "5053.00348", "ns": "N", "long": "00118.21794", "ew": "E"}
+    assert wl.get_lat_long() == [50.883391, 1.303632]
+    wl.gps_nmea.get_lat_long.return_value = {"lat": "3351.50000", "ns": "S", "long": "15112.75000", "ew": "W"}
+    assert wl.get_lat_long() == [-33.858333, -151.2125]
+    wl.default_lat_long = [50.9, -1.4]
+    wl.gps_nmea.get_lat_long.return_value = {"lat": "", "ns": "", "long": "", "ew": ""}
+    assert wl.get_lat_long() == [50.9, -1.4]
+
+    wl.log_weather_data({"reading_time": 1687633200, "lat_long": [-33.858333, -151.2125], "weather_readings": {}})
+    readings = wl.history.get_readings_at(1687633200)
+    assert readings["latitude"] == -33.858333
+    assert readings["longitude"] == -151.2125
+
 # Need to mock the whole nmea thing as object doesn't exist if skip connection
 # def test_get_reading_time(mocker):
 #     """
@@ -188,4 +212,120 @@ def test_ground_wind_from_port_apparent():
     gps_vector = [20, 15]
     ground_vector = [214.6, 54.3]
     calculated_ground_vector = wl.ground_wind_from_apparent(apparent_vector, gps_vector)
-    assert ground_vector == calculated_ground_vector
\ No newline at end of file
+    assert ground_vector == calculated_ground_vector
+
+def test_history_sized_from_retention(offline_config, mocker):
+    """
+    Test the in memory history keeps data_retention hours in its coarsest tier and no tier keeps more
+    """
+    mocker.patch("config.use_online_weather", False)
+    mocker.patch("config.history_tiers", [[600, 72], [60, 12]])
+    mocker.patch("config.data_retention", 6)
+    wl = weather_logger()
+    assert wl.get_history_tiers() == [[60, 6], [600, 6]]
+    assert wl.history.tiers[-1]["pressure"].capacity == 6 * 6 + 1
+    mocker.patch("config.data_retention", 48)
+    wl = weather_logger()
+    assert wl.get_history_tiers() == [[60, 12], [600, 48]]
+    assert wl.history.tiers[-1]["pressure"].capacity == 48 * 6 + 1
+
+def test_offset_wind_gusts_from_history(offline_config, mocker):
+    """
+    Test logged wind gusts are served as offset readings from local history
+    """
+    mocker.patch("config.use_online_weather", False)
+    wl = weather_logger()
+    wl.log_weather_data({"reading_time": 1687633200, "lat_long": [], "weather_readings": {"wind_speed": 12.5, "wind_gusts": 18.3}})
+    assert wl.get_offset_readings(1687633200 + wl.offset_hours * 3600)["wind_gusts"] == 18.3
+
+def test_online_fill_only_missing_readings(offline_config, mocker):
+    """
+    Test only missing readings are requested online and local readings are kept
+    """
+    mocker.patch("config.use_online_weather", True)
+    wl = weather_logger()
+    wl.sensors_nmea = mocker.Mock()
+    wl.sensors_nmea.get_transducer_data.return_value = {"Temperature": {"value": "21.5", "unit": "C", "label": "TEMP"}}
+    get_weather = mocker.patch.object(wl.online_weather, "get_weather", return_value={"temperature": 25.0, "pressure": 1020.3, "offset_pressure": 1021.5, "weather_icon": "sun"})
+    readings = wl.get_weather_readings([50.9, -1.4])
+    assert get_weather.call_args.args[2] == ["pressure", "dewpoint", "wind_direction", "wind_speed", "wind_gusts", "weather_code"]
+    assert readings["temperature"] == 21.5
+    assert readings["pressure"] == 1020.3
+    assert readings["weather_icon"] == "sun"
+    assert wl.fill_offset_readings({"pressure": None, "temperature": 20.1}) == {"pressure": 1021.5, "temperature": 20.1}
+
+def test_quiet_sensors_go_online(offline_config, mocker):
+    """
+    Test a quiet sensor source is skipped without reading it and its readings come from online
+    """
+    mocker.patch("config.use_online_weather", True)
+    wl = weather_logger()
+    wl.sensors_nmea = mocker.Mock()
+    wl.sensors_nmea.is_available.return_value = False
+    mocker.patch.object(wl.online_weather, "get_weather", return_value={"temperature": 25.0, "pressure": 1020.3})
+    readings = wl.get_weather_readings([50.9, -1.4])
+    wl.sensors_nmea.get_transducer_data.assert_not_called()
+    assert readings["temperature"] == 25.0
+    assert readings["pressure"] == 1020.3
+    assert wl.get_reading_ages() == {}
+
+def test_reading_ages(offline_config, mocker):
+    """
+    Test local readings are aged from when their sentence was received
+    """
+    mocker.patch("config.use_online_weather", False)
+    wl = weather_logger()
+    wl.sensors_nmea = mocker.Mock()
+    wl.sensors_nmea.is_available.return_value = True
+    wl.sensors_nmea.get_transducer_data.return_value = {"Temperature": {"value": "21.5", "unit": "C", "label": "TEMP"}, "timestamp": 1000.0}
+    readings = wl.get_weather_readings()
+    assert readings["temperature"] == 21.5
+    assert wl.get_reading_ages(1003.0) == {"temperature": 3.0}
+
+def test_memory_guard_budgets(offline_config, mocker):
+    """
+    Test the memory guard holds the history and weather cache to their budgets when enabled
+    """
+    mocker.patch("config.use_online_weather", True)
+    mocker.patch("config.memory_guard_interval", 300)
+    mocker.patch("config.memory_trace", False)
+    mocker.patch("config.memory_history_budget", 1)
+    mocker.patch("config.memory_cache_budget", 1)
+    wl = weather_logger()
+    for hour in range(3):
+        wl.online_weather.cache.put("key{}".format(hour), {"hourly": list(range(100))}, 1000)
+    stats = wl.memory_guard.check()
+    assert [budget.name for budget in wl.memory_guard.budgets] == ["history", "weather_cache"]
+    assert stats["weather_cache"]["size"] == get_object_size(wl.online_weather.cache.entries)
+    assert len(wl.online_weather.cache) == 0
+    assert wl.history.tiers[0]["pressure"].capacity < 721
+    wl.close()
+
+def test_startup_skips_heavy_imports():
+    """
+    Test importing main loads none of the online, numpy, PIL or metrics server dependencies until they are used
+    """
+    import subprocess
+    import sys
+    code = "import sys, main; print(' '.join(module for module in ['numpy', 'requests', 'geocoder', 'PIL', 'http.server', 'open_meteo', 'inky'] if module in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.join(os.path.dirname(__file__), ".."), check=True)
+    assert result.stdout.strip() == ""
+
+def test_online_weather_with_gps_fix(offline_config, mocker):
+    """
+    Test online weather is looked up and cached for the GPS position when local readings are missing
+    """
+    mocker.patch("config.use_online_weather", True)
+    mocker.patch("config.weather_providers", ["open_meteo"])
+    wl = weather_logger()
+    wl.gps_nmea = tcp_nmea()
+    wl.gps_nmea.reader_running = True
+    wl.gps_nmea.connected = True
+    wl.gps_nmea.process_line(b"$GPRMC,124027.00,A,5053.00348,N,00118.21794,W,0.009,,110623,,,A*63\r\n", time.time())
+    response = mocker.Mock(status_code=200, text=json.dumps({"hourly": {"time": [], "pressure_msl": []}}))
+    get = mocker.patch.object(wl.online_weather.client, "get", return_value=response)
+    wl.get_weather_data()
+    assert "latitude=50.883391&longitude=-1.303632" in get.call_args.args[0]
+    assert len(wl.online_weather.cache) == 1
+    assert next(iter(wl.online_weather.cache.entries)).startswith("50.9,-1.3,")
+    wl.close()
@@ -0,0 +1,79 @@
+from wind import ground_wind_from_apparent, wind_window, wind_engine
+import pytest
+
+def test_ground_wind_from_stbd_apparent():
+    """
+    Correct ground wind from starboard apparent wind
+    """
+    direction, speed = ground_wind_from_apparent(50, 10, 88, 4)
+    assert [round(direction, 1), round(speed, 1)] == [160.4, 8.0]
+
+def test_ground_wind_from_port_apparent():
+    """
+    Correct ground wind from port apparent wind, 0-360 angles give the same result
+    """
+    direction, speed = ground_wind_from_apparent(-160, 40, 20, 15)
+    assert [round(direction, 1), round(speed, 1)] == [214.6, 54.3]
+    direction, speed = ground_wind_from_apparent(200, 40, 20, 15)
+    assert [round(direction, 1), round(speed, 1)] == [214.6, 54.3]
+
+def test_ground_wind_stationary():
+    """
+    Test no speed over ground gives the apparent wind without dividing by zero
+    """
+    direction, speed = ground_wind_from_apparent(90, 12, 180, 0)
+    assert direction == pytest.approx(270)
+    assert speed == pytest.approx(12)
+
+def test_ground_wind_calm():
+    """
+    Test motoring into no wind gives no ground wind
+    """
+    direction, speed = ground_wind_from_apparent(0, 6, 45, 6)
+    assert speed == pytest.approx(0)
+
+def test_wind_window_circular_mean():
+    """
+    Test directions either side of north average to north, not south
+    """
+    window = wind_window(60)
+    window.add(0, 350, 10)
+    window.add(1, 10, 10)
+    wind = window.get_wind()
+    assert wind["direction"] == pytest.approx(0, abs=1e-9) or wind["direction"] == pytest.approx(360)
+    assert wind["speed"] == pytest.approx(10)
+    assert wind["vector_speed"] < 10
+
+def test_wind_window_expiry_and_gust():
+    """
+    Test old samples and gusts leave the window
+    """
+    window = wind_window(10)
+    window.add(0, 180, 25)
+    window.add(5, 180, 10)
+    assert window.get_wind()["gust"] == 25
+    window.add(11, 180, 12)
+    wind = window.get_wind()
+    assert wind["gust"] == 12
+    assert wind["samples"] == 2
+    assert wind["speed"] == pytest.approx(11)
+
+def test_wind_engine_windows():
+    """
+    Test each window averages over its own period
+    """
+    engine = wind_engine([10, 600])
+    for second in range(120):
+        engine.add_ground(second, 90, 5 if second < 100 else 15)
+    assert engine.get_wind(10)["speed"] == pytest.approx(15)
+    assert engine.get_wind(600)["speed"] == pytest.approx((100 * 5 + 20 * 15) / 120)
+    assert engine.get_wind(600)["gust"] == 15
+
+def test_wind_engine_expires_when_quiet():
+    """
+    Test passing now empties a window when samples stop
+    """
+    engine = wind_engine([10])
+    engine.add_apparent(0, 50, 10, 88, 4)
+    assert engine.get_wind(10, 5)["samples"] == 1
+    assert engine.get_wind(10, 20) == {}
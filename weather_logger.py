@@ -1,9 +1,19 @@
-from nmea import tcp_nmea
-from open_meteo import weather_api
+from nmea import nmea_pool
+from nmea_watchdog import staleness_watchdog
+from response_cache import response_cache
+import geocode
+import providers
+import metrics
+from memory_guard import memory_guard, get_object_size
+from history import tiered_history
+from data_log import data_log
+import psychrometrics
+import wind
 import config
+import os
 from time import time
 from constants import *
-from math import log, exp, sqrt, cos, acos, degrees, radians
+from math import log, exp
 
 class weather_logger:
     """
@@ -11,53 +21,188 @@ class weather_logger:
     """
     def __init__(self) -> None:
         if config.use_online_weather:
-            self.online_weather = weather_api()
+            from open_meteo import weather_api # Loads requests, only needed online
+            self.online_weather = weather_api(self.get_weather_cache())
         else:
             self.online_weather = None
+        self.weather_providers = self.get_weather_providers()
         self.offset_hours = config.offset_hours
         self.data_retention = config.data_retention
+        self.history = tiered_history(config.history_raw_minutes, config.history_raw_interval, self.get_history_tiers())
+        self.wind = wind.wind_engine(config.wind_windows)
+        self.online_offset_readings = {} # Offset readings from the last online lookup
+        self.reading_received = {} # Receive time of each local reading in the last get_weather_readings
+        self.open_data_log()
         self.set_default_lat_long()
         self.init_nmea_connections()
+        self.init_memory_guard()
+        self.init_metrics()
         return None
     
+    def get_weather_cache(self) -> response_cache:
+        """
+        Online weather response cache, saved to disk if config.weather_cache_file is set
+        """
+        path = None
+        if config.weather_cache_file:
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), config.weather_cache_file)
+        return response_cache(path, config.weather_cache_ttl, config.weather_cache_entries, config.weather_cache_grid)
+
+    def get_weather_providers(self) -> providers.provider_registry:
+        """
+        Register the providers in config.weather_providers, earlier ones taking
+        priority and providers listed together sharing a priority tier
+        """
+        registry = providers.provider_registry(config.weather_provider_deadline)
+        if not self.online_weather:
+            return registry
+        tiers = [[names] if isinstance(names, str) else names for names in config.weather_providers]
+        for priority, name in [(priority, name) for priority, names in enumerate(tiers) for name in names]:
+            if name == "open_meteo":
+                registry.register(providers.open_meteo_provider(self.online_weather, priority))
+            elif name == "meteomatics" and config.meteomatics_username and config.meteomatics_password:
+                import meteomatics
+                token_file = None
+                if config.meteomatics_token_file:
+                    token_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), config.meteomatics_token_file)
+                api = meteomatics.weather_api(config.meteomatics_username, config.meteomatics_password, token_file=token_file)
+                registry.register(providers.meteomatics_provider(api, priority))
+            else:
+                print("Skipping weather provider {}, unknown or not configured".format(name))
+        return registry
+
+    def get_history_tiers(self) -> list:
+        """
+        Rollup tiers from config.history_tiers sized from data_retention, the
+        coarsest keeping data_retention hours and none keeping more
+        Example:
+        data_retention 24, history_tiers [[60, 12], [600, 72]] = [[60, 12], [600, 24]]
+        """
+        tiers = [[seconds, min(hours, self.data_retention)] for seconds, hours in sorted(config.history_tiers)]
+        if tiers:
+            tiers[-1][1] = self.data_retention
+        return tiers
+
+    def open_data_log(self) -> None:
+        """
+        Open the on disk log if configured and reload the last data_retention hours into the history
+        """
+        self.data_log = None
+        if config.data_log_file:
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), config.data_log_file)
+            self.data_log = data_log(path, self.data_retention, config.history_interval, config.data_log_flush_records, config.data_log_fsync_interval)
+            for timestamp, readings in self.data_log.load():
+                self.history.record(timestamp, readings)
+
+        return None
+
     def set_default_lat_long(self) -> None:
+        """
+        Resolve config.city and config.countrycode from the geocode cache or
+        bundled gazetteer, only going online for places in neither
+        """
         self.default_lat_long = []
         if self.online_weather and config.city != False and config.countrycode != False:
-            self.default_lat_long = self.online_weather.get_latlong(config.city, config.countrycode)
+            path = os.path.dirname(os.path.abspath(__file__))
+            cache = geocode.geocode_cache(os.path.join(path, config.geocode_cache_file) if config.geocode_cache_file else None)
+            places = None
+            if config.gazetteer_file:
+                try:
+                    places = geocode.gazetteer(os.path.join(path, config.gazetteer_file))
+                except (OSError, ValueError) as error:
+                    print("Unable to load gazetteer:", error)
+            self.default_lat_long = geocode.resolve_latlong(config.city, config.countrycode, cache, places, self.online_weather.get_latlong)
 
         return None
 
     def init_nmea_connections(self) -> None:
         """
-        If both arguments are not false, configure, if any match an existing config, redirect to prevent connecting twice
-        """
-        self.gps_nmea = None
-        self.sensors_nmea = None
-        self.wind_nmea = None
-
-        # GPS NMEA
-        if config.gps_nmea_host and config.gps_nmea_port:
-            self.gps_nmea = tcp_nmea()
-            self.gps_nmea.connect(config.gps_nmea_host, config.gps_nmea_port)
-        # Weather NMEA
-        if config.sensors_nmea_host and config.sensors_nmea_port:
-            if config.sensors_nmea_host == config.gps_nmea_host and config.sensors_nmea_port == config.gps_nmea_port:
-                self.sensors_nmea = self.gps_nmea
-            else:            
-                self.sensors_nmea = tcp_nmea()
-                self.sensors_nmea.connect(config.sensors_nmea_host, config.sensors_nmea_port)
-        # Wind NMEA
-        if config.wind_nmea_host and config.wind_nmea_port:
-            if config.wind_nmea_host == config.gps_nmea_host and config.wind_nmea_port == config.gps_nmea_port:
-                self.wind_nmea = self.gps_nmea
-            elif config.wind_nmea_host == config.sensors_nmea_host and config.wind_nmea_port == config.sensors_nmea_port:
-                self.wind_nmea = self.sensors_nmea
-            else:
-                self.wind_nmea = tcp_nmea()
-                self.wind_nmea.connect(config.wind_nmea_host, config.wind_nmea_port)
-        
+        Get the GPS, sensor and wind connections from a pool keyed by host and port, so roles sharing a source share one connection.
+        Each connection runs a background reader so readings are served from its latest sentence table,
+        and reconnects by itself if the source goes away.
+        """
+        self.nmea_pool = nmea_pool()
+        self.gps_nmea = self.nmea_pool.get_connection("gps", config.gps_nmea_host, config.gps_nmea_port)
+        self.sensors_nmea = self.nmea_pool.get_connection("sensors", config.sensors_nmea_host, config.sensors_nmea_port)
+        self.wind_nmea = self.nmea_pool.get_connection("wind", config.wind_nmea_host, config.wind_nmea_port)
+
+        self.watchdog = staleness_watchdog()
+        self.watchdog.watch("gps", self.gps_nmea, "$GPRMC")
+        self.watchdog.watch("course", self.gps_nmea, "$GPVTG")
+        self.watchdog.watch("wind", self.wind_nmea, "$IIMWV")
+        self.watchdog.watch("sensors", self.sensors_nmea, "$YXXDR")
+
         return None
     
+    def init_memory_guard(self) -> None:
+        """
+        Hold the history and weather cache to their memory budgets if config.memory_guard_interval is set.
+        The history is never shed below offset_hours so the comparison readings survive.
+        """
+        self.memory_guard = None
+        if not config.memory_guard_interval:
+            return None
+        self.memory_guard = memory_guard(config.memory_rss_budget, config.memory_trace, config.memory_trace_frames, config.memory_trace_top)
+        self.memory_guard.add_budget("history", config.memory_history_budget, self.history.get_memory_size, lambda: self.history.shed(self.offset_hours))
+        if self.online_weather and self.online_weather.cache is not None:
+            cache = self.online_weather.cache
+            self.memory_guard.add_budget("weather_cache", config.memory_cache_budget, lambda: get_object_size(cache.entries), cache.drop_oldest)
+        self.memory_guard.start()
+        return None
+
+    def init_metrics(self) -> None:
+        """
+        Describe the logger's metrics and collect the NMEA, cache and source age stats when they are read
+        """
+        registry = metrics.get_registry()
+        registry.describe("nmea_sentences_total", "counter", "Valid sentences received by source and sentence ID")
+        registry.describe("nmea_rejected_sentences_total", "counter", "Lines rejected as malformed or failing their checksum")
+        registry.describe("nmea_checksum_failures_total", "counter", "Rejected lines that were whole sentences failing their checksum")
+        registry.describe("nmea_reconnects_total", "counter", "Connections made by the background reader")
+        registry.describe("nmea_connected", "gauge", "1 while the source is connected")
+        registry.describe("nmea_sentence_age_seconds", "gauge", "Seconds since each watched source last sent its sentence")
+        registry.describe("nmea_source_quiet", "gauge", "1 while the watchdog reports the source quiet")
+        registry.describe("weather_cache_hits_total", "counter", "Online weather lookups answered from the response cache")
+        registry.describe("weather_cache_misses_total", "counter", "Online weather lookups not in the response cache")
+        registry.describe("weather_provider_request_seconds", "histogram", "Seconds taken by each weather provider request")
+        registry.describe("weather_provider_failures_total", "counter", "Weather provider requests returning no data")
+        registry.describe("weather_provider_deadline_misses_total", "counter", "Weather provider requests still running at the deadline")
+        registry.describe("memory_rss_bytes", "gauge", "Resident memory at the last memory guard check")
+        registry.describe("memory_store_bytes", "gauge", "Bytes held by each budgeted store at the last memory guard check")
+        registry.describe("memory_sheds_total", "counter", "Times each budgeted store was shed to free memory")
+        registry.add_collector("weather_logger", self.get_metrics)
+        return None
+
+    def get_metrics(self) -> list:
+        """
+        Return (name, labels, value) samples for the NMEA sources, weather cache and memory guard, a metrics.metrics_registry collector
+        """
+        samples = self.nmea_pool.get_metrics()
+        for name, stats in self.watchdog.get_stats().items():
+            samples.append(("nmea_sentence_age_seconds", {"source": name}, stats["age"]))
+            samples.append(("nmea_source_quiet", {"source": name}, int(stats["quiet"])))
+        if self.online_weather and self.online_weather.cache is not None:
+            samples.append(("weather_cache_hits_total", {}, self.online_weather.cache.hits))
+            samples.append(("weather_cache_misses_total", {}, self.online_weather.cache.misses))
+        if self.memory_guard:
+            samples.append(("memory_rss_bytes", {}, self.memory_guard.rss))
+            for budget in self.memory_guard.budgets:
+                samples.append(("memory_store_bytes", {"store": budget.name}, budget.size))
+                samples.append(("memory_sheds_total", {"store": budget.name}, budget.sheds))
+        return samples
+
+    def close(self) -> None:
+        """
+        Close the NMEA connections, data log and provider threads, for a clean daemon shutdown
+        """
+        self.nmea_pool.close()
+        if self.data_log:
+            self.data_log.close()
+        self.weather_providers.close()
+        if self.memory_guard:
+            self.memory_guard.stop()
+        return None
+
     def ground_wind_from_apparent(self, apparent_vector: list, gps_vector:list) -> list:
         """
         Return a ground wind vector given the apparent wind angle
@@ -70,27 +215,47 @@ class weather_logger:
         Example:
         ground_wind_from_apparent([-160,40], [20, 15]) = [214.6, 54.3]
         """
-        
-        # Formula from here: https://seamankowts.net/how-to-calculate-true-wind-direction-and-true-wind-speed
-        
-        if apparent_vector[0] < 0:
-            ground_modifier = -1
-        else:
-            ground_modifier = 1
-        
-        apparent_vector[0] = radians(apparent_vector[0])
-        
-        true_speed = sqrt((gps_vector[1]**2) + (apparent_vector[1]**2) - (2 * gps_vector[1] * apparent_vector[1] * cos(apparent_vector[0])))
+        ground_direction, ground_speed = wind.ground_wind_from_apparent(apparent_vector[0], apparent_vector[1], gps_vector[0], gps_vector[1])
 
-        true_direction = degrees(acos((true_speed**2 + gps_vector[1]**2 - apparent_vector[1]**2) / (2 * true_speed * gps_vector[1])))
-        print(true_direction)
+        return [round(ground_direction, 1), round(ground_speed, 1)]
 
-        if apparent_vector[0] < 0:
-            ground_direction = 360 - (180 - true_direction - gps_vector[0])
-        else:
-            ground_direction = 180 - true_direction + gps_vector[0]
+    def wind_speed_to_knots(self, speed: float, units: str) -> float:
+        """
+        Convert a wind speed in tcp_nmea wind units to knots
+        """
+        if units == "km/h":
+            return speed / 1.852
+        if units == "m/s":
+            return speed * 3600 / 1852
+        return speed
+
+    def sample_wind(self, timestamp: float = None) -> None:
+        """
+        Feed the latest wind and course/speed over ground from NMEA to the wind
+        engine. Relative (R) wind is resolved to ground wind, true (T) wind is
+        taken as off the bow along the course.
+        """
+        if not self.wind_nmea or not self.gps_nmea:
+            return None
+        if not self.wind_nmea.is_available("$IIMWV") or not self.gps_nmea.is_available("$GPVTG"):
+            return None # Don't wait on a quiet source
+        if timestamp is None:
+            timestamp = time()
+        wind_data = self.wind_nmea.get_wind_data()
+        cog_sog = self.gps_nmea.get_cog_sog_data()
+        try:
+            angle = float(wind_data["angle"])
+            speed = self.wind_speed_to_knots(float(wind_data["speed"]), wind_data["units"])
+            course = float(cog_sog["cog"])
+            speed_over_ground = float(cog_sog["sog"])
+        except (KeyError, ValueError):
+            return None # No wind or no course to resolve it against
 
-        return [round(ground_direction, 1), round(true_speed, 1)]
+        if wind_data["reference"] == "R":
+            self.wind.add_apparent(timestamp, angle, speed, course, speed_over_ground)
+        else:
+            self.wind.add_ground(timestamp, (course + angle) % 360, speed)
+        return None
 
     # https://www.omnicalculator.com/physics/dew-point#how-to-calculate-dew-point-how-to-calculate-relative-humidity
     def get_dew_point(self, temperature_in_c: float, relative_humidity: int) -> float:
@@ -136,31 +301,54 @@ class weather_logger:
             (a1*v + a2*v**1.5 + a3*v**3 + a4*v**3.5 + a5*v**4 + a6*v**7.5)
         )
 
+    def get_humidity_series(self, start_time: float, end_time: float) -> dict:
+        """
+        Return dew point and absolute humidity series for the logged temperature
+        and humidity between start_time and end_time, batched with numpy.
+        See psychrometrics.get_humidity_series.
+        """
+        temperature_times, temperatures = self.history.get_range("temperature", start_time, end_time)
+        humidity_times, humidities = self.history.get_range("humidity", start_time, end_time)
+
+        return psychrometrics.get_humidity_series(temperature_times, temperatures, humidity_times, humidities)
+
     def cardinal_to_signed_lat_long(self, cardinal_lat_long: dict) -> list:
         """
-        Convert dictionary of lat long with N/S E/W designation to list of lat long signed floats
+        Convert dictionary of lat long in decimal degrees with N/S E/W designation to list of lat long signed floats
         Example:
         input: {"lat": 56.345, "ns": "n", "long": 1.045, "ew": "w"}
         output: [56.345, -1.045]
         """
         lat_long = []
-        if cardinal_lat_long["ns"] == "s":
-            lat_long.append(cardinal_lat_long["lat"] * -1)
+        if cardinal_lat_long["ns"].upper() == "S":
+            lat_long.append(float(cardinal_lat_long["lat"]) * -1)
         else:
-            lat_long.append(cardinal_lat_long["lat"])
-        if cardinal_lat_long["ew"] == "w":
-            lat_long.append(cardinal_lat_long["long"] * -1)
+            lat_long.append(float(cardinal_lat_long["lat"]))
+        if cardinal_lat_long["ew"].upper() == "W":
+            lat_long.append(float(cardinal_lat_long["long"]) * -1)
         else:
-            lat_long.append(cardinal_lat_long["long"])
+            lat_long.append(float(cardinal_lat_long["long"]))
         
         return lat_long
 
+    def nmea_to_decimal_degrees(self, position: str) -> float:
+        """
+        Convert an NMEA (d)ddmm.mmmm position to decimal degrees
+        Example:
+        nmea_to_decimal_degrees("5053.00348") = 50.8833913
+        """
+        value = float(position)
+        degrees = int(value // 100)
+        return degrees + (value - degrees * 100) / 60
+
     def get_reading_time(self) -> time:
         """
         Returns system time or returns GPS time if present and more than 120 seconds different
         """
         system_time = time()
         reading_time = system_time
+        if not self.gps_nmea:
+            return reading_time
         gps_time = self.gps_nmea.get_datetime()
         if gps_time:
             if abs(gps_time - system_time) > 120:
@@ -172,73 +360,190 @@ class weather_logger:
         """
         Determine most accurate lat/long for reading
         """
+        if not self.gps_nmea:
+            return self.default_lat_long
         gps_lat_long = self.gps_nmea.get_lat_long()
         if "e" in gps_lat_long:
-            lat_long = self.default_lat_long
-        else:
+            return self.default_lat_long
+        try:
+            gps_lat_long["lat"] = self.nmea_to_decimal_degrees(gps_lat_long["lat"])
+            gps_lat_long["long"] = self.nmea_to_decimal_degrees(gps_lat_long["long"])
             lat_long = self.cardinal_to_signed_lat_long(gps_lat_long)
-        return lat_long
+        except (ValueError, AttributeError):
+            return self.default_lat_long # No fix, the position fields are empty
+        return [round(lat_long[0], 6), round(lat_long[1], 6)]
     
+    def get_transducer_value(self, transducer: dict) -> float:
+        """
+        Convert a reading from tcp_nmea.get_transducer_data to a float in display units, pressure in bars becomes hPa
+        Example:
+        get_transducer_value({"value": "1.00167", "unit": "B", "label": "BARO"}) = 1001.67
+        """
+        value = float(transducer["value"])
+        if transducer["unit"] == "B":
+            value = round(value * 1000, 2)
+        return value
+
     def get_weather_readings(self, lat_long: list = []) -> dict:
         """
-        Get weather transducer readings if present, pass a lat/long for online lookup if enabled
+        Get weather transducer readings if present, pass a lat/long for online lookup if enabled.
+        A quiet source is skipped, not waited on, so its readings come from online straight away.
         """
         weather_readings = {}
         missing_data = False
+        self.reading_received = {}
         
-        local_sensors = self.sensors_nmea.get_transducer_data()
+        local_sensors = {}
+        if self.sensors_nmea and self.sensors_nmea.is_available("$YXXDR"):
+            local_sensors = self.sensors_nmea.get_transducer_data()
         try:
-            weather_readings["temperature"] = local_sensors["Temperature"]
+            weather_readings["temperature"] = self.get_transducer_value(local_sensors["Temperature"])
         except:
             weather_readings["temperature"] = None
             missing_data = True
         try:
-            weather_readings["pressure"] = local_sensors["Pressure"]
+            weather_readings["pressure"] = self.get_transducer_value(local_sensors["Pressure"])
         except:
             weather_readings["pressure"] = None
             missing_data = True
         try:
-            weather_readings["humidity"] = local_sensors["Humidity"]
+            weather_readings["humidity"] = self.get_transducer_value(local_sensors["Humidity"])
         except:
             weather_readings["humidity"] = None
             missing_data = True
         
-        local_wind = self.wind_nmea.get_wind_data()
-        if local_wind["reference"] == "R":
-            try:
-                local_wind["direction"] = local_sensors["wind_direction"]
-            except:
-                weather_readings["wind_direction"] = None
-                missing_data = True
-            try:
-                local_wind["speed"] = local_sensors["wind_speed"]
-            except:
-                weather_readings["wind_speed"] = None
-                missing_data = True
+        for reading in ["temperature", "pressure", "humidity"]:
+            if weather_readings[reading] is not None:
+                self.reading_received[reading] = local_sensors.get("timestamp")
+
+        self.sample_wind()
+        local_wind = None
+        if self.wind_nmea and self.wind_nmea.is_available("$IIMWV"):
+            local_wind = self.wind.get_wind(config.wind_display_window, time())
+        if local_wind:
+            weather_readings["wind_direction"] = round(local_wind["direction"])
+            weather_readings["wind_speed"] = round(local_wind["speed"], 1)
+            weather_readings["wind_gusts"] = round(local_wind["gust"], 1)
+            wind_received = self.wind_nmea.get_latest_sentence("$IIMWV").get("received")
+            for reading in ["wind_direction", "wind_speed", "wind_gusts"]:
+                self.reading_received[reading] = wind_received
         else:
             weather_readings["wind_direction"] = None
             weather_readings["wind_speed"] = None
+            weather_readings["wind_gusts"] = None
             missing_data = True
 
+        self.online_offset_readings = {}
         if self.online_weather and lat_long and missing_data == True:
+            online_readings = self.get_online_readings(weather_readings)
             try:
-                net_weather = self.online_weather.get_weather(lat_long, self.offset_hours)
-                for reading in weather_readings:
-                    if reading == None:
-                        #get reading from net_weather
-                        print("Not actually looking up weather online right now - code arrives on Tuesday")
-                        pass
-            except:
-                print ("Online weather not enabled and available")
+                net_weather = self.weather_providers.get_weather(lat_long, self.offset_hours, online_readings)
+            except Exception as error:
+                print("Online weather not available:", error)
+                net_weather = {}
+            for reading in online_readings + ["weather_icon"]:
+                if reading in net_weather and weather_readings.get(reading) is None:
+                    weather_readings[reading] = net_weather[reading]
+                if "offset_" + reading in net_weather:
+                    self.online_offset_readings[reading] = net_weather["offset_" + reading]
         return weather_readings
+
+    def get_reading_ages(self, now: float = None) -> dict:
+        """
+        Seconds since each local reading in the last get_weather_readings was received by its source
+        Example:
+        get_reading_ages() = {"temperature": 1.2, "pressure": 1.2, "humidity": 1.2}
+        """
+        if now is None:
+            now = time()
+        ages = {}
+        for reading, received in self.reading_received.items():
+            if received is not None:
+                ages[reading] = round(max(0.0, now - received), 1)
+        return ages
+
+    def get_online_readings(self, weather_readings: dict) -> list:
+        """
+        Return the online readings needed to fill the gaps in weather_readings,
+        humidity is covered by an online dew point. The weather code for the
+        icon is always included as there is no local source.
+        Example:
+        get_online_readings({"temperature": 21.5, "pressure": None, "humidity": None}) = ["pressure", "dewpoint", "weather_code"]
+        """
+        online_readings = []
+        for reading in weather_readings:
+            if weather_readings[reading] is None:
+                online_readings.append("dewpoint" if reading == "humidity" else reading)
+        online_readings.append("weather_code")
+        return online_readings
+
+    def fill_offset_readings(self, offset_readings: dict) -> dict:
+        """
+        Fill offset readings not in the history from the last online lookup
+        """
+        for reading, value in self.online_offset_readings.items():
+            if offset_readings.get(reading) is None:
+                offset_readings[reading] = value
+        return offset_readings
     
     def get_weather_data (self) -> dict:
         """
-        Collect and log a set of weather data with timestamp
+        Collect and log a set of weather data with timestamp, along with the
+        logged readings from offset_hours before
         """
         weather_data = {}
         weather_data["reading_time"] = self.get_reading_time()
         weather_data["lat_long"] = self.get_lat_long()
         weather_data["weather_readings"] = self.get_weather_readings(weather_data["lat_long"])
+        self.log_weather_data(weather_data)
+        weather_data["offset_readings"] = self.fill_offset_readings(self.get_offset_readings(weather_data["reading_time"]))
+
+        return weather_data
+
+    def get_display_snapshot(self, weather_data: dict) -> dict:
+        """
+        Flatten weather data from get_weather_data into a render.render_frame
+        snapshot, current readings plus the logged readings from offset_hours before
+        """
+        snapshot = {}
+        snapshot["time"] = weather_data["reading_time"]
+        snapshot["lat_long"] = weather_data["lat_long"]
+        snapshot.update(weather_data["weather_readings"])
+        snapshot["dewpoint"] = self.get_snapshot_dew_point(weather_data["weather_readings"])
+
+        offset_readings = weather_data["offset_readings"]
+        snapshot["offset_time"] = weather_data["reading_time"] - self.offset_hours * 3600
+        if offset_readings["latitude"] is not None and offset_readings["longitude"] is not None:
+            snapshot["offset_lat_long"] = [offset_readings["latitude"], offset_readings["longitude"]]
+        for reading in offset_readings:
+            snapshot["offset_" + reading] = offset_readings[reading]
+        snapshot["offset_dewpoint"] = self.get_snapshot_dew_point(offset_readings)
+
+        return snapshot
+
+    def get_snapshot_dew_point(self, readings: dict) -> float:
+        """
+        Dew point from readings with temperature and humidity, or an online dewpoint, rounded for display
+        """
+        if readings.get("temperature") is not None and readings.get("humidity"):
+            return round(self.get_dew_point(readings["temperature"], readings["humidity"]), 1)
+        return readings.get("dewpoint")
 
-        return weather_data
\ No newline at end of file
+    def log_weather_data(self, weather_data: dict) -> None:
+        """
+        Add a set of weather data from get_weather_data to the history and the on disk log
+        """
+        readings = dict(weather_data["weather_readings"])
+        if weather_data["lat_long"]:
+            readings["latitude"] = weather_data["lat_long"][0]
+            readings["longitude"] = weather_data["lat_long"][1]
+        self.history.record(weather_data["reading_time"], readings)
+        if self.data_log:
+            self.data_log.append(weather_data["reading_time"], readings)
+        return None
+
+    def get_offset_readings(self, reading_time: float) -> dict:
+        """
+        Return the logged readings from offset_hours before reading_time, None for any channel not logged then
+        """
+        return self.history.get_readings_at(reading_time - self.offset_hours * 3600)
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Streaming ground wind from apparent wind and GPS course/speed over ground,
+with vector averaged wind and peak gust over trailing time windows.
+"""
+
+from collections import deque
+from math import atan2, cos, sin, sqrt, degrees, radians
+
+def ground_wind_from_apparent(apparent_angle: float, apparent_speed: float, course: float, speed: float) -> tuple:
+    """
+    Return the (direction, speed) the wind is blowing from over the ground
+    given the apparent wind angle off the bow (+/- 0-180, - being port, or 0-360),
+    the apparent wind speed and the GPS course and speed over ground.
+    Speeds must share units. The bow is assumed to point along the course.
+    Works by vector addition so a stationary boat (speed 0) is fine.
+    Example:
+    ground_wind_from_apparent(-160, 40, 20, 15) = (214.58..., 54.34...)
+    """
+    # Air movement seen on board, a wind from a bearing moves air towards its reciprocal
+    apparent_bearing = radians(course + apparent_angle)
+    air_x = -apparent_speed * sin(apparent_bearing)
+    air_y = -apparent_speed * cos(apparent_bearing)
+    # Add the boat's own movement over the ground back in
+    course = radians(course)
+    air_x += speed * sin(course)
+    air_y += speed * cos(course)
+
+    ground_speed = sqrt(air_x**2 + air_y**2)
+    ground_direction = degrees(atan2(-air_x, -air_y)) % 360
+    return (ground_direction, ground_speed)
+
+class wind_window:
+    """
+    Wind over a trailing window of seconds. Keeps running vector and speed sums
+    and a monotonic queue of speeds so each sample and each query is O(1) amortised.
+    """
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.samples = deque() # (timestamp, x, y, speed)
+        self.gusts = deque() # (timestamp, speed) with speeds decreasing
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_speed = 0.0
+        self.removed = 0 # Samples expired since the sums were last rebuilt
+        return None
+
+    def add(self, timestamp: float, direction: float, speed: float) -> None:
+        """
+        Add a ground wind sample, direction in degrees the wind is from
+        """
+        x = speed * sin(radians(direction))
+        y = speed * cos(radians(direction))
+        self.samples.append((timestamp, x, y, speed))
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_speed += speed
+        while self.gusts and self.gusts[-1][1] <= speed:
+            self.gusts.pop()
+        self.gusts.append((timestamp, speed))
+        self.expire(timestamp)
+        return None
+
+    def expire(self, now: float) -> None:
+        """
+        Drop samples older than the window
+        """
+        oldest = now - self.seconds
+        while self.samples and self.samples[0][0] <= oldest:
+            timestamp, x, y, speed = self.samples.popleft()
+            self.sum_x -= x
+            self.sum_y -= y
+            self.sum_speed -= speed
+            self.removed += 1
+        while self.gusts and self.gusts[0][0] <= oldest:
+            self.gusts.popleft()
+        # Rebuild the sums now and then so floating point error can't build up
+        if self.removed > 10000:
+            self.sum_x = sum(sample[1] for sample in self.samples)
+            self.sum_y = sum(sample[2] for sample in self.samples)
+            self.sum_speed = sum(sample[3] for sample in self.samples)
+            self.removed = 0
+        return None
+
+    def get_wind(self) -> dict:
+        """
+        Return the window's vector mean direction, mean speed, vector mean speed
+        and peak gust, or an empty dict if there are no samples
+        """
+        count = len(self.samples)
+        if not count:
+            return {}
+        wind = {}
+        wind["direction"] = degrees(atan2(self.sum_x, self.sum_y)) % 360
+        wind["speed"] = self.sum_speed / count
+        wind["vector_speed"] = sqrt(self.sum_x**2 + self.sum_y**2) / count
+        wind["gust"] = self.gusts[0][1]
+        wind["samples"] = count
+        return wind
+
+class wind_engine:
+    """
+    Feed apparent wind and course/speed over ground samples as they arrive and
+    read smoothed ground wind for each configured window, e.g. [10, 120, 600] seconds
+    """
+    def __init__(self, windows: list) -> None:
+        self.windows = {}
+        for seconds in windows:
+            self.windows[seconds] = wind_window(seconds)
+        self.latest = {}
+        return None
+
+    def add_apparent(self, timestamp: float, apparent_angle: float, apparent_speed: float, course: float, speed: float) -> None:
+        """
+        Add an apparent wind sample with the course and speed over ground at the time
+        """
+        direction, ground_speed = ground_wind_from_apparent(apparent_angle, apparent_speed, course, speed)
+        self.add_ground(timestamp, direction, ground_speed)
+        return None
+
+    def add_ground(self, timestamp: float, direction: float, speed: float) -> None:
+        """
+        Add a ground wind sample to every window
+        """
+        self.latest = {"timestamp": timestamp, "direction": direction, "speed": speed}
+        for window in self.windows.values():
+            window.add(timestamp, direction, speed)
+        return None
+
+    def get_wind(self, seconds: float, now: float = None) -> dict:
+        """
+        Return smoothed wind for a configured window, see wind_window.get_wind.
+        Pass now to expire samples if none have arrived recently.
+        """
+        window = self.windows[seconds]
+        if now is not None:
+            window.expire(now)
+        return window.get_wind()